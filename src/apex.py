@@ -0,0 +1,169 @@
+import multiprocessing as mp
+import queue
+import time
+import numpy as np
+import torch
+from src.environment.mahjong_env import MahjongEnv
+from src.models.dqn_agent import DQNAgent, apex_epsilons, masked_argmax
+from src.models.replay_buffer import NStepAccumulator
+from src.models.shared_weights import SharedWeights, WeightSubscriber
+
+def _actor(actor_id, epsilon, seed, network, state_size, action_size, shared_weights, transitions, stop_event,
+           stats, n_step, gamma, chunk_size, sync_interval):
+    """
+    actor進程：以CPU上的learner網絡副本（network為learner模型的類別）與固定探索率執行MahjongEnv，
+    在本地累積n步回報後以chunk_size筆為一批送入transitions佇列，每sync_interval步檢查並載入新參數
+    stats: 共享的 (actors, 3) 數組，記錄各actor的 (環境步數, 經過秒數, 載入參數的位元組數)
+    """
+    torch.set_num_threads(1)
+    rng = np.random.default_rng(seed)
+    env = MahjongEnv(enable_logging=False, seed=seed)
+    model = network(state_size, action_size)
+    subscriber = WeightSubscriber(shared_weights, model)
+    subscriber.sync()
+    accumulator = NStepAccumulator(1, n_step, gamma, state_size)
+    stats = np.frombuffer(stats, dtype=np.float64).reshape(-1, 3)[actor_id]
+
+    pending = []
+    pending_count = 0
+    steps = 0
+    start_time = time.perf_counter()
+    state, info = env.reset(return_info=True)
+    while not stop_event.is_set():
+        mask = info["action_mask"]
+        if rng.random() < epsilon:
+            action = int(rng.choice(np.flatnonzero(mask)))
+        else:
+            with torch.no_grad():
+                q_values = model(torch.from_numpy(state)[None])
+            action = int(masked_argmax(q_values, torch.from_numpy(mask)[None])[0])
+
+        next_state, reward, done, info = env.step(action)
+        output = accumulator.push(state[None], [action], [reward], next_state[None], [done])
+        if output is not None:
+            pending.append(output)
+            pending_count += len(output[1])
+        state = next_state
+        if done:
+            state, info = env.reset(return_info=True)
+
+        steps += 1
+        if pending_count >= chunk_size:
+            chunk = tuple(np.concatenate(parts) for parts in zip(*pending))
+            pending, pending_count = [], 0
+            while not stop_event.is_set():
+                try:
+                    transitions.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+        if steps % sync_interval == 0:
+            subscriber.sync()
+        stats[:] = (steps, time.perf_counter() - start_time, subscriber.bytes_loaded)
+
+
+def train_apex(num_actors=4, total_updates=10000, batch_size=64, warmup=1000, memory_size=100000, n_step=3,
+               publish_interval=50, target_update=1000, chunk_size=64, sync_interval=100, report_interval=500,
+               prioritized=False, double_dqn=False, dueling=False, conv=False, seed=None):
+    """
+    Ape-X式的actor-learner訓練（單機、全部使用CPU）
+    num_actors個actor進程各自執行MahjongEnv並以固定的Ape-X探索率（apex_epsilons）行動，
+    把n步經驗送入learner進程（本進程）的回放記憶體；learner持續進行梯度更新，
+    每publish_interval次更新把參數寫入共享記憶體，actors每sync_interval步檢查版本並載入新參數
+    prioritized / double_dqn / dueling / conv: 傳給learner的DQNAgent，actors使用與learner相同的網絡架構
+    返回: (agent, stats)，stats包含actor與learner各自的吞吐量
+    """
+    ctx = mp.get_context()
+    env = MahjongEnv(enable_logging=False)
+    state_size = env.observation_space.shape[0]
+    action_size = env.action_space.n
+    # actors已在本地累積n步回報，learner的記憶體直接保存，只以 gamma ** n_step 自舉
+    agent = DQNAgent(state_size, action_size, torch.device("cpu"), memory_size=memory_size, prioritized=prioritized,
+                     n_step=n_step, n_step_accumulated=True, double_dqn=double_dqn, dueling=dueling, conv=conv)
+    agent.batch_size = batch_size
+
+    shared_weights = SharedWeights(agent.model, ctx)
+    shared_weights.publish(agent.model)
+    transitions = ctx.Queue(maxsize=num_actors * 8)
+    stop_event = ctx.Event()
+    actor_stats = ctx.RawArray("d", num_actors * 3)
+    epsilons = apex_epsilons(num_actors)
+    seeds = np.random.SeedSequence(seed).generate_state(num_actors)
+
+    actors = [ctx.Process(target=_actor, daemon=True,
+                          args=(i, float(epsilons[i]), int(seeds[i]), type(agent.model), state_size, action_size,
+                                shared_weights, transitions, stop_event, actor_stats, n_step, agent.gamma,
+                                chunk_size, sync_interval))
+              for i in range(num_actors)]
+    for actor in actors:
+        actor.start()
+
+    received = 0
+    updates = 0
+    update_time = 0.0
+    start_time = time.perf_counter()
+    try:
+        while updates < total_updates:
+            # 所有actor都已結束（例如環境拋出例外）時無法再取得經驗，直接報錯而不是無限等待
+            if not any(actor.is_alive() for actor in actors):
+                raise RuntimeError(f"所有actor進程已結束，結束代碼: {[actor.exitcode for actor in actors]}")
+            # 取出所有已送達的經驗；暖身前阻塞等待
+            block = len(agent.memory) < warmup
+            while True:
+                try:
+                    chunk = transitions.get(timeout=0.1) if block else transitions.get_nowait()
+                except queue.Empty:
+                    break
+                agent.memory.add_batch(*chunk)
+                received += len(chunk[1])
+                block = False
+            if len(agent.memory) < warmup:
+                continue
+
+            update_start_time = time.perf_counter()
+            performed = agent.replay()
+            update_time += time.perf_counter() - update_start_time
+            if not performed:
+                continue
+            updates += 1
+            if updates % publish_interval == 0:
+                shared_weights.publish(agent.model)
+            if updates % target_update == 0:
+                agent.update_target_network()
+            if updates % report_interval == 0:
+                stats = _apex_stats(actor_stats, shared_weights, received, updates, update_time, start_time)
+                print(f"更新 {updates}/{total_updates}: actors {stats['actor_steps_per_second'].sum():.0f} 步/秒, "
+                      f"learner {stats['updates_per_second']:.1f} 更新/秒, 回放記憶體 {len(agent.memory)} 筆, "
+                      f"參數發佈 {stats['publish_latency'] * 1e6:.0f} 微秒/次")
+    finally:
+        stop_event.set()
+        # 清空佇列以免actor卡在put
+        while any(actor.is_alive() for actor in actors):
+            try:
+                transitions.get(timeout=0.05)
+            except queue.Empty:
+                pass
+            for actor in actors:
+                actor.join(timeout=0.05)
+        transitions.close()
+
+    return agent, _apex_stats(actor_stats, shared_weights, received, updates, update_time, start_time)
+
+
+def _apex_stats(actor_stats, shared_weights, received, updates, update_time, start_time):
+    """
+    整理actor與learner各自的吞吐量以及參數廣播的延遲與傳輸量
+    """
+    stats = np.frombuffer(actor_stats, dtype=np.float64).reshape(-1, 3)
+    steps, seconds = stats[:, 0].copy(), stats[:, 1].copy()
+    elapsed = time.perf_counter() - start_time
+    return {
+        "actor_steps": steps,
+        "actor_steps_per_second": np.divide(steps, seconds, out=np.zeros_like(steps), where=seconds > 0),
+        "transitions_received": received,
+        "updates": updates,
+        "updates_per_second": updates / max(update_time, 1e-9),
+        "elapsed": elapsed,
+        "actor_bytes_loaded": stats[:, 2].copy(),
+        **shared_weights.publish_stats(),
+    }
@@ -1,24 +1,49 @@
 import gym
 import numpy as np
 from gym import spaces
+from src.environment.observation import ObservationEncoder, OBSERVATION_SIZE
 from src.utils.logger import MahjongLogger
-from src.utils.mahjong_utils import check_win, hand_to_counts, tile_to_id, calculate_score
+from src.utils.mahjong_utils import (check_win, id_to_tile, calculate_score,
+                                     INSTANCE_TO_ID, NUM_INSTANCES, RED_FIVE_MAN)
+
+# 手牌陣列的容量（13張加摸入的一張）
+MAX_HAND_SIZE = 14
+# 寶牌指示牌在牌山中的位置（最後14張為王牌）
+DORA_INDICATOR_POSITION = NUM_INSTANCES - 6
+# 動作空間大小：0-36為打出該牌ID的牌，其餘保留給立直、自摸、榮和、吃碰槓等
+NUM_ACTIONS = 100
+# 普通五萬、五筒、五索的牌ID（手牌只有赤五時打出普通五亦合法）
+_NORMAL_FIVES = (4, 13, 22)
+
+def fill_action_mask(hand_counts, mask):
+    """
+    由手牌計數數組填寫合法動作遮罩（目前只有打牌動作）
+    hand_counts: (..., 37) 的手牌計數數組
+    mask: (..., NUM_ACTIONS) 的bool數組，原地寫入
+    """
+    mask[..., :37] = hand_counts > 0
+    mask[..., list(_NORMAL_FIVES)] |= hand_counts[..., RED_FIVE_MAN:] > 0
+    return mask
 
 class MahjongEnv(gym.Env):
     """
     日本麻將強化學習環境
     """
     
-    def __init__(self, enable_logging=True, log_level=1):
+    def __init__(self, enable_logging=True, log_level=1, seed=None, copy_observation=True):
         super(MahjongEnv, self).__init__()
         
         # 定義動作空間
         # 例如：丟棄一張牌(34種), 吃(n種), 碰(n種), 槓(n種), 立直, 自摸, 榮和等
-        self.action_space = spaces.Discrete(100)  # 臨時數值，需要根據實際動作數量調整
+        self.action_space = spaces.Discrete(NUM_ACTIONS)  # 臨時數值，需要根據實際動作數量調整
         
         # 定義觀察空間
-        # 包括：自己的手牌，場上的狀態(河牌，立直狀態，場風等)
-        self.observation_space = spaces.Box(low=0, high=1, shape=(200,), dtype=np.float32)  # 臨時設定
+        # 包括：自己的手牌，場上的狀態(河牌，立直狀態，場風等)，配置見observation.OBSERVATION_LAYOUT
+        self.observation_space = spaces.Box(low=0, high=1, shape=(OBSERVATION_SIZE,), dtype=np.float32)
+        
+        # 觀察編碼器：隨摸打增量更新，copy_observation為False時返回重用的緩衝區
+        self.encoder = ObservationEncoder()
+        self.copy_observation = copy_observation
         
         # 遊戲記錄設置
         self.enable_logging = enable_logging
@@ -29,13 +54,30 @@ class MahjongEnv(gym.Env):
         self.episode_count = 0
         self.total_scores = [0, 0, 0, 0]  # 四位玩家的總分
         
+        # 每個環境獨立的隨機數生成器（用於洗牌）
+        self.rng = np.random.default_rng(seed)
+        
+        # 預先配置牌山與手牌陣列，reset時原地重用
+        self.wall = np.arange(NUM_INSTANCES, dtype=np.uint8)
+        self.wall_position = 0
+        self.hands = np.zeros((4, MAX_HAND_SIZE), dtype=np.uint8)
+        self.hand_sizes = np.zeros(4, dtype=np.int64)
+        self.hand_counts = np.zeros((4, 37), dtype=np.uint8)
+        self.discard_counts = np.zeros(37, dtype=np.int32)
+        self._action_mask = np.zeros(NUM_ACTIONS, dtype=bool)
+        
         # 初始化遊戲狀態
         self.reset()
     
-    def reset(self):
+    def reset(self, seed=None, return_info=False):
         """
         重置環境到初始狀態
+        seed: 若指定，以此重新建立本環境的隨機數生成器
+        return_info: 為True時返回 (observation, info)，info['action_mask']為合法動作遮罩
         """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        
         # 更新episode計數
         self.episode_count += 1
         
@@ -43,44 +85,46 @@ class MahjongEnv(gym.Env):
         if self.enable_logging:
             self.logger.start_episode(self.episode_count)
         
-        # 初始化牌山
-        self.tiles = self._init_tiles()
+        # 初始化牌山（136張牌的實例編號，以讀取指標從頭摸牌）
+        self._init_tiles()
         
         # 記錄完整牌山（僅用於記錄，之後不再修改）
         if self.enable_logging:
-            original_tiles = self.tiles.copy()
-            self.logger.log_tiles(original_tiles)
-        
-        # 初始化玩家手牌
-        self.players_hands = [[] for _ in range(4)]
+            self.logger.log_tiles(INSTANCE_TO_ID[self.wall].tolist())
         
-        # 初始化河牌
+        # 初始化河牌（實例編號）及場上可見牌的計數
         self.discards = [[] for _ in range(4)]
+        self.discard_counts.fill(0)
         
         # 初始化其他遊戲狀態
         self.current_player = 0
-        self.dora_indicators = []
         self.round_wind = 0  # 東風場
         self.dealer = 0  # 起始莊家
         
         # 發牌
         self._deal_tiles()
         
+        # 翻開寶牌指示牌並初始化觀察特徵
+        self.dora_indicators = [int(INSTANCE_TO_ID[self.wall[DORA_INDICATOR_POSITION]])]
+        self.encoder.reset(self.hand_counts, self.round_wind, self.dealer, self.wall_remaining)
+        for indicator in self.dora_indicators:
+            self.encoder.add_dora_indicator(indicator)
+        
         # 記錄初始手牌
         if self.enable_logging:
             for player in range(4):
-                self.logger.log_initial_hand(player, self.players_hands[player])
+                self.logger.log_initial_hand(player, self.hand_ids(player))
         
         # 返回觀察
-        return self._get_observation()
+        observation = self._get_observation()
+        if return_info:
+            return observation, {'action_mask': self.action_mask()}
+        return observation
     
     def step(self, action):
         """
         執行一個動作並返回下一個狀態，獎勵和是否結束
         """
-        # 執行動作前的狀態
-        pre_action_hand = self.players_hands[self.current_player].copy() if self.enable_logging else None
-        
         # 執行動作
         reward = self._execute_action(action)
         
@@ -90,8 +134,8 @@ class MahjongEnv(gym.Env):
         # 獲取新的觀察
         observation = self._get_observation()
         
-        # 額外信息
-        info = {}
+        # 額外信息：下一位行動玩家的合法動作遮罩
+        info = {'action_mask': self.action_mask()}
         
         # 記錄本輪遊戲結果
         if done and self.enable_logging:
@@ -105,45 +149,98 @@ class MahjongEnv(gym.Env):
         """
         # 打印遊戲狀態
         print(f"當前玩家: {self.current_player}")
-        print(f"手牌: {self.players_hands[self.current_player]}")
-        print(f"河牌: {self.discards}")
+        print(f"手牌: {self.hand_ids(self.current_player)}")
+        print(f"河牌: {[INSTANCE_TO_ID[player_discards].tolist() for player_discards in self.discards]}")
         
+    @property
+    def players_hands(self):
+        """
+        舊版的手牌表示：每位玩家的 (suit, value) 列表（赤寶牌與普通五相同）
+        僅供相容使用，每次存取時才轉換
+        """
+        return [[id_to_tile(tile_id) for tile_id in self.hand_ids(player)] for player in range(4)]
+    
+    @property
+    def tiles(self):
+        """
+        舊版的牌山表示：剩餘牌山的 (suit, value) 列表，僅供相容使用
+        """
+        return [id_to_tile(tile_id) for tile_id in INSTANCE_TO_ID[self.wall[self.wall_position:]].tolist()]
+    
+    def hand_ids(self, player):
+        """
+        獲取玩家手牌的牌ID(0-36)列表
+        """
+        return INSTANCE_TO_ID[self.hands[player, :self.hand_sizes[player]]].tolist()
+    
     def _init_tiles(self):
         """
-        初始化並洗牌
+        原地洗牌並將讀取指標歸零
+        牌山為136張牌實例編號的uint8數組（見mahjong_utils.INSTANCE_TO_ID）
         """
-        # 創建一副完整的麻將牌
-        # 數牌 (萬子, 筒子, 索子): 1-9 各4張
-        # 字牌 (東南西北白發中): 各4張
-        tiles = []
-        
-        # 數牌
-        for suit in range(3):  # 萬子, 筒子, 索子
-            for value in range(1, 10):
-                for _ in range(4):
-                    tiles.append((suit, value))
-        
-        # 字牌
-        for value in range(7):  # 東南西北白發中
-            for _ in range(4):
-                tiles.append((3, value))
-        
-        # 洗牌
-        np.random.shuffle(tiles)
-        
-        return tiles
+        self.rng.shuffle(self.wall)
+        self.wall_position = 0
+    
+    def _draw(self, player):
+        """
+        從牌山摸一張牌給玩家（讀取指標前進一格），返回牌的實例編號
+        """
+        instance = self.wall[self.wall_position]
+        self.wall_position += 1
+        self.hands[player, self.hand_sizes[player]] = instance
+        self.hand_sizes[player] += 1
+        tile_id = INSTANCE_TO_ID[instance]
+        self.hand_counts[player, tile_id] += 1
+        self.encoder.on_draw(player, tile_id)
+        return instance
     
     def _deal_tiles(self):
         """
-        發牌
+        發牌：每位玩家依序取13張，莊家再取一張
         """
-        # 每位玩家13張牌
-        for i in range(13):
-            for player in range(4):
-                self.players_hands[player].append(self.tiles.pop())
-        
-        # 莊家額外摸一張
-        self.players_hands[self.dealer].append(self.tiles.pop())
+        self.hands[:, :13] = self.wall[:52].reshape(4, 13)
+        self.hand_sizes.fill(13)
+        dealer_tile = self.wall[52]
+        self.hands[self.dealer, 13] = dealer_tile
+        self.hand_sizes[self.dealer] = 14
+        self.wall_position = 53
+        
+        # 一次計算四位玩家的計數：第p位玩家的牌ID偏移37*p後合併統計
+        ids = INSTANCE_TO_ID[self.hands[:, :13]].astype(np.intp)
+        ids += np.arange(0, 4 * 37, 37)[:, None]
+        self.hand_counts[:] = np.bincount(ids.ravel(), minlength=4 * 37).reshape(4, 37)
+        self.hand_counts[self.dealer, INSTANCE_TO_ID[dealer_tile]] += 1
+    
+    @property
+    def wall_remaining(self):
+        """
+        牌山剩餘張數
+        """
+        return NUM_INSTANCES - self.wall_position
+    
+    def _discard(self, player, tile_id):
+        """
+        從玩家手牌打出一張牌ID為tile_id的牌，返回打出的牌ID；手牌中沒有時返回None
+        打出普通五而手牌只有赤五時，打出赤五
+        """
+        counts = self.hand_counts[player]
+        if not counts[tile_id]:
+            if tile_id not in _NORMAL_FIVES or not counts[RED_FIVE_MAN + tile_id // 9]:
+                return None
+            tile_id = RED_FIVE_MAN + tile_id // 9
+        
+        size = self.hand_sizes[player]
+        hand = self.hands[player]
+        position = int(np.flatnonzero(INSTANCE_TO_ID[hand[:size]] == tile_id)[0])
+        instance = hand[position]
+        hand[position:size - 1] = hand[position + 1:size]
+        self.hand_sizes[player] = size - 1
+        counts[tile_id] -= 1
+        
+        self.discards[player].append(instance)
+        self.discard_counts[tile_id] += 1
+        self.encoder.on_discard(player, tile_id)
+        return tile_id
     
     def _execute_action(self, action):
         """
@@ -152,45 +249,28 @@ class MahjongEnv(gym.Env):
         # 這裡需要實現具體的麻將規則和動作處理
         # 例如：丟棄牌，吃碰槓，立直等
         
-        # 臨時實現：隨機丟棄一張牌
+        # 臨時實現：丟棄一張牌
         if action < 37:  # 支持丟棄所有牌，包括赤寶牌
-            # 檢查玩家手牌中是否有這張牌
-            tile_to_discard = None
-            player_hand = self.players_hands[self.current_player]
+            player = self.current_player
             
-            # 如果action直接是牌ID，先轉換為(suit, value)格式
-            for tile in player_hand:
-                if isinstance(tile, tuple) and tile_to_id(tile) == action:
-                    tile_to_discard = tile
-                    break
-                elif tile == action:  # 如果已經是ID格式
-                    tile_to_discard = action
-                    break
-            
-            if tile_to_discard is not None:
-                # 記錄打牌前的狀態（如果啟用記錄）
-                if self.enable_logging:
-                    # 摸牌動作通常在玩家回合開始時
-                    # 假設每輪回合都會從牌山摸一張牌
-                    if len(self.tiles) > 0:
-                        drawn_tile = self.tiles.pop()
-                        self.players_hands[self.current_player].append(drawn_tile)
-                        self.logger.log_draw(self.current_player, 
-                                             self.players_hands[self.current_player], 
-                                             drawn_tile)
+            # 檢查玩家手牌中是否有這張牌（由計數數組直接判斷）
+            if self.hand_counts[player, action] or \
+                    (action in _NORMAL_FIVES and self.hand_counts[player, RED_FIVE_MAN + action // 9]):
+                # 輪到的玩家先摸牌（莊家第一巡已有14張，不需摸牌）
+                if self.hand_sizes[player] % 3 == 1 and self.wall_position < NUM_INSTANCES:
+                    drawn_tile = INSTANCE_TO_ID[self._draw(player)]
+                    if self.enable_logging:
+                        self.logger.log_draw(player, self.hand_ids(player), drawn_tile)
                 
                 # 執行丟棄動作
-                self.players_hands[self.current_player].remove(tile_to_discard)
-                self.discards[self.current_player].append(tile_to_discard)
+                discarded_tile = self._discard(player, action)
                 
                 # 記錄丟牌
                 if self.enable_logging:
-                    self.logger.log_discard(self.current_player, 
-                                          self.players_hands[self.current_player], 
-                                          tile_to_discard)
+                    self.logger.log_discard(player, self.hand_ids(player), discarded_tile)
                 
                 # 下一位玩家摸牌（在實際遊戲中下一位玩家摸牌會在下一個step中處理）
-                self.current_player = (self.current_player + 1) % 4
+                self.current_player = (player + 1) % 4
         
         # 這裡簡單返回0獎勵，實際應該根據牌型計算
         reward = 0
@@ -206,27 +286,19 @@ class MahjongEnv(gym.Env):
         檢查遊戲是否結束
         """
         # 牌山耗盡
-        if len(self.tiles) <= 14:  # 保留14張牌(雙北)
+        if self.wall_remaining <= 14:  # 保留14張牌(雙北)
             return True
         
-        # 檢查和牌
-        # 從mahjong_utils引入check_win函數
-        from src.utils.mahjong_utils import check_win, hand_to_counts, tile_to_id, calculate_score
-        
-        # 判斷當前玩家是否和牌
-        player_hand = self.players_hands[self.current_player]
-        
-        # 將手牌轉換為tile_id
-        hand_ids = [tile_to_id(tile) for tile in player_hand]
-        counts = hand_to_counts(hand_ids)
+        # 判斷當前玩家是否和牌（直接使用增量維護的計數數組）
+        counts = self.hand_counts[self.current_player]
         
         # 檢查是否和牌
         if check_win(counts):
             # 如果和牌，記錄和牌信息
             if self.enable_logging:
                 # 假設最後摸到的牌是和牌
-                win_tile = player_hand[-1]
-                win_tile_id = tile_to_id(win_tile)
+                hand_ids = self.hand_ids(self.current_player)
+                win_tile_id = hand_ids[-1]
                 
                 # 計算和牌得分
                 score, yaku_list = calculate_score(counts, win_tile_id, 
@@ -239,7 +311,7 @@ class MahjongEnv(gym.Env):
                                                 is_riichi=True)  # 假設立直
                 
                 # 記錄和牌
-                self.logger.log_win(self.current_player, player_hand, win_tile, "自摸", score, yaku_list)
+                self.logger.log_win(self.current_player, hand_ids[:-1], win_tile_id, "自摸", score, yaku_list)
                 
                 # 記錄獎勵
                 self.logger.log_reward(self.current_player, score, "和牌")
@@ -250,13 +322,24 @@ class MahjongEnv(gym.Env):
     
     def _get_observation(self):
         """
-        獲取當前遊戲狀態的觀察
+        獲取當前遊戲狀態的觀察（以輪到行動的玩家為視角）
         """
-        # 將遊戲狀態轉換為神經網絡可用的格式
-        # 這裡只是一個占位實現，實際應該設計一個合理的狀態表示
-        
-        # 臨時返回一個隨機觀察
-        return np.random.rand(200).astype(np.float32)
+        return self.encoder.encode(self.current_player, copy=self.copy_observation)
+    
+    def action_mask(self):
+        """
+        獲取當前玩家的合法動作遮罩（長度NUM_ACTIONS的bool數組）
+        由增量維護的手牌計數數組直接計算：手牌中有的牌ID可打出，
+        手牌只有赤五時打出普通五亦合法（與_execute_action的判斷一致）
+        """
+        return fill_action_mask(self.hand_counts[self.current_player], self._action_mask).copy()
+    
+    def get_visible_counts(self):
+        """
+        獲取場上可見牌（所有玩家的河牌）的計數數組
+        可傳入calculate_ukeire / calculate_effective_tiles計算有效牌剩餘張數
+        """
+        return self.discard_counts.copy()
     
     def generate_text_log(self, episode_num=None):
         """
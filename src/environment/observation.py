@@ -0,0 +1,159 @@
+import numpy as np
+from src.utils.mahjong_utils import RED_FIVE_MAN
+
+# 觀察向量的欄位配置（依序排列，皆為float32並縮放至0-1）
+# 以輪到行動的玩家為視角，各家資訊依 自己、下家、對家、上家 的順序排列
+OBSERVATION_LAYOUT = (
+    ("hand", 34),            # 自己手牌各種牌的張數/4（赤五計入對應的五）
+    ("red_fives", 3),        # 自己手牌中是否有赤五萬、赤五筒、赤五索
+    ("rivers", 4 * 34),      # 各家河牌各種牌的張數/4
+    ("dora_indicators", 34), # 寶牌指示牌各種牌的張數/4
+    ("round_wind", 4),       # 場風 one-hot（東南西北）
+    ("seat_wind", 4),        # 自風 one-hot（東南西北）
+    ("visible", 34),         # 自己可見的牌（手牌+所有河牌+寶牌指示牌）的張數/4
+    ("riichi", 4),           # 各家立直旗標
+    ("wall_remaining", 1),   # 牌山剩餘張數/136
+)
+
+def _build_slices(layout):
+    slices = {}
+    offset = 0
+    for name, size in layout:
+        slices[name] = slice(offset, offset + size)
+        offset += size
+    return slices, offset
+
+# 欄位名稱 -> 觀察向量中的切片
+OBSERVATION_SLICES, OBSERVATION_SIZE = _build_slices(OBSERVATION_LAYOUT)
+
+HAND_SLICE = OBSERVATION_SLICES["hand"]
+RED_FIVE_SLICE = OBSERVATION_SLICES["red_fives"]
+RIVER_SLICE = OBSERVATION_SLICES["rivers"]
+DORA_SLICE = OBSERVATION_SLICES["dora_indicators"]
+ROUND_WIND_SLICE = OBSERVATION_SLICES["round_wind"]
+SEAT_WIND_SLICE = OBSERVATION_SLICES["seat_wind"]
+VISIBLE_SLICE = OBSERVATION_SLICES["visible"]
+RIICHI_SLICE = OBSERVATION_SLICES["riichi"]
+WALL_SLICE = OBSERVATION_SLICES["wall_remaining"]
+
+# 每張牌在計數欄位中佔的數值
+TILE_UNIT = 0.25
+
+# 各欄位的量化除數：觀察值乘上除數後皆為0-255的整數（張數/4、旗標、牌山剩餘張數/136），
+# 因此觀察向量可無損地以uint8保存（見quantize_observations / dequantize_observations）
+_FIELD_DIVISORS = {"hand": 4, "rivers": 4, "dora_indicators": 4, "visible": 4, "wall_remaining": 136}
+OBSERVATION_DIVISORS = np.ones(OBSERVATION_SIZE, dtype=np.float32)
+for _name, _divisor in _FIELD_DIVISORS.items():
+    OBSERVATION_DIVISORS[OBSERVATION_SLICES[_name]] = _divisor
+
+def quantize_observations(observations):
+    """
+    將觀察向量（或 (N, OBSERVATION_SIZE) 的批次）轉為uint8保存
+    """
+    return np.rint(np.multiply(observations, OBSERVATION_DIVISORS)).astype(np.uint8)
+
+def dequantize_observations(quantized):
+    """
+    將quantize_observations的結果還原為float32觀察向量
+    """
+    return np.divide(quantized, OBSERVATION_DIVISORS, dtype=np.float32)
+
+# 牌ID(0-36) -> 計數欄位索引（赤五計入對應的五）
+_PLANE_INDEX = tuple(range(34)) + (4, 13, 22)
+
+# (37, 34) 的摺疊矩陣：計數數組乘上此矩陣即得計數欄位的數值
+_FOLD_MATRIX = np.zeros((37, 34), dtype=np.float32)
+_FOLD_MATRIX[np.arange(37), _PLANE_INDEX] = TILE_UNIT
+_ONE_HOT = np.eye(4, dtype=np.float32)
+
+
+class ObservationEncoder:
+    """
+    觀察向量編碼器
+    以絕對座位保存各家手牌、河牌等特徵，於摸牌/打牌時增量更新，
+    encode時只需按視角玩家重新排列並複製到重用的緩衝區
+    """
+
+    def __init__(self):
+        self.buffer = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        self._river_view = self.buffer[RIVER_SLICE].reshape(4, 34)
+        self._visible_view = self.buffer[VISIBLE_SLICE]
+        self.hands = np.zeros((4, 34), dtype=np.float32)
+        self.red_fives = np.zeros((4, 3), dtype=np.float32)
+        # 河牌與立直旗標各存兩份（第p列與第p+4列相同），
+        # 以player視角的 自己、下家、對家、上家 順序即為連續切片 [player:player+4]
+        self.rivers = np.zeros((8, 34), dtype=np.float32)
+        self.river_total = np.zeros(34, dtype=np.float32)
+        self.dora_indicators = np.zeros(34, dtype=np.float32)
+        self.riichi = np.zeros(8, dtype=np.float32)
+        self.round_wind = 0
+        self.dealer = 0
+        self.wall_remaining = 0
+
+    def reset(self, hand_counts, round_wind=0, dealer=0, wall_remaining=0):
+        """
+        開始新的一局
+        hand_counts: (4, 37) 的手牌計數數組（配牌後）
+        """
+        np.matmul(hand_counts, _FOLD_MATRIX, out=self.hands)
+        self.red_fives[:] = hand_counts[:, 34:37]
+        self.rivers.fill(0)
+        self.river_total.fill(0)
+        self.dora_indicators.fill(0)
+        self.riichi.fill(0)
+        self.round_wind = round_wind
+        self.dealer = dealer
+        self.wall_remaining = wall_remaining
+
+    def on_draw(self, player, tile_id):
+        """
+        玩家摸入一張牌（牌ID 0-36）
+        """
+        self.hands[player, _PLANE_INDEX[tile_id]] += TILE_UNIT
+        if tile_id >= RED_FIVE_MAN:
+            self.red_fives[player, tile_id - RED_FIVE_MAN] = 1
+        self.wall_remaining -= 1
+
+    def on_discard(self, player, tile_id):
+        """
+        玩家打出一張牌（牌ID 0-36）
+        """
+        index = _PLANE_INDEX[tile_id]
+        self.hands[player, index] -= TILE_UNIT
+        if tile_id >= RED_FIVE_MAN:
+            self.red_fives[player, tile_id - RED_FIVE_MAN] = 0
+        self.rivers[player, index] += TILE_UNIT
+        self.rivers[player + 4, index] += TILE_UNIT
+        self.river_total[index] += TILE_UNIT
+
+    def add_dora_indicator(self, tile_id):
+        """
+        翻開一張寶牌指示牌
+        """
+        self.dora_indicators[_PLANE_INDEX[tile_id]] += TILE_UNIT
+
+    def set_riichi(self, player, is_riichi=True):
+        """
+        設定玩家的立直狀態
+        """
+        self.riichi[player] = self.riichi[player + 4] = float(is_riichi)
+
+    def encode(self, player, copy=True):
+        """
+        以player的視角輸出觀察向量
+        copy: 為False時直接返回內部緩衝區（下次encode會被覆寫），
+              需要保存觀察（例如放入經驗回放）時應使用預設的True
+        """
+        obs = self.buffer
+        obs[HAND_SLICE] = self.hands[player]
+        obs[RED_FIVE_SLICE] = self.red_fives[player]
+        self._river_view[:] = self.rivers[player:player + 4]
+        obs[DORA_SLICE] = self.dora_indicators
+        obs[ROUND_WIND_SLICE] = _ONE_HOT[self.round_wind]
+        obs[SEAT_WIND_SLICE] = _ONE_HOT[(player - self.dealer) % 4]
+        visible = self._visible_view
+        np.add(self.hands[player], self.river_total, out=visible)
+        visible += self.dora_indicators
+        obs[RIICHI_SLICE] = self.riichi[player:player + 4]
+        obs[WALL_SLICE] = self.wall_remaining / 136
+        return obs.copy() if copy else obs
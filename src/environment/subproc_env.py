@@ -0,0 +1,214 @@
+import multiprocessing as mp
+import time
+import numpy as np
+from gym import spaces
+from src.environment.mahjong_env import MahjongEnv, NUM_ACTIONS
+from src.environment.observation import OBSERVATION_SIZE
+
+# 工作進程的指令
+_STEP = "step"
+_RESET = "reset"
+_CLOSE = "close"
+
+def _shared_array(ctx, dtype, shape):
+    """
+    配置可在進程間共享的NumPy數組，返回 (RawArray, ndarray視圖)
+    """
+    dtype = np.dtype(dtype)
+    raw = ctx.RawArray("b", int(np.prod(shape)) * dtype.itemsize)
+    return raw, np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+def _worker(pipe, buffers, start, num_envs, worker_index, seed_sequence):
+    """
+    工作進程：擁有num_envs個MahjongEnv，依指令對共享數組中自己的切片執行reset/step
+    buffers: 共享的 (observations, terminal_observations, actions, rewards, dones, action_masks, stats) RawArray
+    """
+    raw_obs, raw_terminal, raw_actions, raw_rewards, raw_dones, raw_masks, raw_stats = buffers
+    end = start + num_envs
+    observations = np.frombuffer(raw_obs, dtype=np.float32).reshape(-1, OBSERVATION_SIZE)[start:end]
+    terminal_observations = np.frombuffer(raw_terminal, dtype=np.float32).reshape(-1, OBSERVATION_SIZE)[start:end]
+    actions = np.frombuffer(raw_actions, dtype=np.int64)[start:end]
+    rewards = np.frombuffer(raw_rewards, dtype=np.float32)[start:end]
+    dones = np.frombuffer(raw_dones, dtype=np.bool_)[start:end]
+    action_masks = np.frombuffer(raw_masks, dtype=np.bool_).reshape(-1, NUM_ACTIONS)[start:end]
+    stats = np.frombuffer(raw_stats, dtype=np.float64).reshape(-1, 2)[worker_index]
+
+    seeds = seed_sequence.spawn(num_envs)
+    envs = [MahjongEnv(enable_logging=False, seed=seeds[i], copy_observation=False) for i in range(num_envs)]
+    try:
+        while True:
+            command = pipe.recv()
+            if command == _STEP:
+                step_start = time.perf_counter()
+                for i, env in enumerate(envs):
+                    observation, reward, done, info = env.step(int(actions[i]))
+                    if done:
+                        terminal_observations[i] = observation
+                        observation, info = env.reset(return_info=True)
+                    observations[i] = observation
+                    action_masks[i] = info['action_mask']
+                    rewards[i] = reward
+                    dones[i] = done
+                stats[0] += num_envs
+                stats[1] += time.perf_counter() - step_start
+                pipe.send(True)
+            elif command == _RESET:
+                for i, env in enumerate(envs):
+                    observations[i], info = env.reset(return_info=True)
+                    action_masks[i] = info['action_mask']
+                pipe.send(True)
+            elif command == _CLOSE:
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        pipe.close()
+
+
+class SubprocVecEnv:
+    """
+    多進程的麻將環境池
+    K個工作進程各擁有envs_per_worker個MahjongEnv，觀察、動作、獎勵與結束旗標
+    放在共享記憶體的NumPy數組中，每步只以管道傳送指令，不需序列化觀察
+    工作進程異常結束時會自動重啟，其環境視為本步結束（infos[i]['worker_restarted']）
+    介面與MahjongVecEnv相同：結束的局自動重置，結束時的觀察放在infos[i]['terminal_observation']
+    """
+
+    def __init__(self, num_workers, envs_per_worker=1, seed=None, copy_observation=True, start_method=None):
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.num_envs = num_workers * envs_per_worker
+        self.action_space = spaces.Discrete(NUM_ACTIONS)
+        self.observation_space = spaces.Box(low=0, high=1, shape=(OBSERVATION_SIZE,), dtype=np.float32)
+        self.copy_observation = copy_observation
+        self._ctx = mp.get_context(start_method)
+
+        # 每個工作進程以獨立的SeedSequence產生其環境的種子，重啟時再由它派生新的序列
+        self._seed_sequences = np.random.SeedSequence(seed).spawn(num_workers)
+        self.restarts = np.zeros(num_workers, dtype=np.int64)
+
+        shapes = ((np.float32, (self.num_envs, OBSERVATION_SIZE)),  # 觀察
+                  (np.float32, (self.num_envs, OBSERVATION_SIZE)),  # 結束時的觀察
+                  (np.int64, (self.num_envs,)),                     # 動作
+                  (np.float32, (self.num_envs,)),                   # 獎勵
+                  (np.bool_, (self.num_envs,)),                     # 結束旗標
+                  (np.bool_, (self.num_envs, NUM_ACTIONS)),         # 合法動作遮罩
+                  (np.float64, (num_workers, 2)))                   # 每個工作進程的 (步數, step耗時秒數)
+        raws, arrays = zip(*(_shared_array(self._ctx, dtype, shape) for dtype, shape in shapes))
+        self._buffers = raws
+        (self._observations, self._terminal_observations, self._actions,
+         self._rewards, self._dones, self._action_masks, self._stats) = arrays
+
+        self._processes = [None] * num_workers
+        self._pipes = [None] * num_workers
+        for worker in range(num_workers):
+            self._start_worker(worker, self._seed_sequences[worker])
+        self.closed = False
+
+    def _start_worker(self, worker, seed_sequence):
+        parent_pipe, child_pipe = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker, daemon=True,
+                                    args=(child_pipe, self._buffers, worker * self.envs_per_worker,
+                                          self.envs_per_worker, worker, seed_sequence))
+        process.start()
+        child_pipe.close()
+        self._processes[worker] = process
+        self._pipes[worker] = parent_pipe
+
+    def _restart_worker(self, worker):
+        """
+        重啟異常結束的工作進程，並以新的種子重置其環境
+        """
+        self._pipes[worker].close()
+        self._processes[worker].join(timeout=1)
+        self.restarts[worker] += 1
+        seed_sequence = self._seed_sequences[worker].spawn(1)[0]
+        self._start_worker(worker, seed_sequence)
+        self._pipes[worker].send(_RESET)
+        self._pipes[worker].recv()
+
+    def _broadcast(self, command):
+        """
+        向所有工作進程發送指令並等待完成，返回異常結束而被重啟的工作進程列表
+        """
+        failed = []
+        for worker, pipe in enumerate(self._pipes):
+            try:
+                pipe.send(command)
+            except (BrokenPipeError, OSError):
+                failed.append(worker)
+        for worker, pipe in enumerate(self._pipes):
+            if worker in failed:
+                continue
+            try:
+                pipe.recv()
+            except (EOFError, ConnectionResetError, OSError):
+                failed.append(worker)
+        for worker in failed:
+            self._restart_worker(worker)
+        return failed
+
+    def _output(self):
+        return self._observations.copy() if self.copy_observation else self._observations
+
+    def reset(self, return_info=False):
+        """
+        重置全部環境，返回 (N, OBSERVATION_SIZE) 的觀察
+        return_info: 為True時返回 (observations, infos)，infos[i]['action_mask']為合法動作遮罩
+        """
+        self._broadcast(_RESET)
+        if return_info:
+            return self._output(), [{'action_mask': mask} for mask in self._action_masks.copy()]
+        return self._output()
+
+    def step(self, actions):
+        """
+        每個環境各執行一個動作
+        返回: (observations, rewards, dones, infos)
+        """
+        self._actions[:] = actions
+        failed = self._broadcast(_STEP)
+
+        rewards = self._rewards.copy()
+        dones = self._dones.copy()
+        infos = [{'action_mask': mask} for mask in self._action_masks.copy()]
+        for worker in failed:
+            rows = slice(worker * self.envs_per_worker, (worker + 1) * self.envs_per_worker)
+            # 異常結束的工作進程沒有寫入結束觀察，以重置後的觀察代替
+            self._terminal_observations[rows] = self._observations[rows]
+            rewards[rows] = 0
+            dones[rows] = True
+            for row in range(rows.start, rows.stop):
+                infos[row]['worker_restarted'] = True
+        for row in np.flatnonzero(dones):
+            infos[row]['terminal_observation'] = self._terminal_observations[row].copy()
+        return self._output(), rewards, dones, infos
+
+    def worker_steps_per_second(self):
+        """
+        各工作進程的環境步數/秒（只計算執行step的時間），可據此決定工作進程數
+        """
+        steps, seconds = self._stats[:, 0], self._stats[:, 1]
+        return np.divide(steps, seconds, out=np.zeros(self.num_workers), where=seconds > 0)
+
+    def close(self):
+        """
+        關閉所有工作進程
+        """
+        if self.closed:
+            return
+        for pipe in self._pipes:
+            try:
+                pipe.send(_CLOSE)
+            except (BrokenPipeError, OSError):
+                pass
+        for process, pipe in zip(self._processes, self._pipes):
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+            pipe.close()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
@@ -0,0 +1,211 @@
+import numpy as np
+from gym import spaces
+from src.environment.observation import (OBSERVATION_SIZE, HAND_SLICE, RED_FIVE_SLICE, RIVER_SLICE, DORA_SLICE,
+                                         ROUND_WIND_SLICE, SEAT_WIND_SLICE, VISIBLE_SLICE, RIICHI_SLICE,
+                                         WALL_SLICE, TILE_UNIT, _FOLD_MATRIX, _PLANE_INDEX, _ONE_HOT)
+from src.environment.mahjong_env import DORA_INDICATOR_POSITION, NUM_ACTIONS, _NORMAL_FIVES, fill_action_mask
+from src.utils.mahjong_utils import check_win_batch, INSTANCE_TO_ID, NUM_INSTANCES, RED_FIVE_MAN
+
+# 發牌順序：前52張依序每位玩家13張，第53張給莊家
+_DEAL_SIZE = 53
+# 打出普通五而手牌只有赤五時改打赤五：牌ID -> 替代的牌ID
+_RED_FALLBACK = np.arange(37)
+_RED_FALLBACK[list(_NORMAL_FIVES)] = (RED_FIVE_MAN, RED_FIVE_MAN + 1, RED_FIVE_MAN + 2)
+# 牌ID(0-36) -> 計數欄位索引
+_PLANE_ARRAY = np.array(_PLANE_INDEX)
+
+
+class MahjongVecEnv:
+    """
+    向量化的多局麻將環境
+    以結構陣列（struct-of-arrays）保存N局遊戲的牌山、手牌計數、河牌與當前玩家，
+    reset/step一次處理全部N局，結束的局會自動重置
+    規則與MahjongEnv（不啟用記錄時）相同，觀察向量配置見observation.OBSERVATION_LAYOUT
+    """
+
+    def __init__(self, num_envs, seed=None, copy_observation=True):
+        self.num_envs = num_envs
+        self.action_space = spaces.Discrete(NUM_ACTIONS)
+        self.observation_space = spaces.Box(low=0, high=1, shape=(OBSERVATION_SIZE,), dtype=np.float32)
+        self.copy_observation = copy_observation
+        self.rng = np.random.default_rng(seed)
+
+        # 各局狀態
+        self.walls = np.tile(np.arange(NUM_INSTANCES, dtype=np.uint8), (num_envs, 1))
+        self.wall_position = np.zeros(num_envs, dtype=np.int64)
+        self.hand_counts = np.zeros((num_envs, 4, 37), dtype=np.uint8)
+        self.hand_sizes = np.zeros((num_envs, 4), dtype=np.int64)
+        self.river_counts = np.zeros((num_envs, 4, 37), dtype=np.uint8)
+        self.dora_counts = np.zeros((num_envs, 37), dtype=np.uint8)
+        self.current_player = np.zeros(num_envs, dtype=np.int64)
+        self.dealer = np.zeros(num_envs, dtype=np.int64)
+        self.round_wind = np.zeros(num_envs, dtype=np.int64)
+        self.episode_count = np.zeros(num_envs, dtype=np.int64)
+
+        # 觀察特徵（同ObservationEncoder，以絕對座位保存並隨摸打增量更新）
+        # 展平為二維以便用np.take一次取出各局視角玩家的列；河牌每局存兩份（8列），
+        # player視角的 自己、下家、對家、上家 即為連續的第 player..player+3 列
+        self._hand_planes = np.zeros((num_envs * 4, 34), dtype=np.float32)
+        self._river_planes = np.zeros((num_envs * 8, 34), dtype=np.float32)
+        self._dora_planes = np.zeros((num_envs, 34), dtype=np.float32)
+        self._seen_planes = np.zeros((num_envs, 34), dtype=np.float32)  # 所有河牌+寶牌指示牌
+
+        self._index = np.arange(num_envs)
+        self._seats = np.arange(4)
+        self._deal_players = np.append(np.repeat(np.arange(4), 13), 0)
+        self._observations = np.zeros((num_envs, OBSERVATION_SIZE), dtype=np.float32)
+
+    @property
+    def wall_remaining(self):
+        """
+        各局牌山剩餘張數
+        """
+        return NUM_INSTANCES - self.wall_position
+
+    def reset(self, return_info=False):
+        """
+        重置全部N局，返回 (N, OBSERVATION_SIZE) 的觀察
+        return_info: 為True時返回 (observations, infos)，infos[i]['action_mask']為合法動作遮罩
+        """
+        self._reset_games(self._index)
+        self._encode(self._index)
+        if return_info:
+            masks = self.action_masks()
+            return self._output(), [{'action_mask': mask} for mask in masks]
+        return self._output()
+
+    def action_masks(self):
+        """
+        各局當前玩家的合法動作遮罩，(N, NUM_ACTIONS) 的bool數組
+        """
+        masks = np.zeros((self.num_envs, NUM_ACTIONS), dtype=bool)
+        return fill_action_mask(self.hand_counts[self._index, self.current_player], masks)
+
+    def step(self, actions):
+        """
+        每局各執行一個動作
+        actions: 長度N的動作數組（0-36為打出該牌ID的牌）
+        返回: (observations, rewards, dones, infos)
+              結束的局已自動重置，observations為新局的觀察，
+              結束時的觀察放在infos[i]['terminal_observation']，
+              infos[i]['action_mask']為（重置後）當前玩家的合法動作遮罩
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = self._index
+        player = self.current_player
+        counts = self.hand_counts[rows, player]
+
+        # 檢查手牌中是否有這張牌（普通五只剩赤五時亦可）
+        in_range = actions < 37
+        tile = np.where(in_range, actions, 0)
+        valid = in_range & ((counts[rows, tile] > 0) | (counts[rows, _RED_FALLBACK[tile]] > 0))
+
+        # 輪到的玩家先摸牌（手牌為3n+1張時）
+        draw = valid & (self.hand_sizes[rows, player] % 3 == 1) & (self.wall_position < NUM_INSTANCES)
+        if draw.any():
+            draw_rows = rows[draw]
+            draw_players = player[draw]
+            drawn = INSTANCE_TO_ID[self.walls[draw_rows, self.wall_position[draw_rows]]]
+            self.hand_counts[draw_rows, draw_players, drawn] += 1
+            self.hand_sizes[draw_rows, draw_players] += 1
+            self.wall_position[draw_rows] += 1
+            self._hand_planes[draw_rows * 4 + draw_players, _PLANE_ARRAY[drawn]] += TILE_UNIT
+
+        # 打牌並輪到下一位玩家（摸牌後手牌仍只有赤五時改打赤五）
+        valid_rows = rows[valid]
+        valid_players = player[valid]
+        valid_tiles = tile[valid]
+        missing = self.hand_counts[valid_rows, valid_players, valid_tiles] == 0
+        valid_tiles[missing] = _RED_FALLBACK[valid_tiles[missing]]
+        self.hand_counts[valid_rows, valid_players, valid_tiles] -= 1
+        self.hand_sizes[valid_rows, valid_players] -= 1
+        self.river_counts[valid_rows, valid_players, valid_tiles] += 1
+        self.current_player[valid_rows] = (valid_players + 1) % 4
+
+        planes = _PLANE_ARRAY[valid_tiles]
+        river_rows = valid_rows * 8 + valid_players
+        self._hand_planes[valid_rows * 4 + valid_players, planes] -= TILE_UNIT
+        self._river_planes[river_rows, planes] += TILE_UNIT
+        self._river_planes[river_rows + 4, planes] += TILE_UNIT
+        self._seen_planes[valid_rows, planes] += TILE_UNIT
+
+        # 牌山耗盡或當前玩家和牌時結束（只有14張的手牌可能和牌）
+        dones = self.wall_remaining <= 14
+        full = self.hand_sizes[rows, self.current_player] == 14
+        if full.any():
+            full_rows = rows[full]
+            dones[full_rows] |= check_win_batch(self.hand_counts[full_rows, self.current_player[full_rows]])
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+
+        self._encode(rows)
+        terminal = {}
+        if dones.any():
+            done_rows = rows[dones]
+            for row in done_rows:
+                terminal[row] = self._observations[row].copy()
+            self._reset_games(done_rows)
+            self._encode(done_rows)
+        infos = [{'action_mask': mask} for mask in self.action_masks()]
+        for row, observation in terminal.items():
+            infos[row]['terminal_observation'] = observation
+        return self._output(), rewards, dones, infos
+
+    def _output(self):
+        return self._observations.copy() if self.copy_observation else self._observations
+
+    def _reset_games(self, rows):
+        """
+        重置指定的局：洗牌、發牌並翻開寶牌指示牌
+        """
+        count = len(rows)
+        walls = self.rng.permuted(self.walls[rows], axis=1)
+        self.walls[rows] = walls
+        self.episode_count[rows] += 1
+        self.current_player[rows] = 0
+        self.dealer[rows] = 0
+        self.round_wind[rows] = 0
+        self.wall_position[rows] = _DEAL_SIZE
+
+        # 以 局*148 + 玩家*37 + 牌ID 為索引一次統計所有配牌
+        deal_players = np.tile(self._deal_players, (count, 1))
+        deal_players[:, -1] = self.dealer[rows]
+        ids = INSTANCE_TO_ID[walls[:, :_DEAL_SIZE]].astype(np.int64)
+        ids += deal_players * 37 + np.arange(count)[:, None] * (4 * 37)
+        hand_counts = np.bincount(ids.ravel(), minlength=count * 4 * 37).reshape(count * 4, 37)
+        self.hand_counts[rows] = hand_counts.reshape(count, 4, 37)
+        self.hand_sizes[rows] = 13
+        self.hand_sizes[rows, self.dealer[rows]] = 14
+
+        self.river_counts[rows] = 0
+        self.dora_counts[rows] = 0
+        self.dora_counts[rows, INSTANCE_TO_ID[walls[:, DORA_INDICATOR_POSITION]]] = 1
+
+        # 重建觀察特徵
+        self._hand_planes[(rows[:, None] * 4 + self._seats).ravel()] = np.matmul(hand_counts, _FOLD_MATRIX)
+        self._river_planes[(rows[:, None] * 8 + np.arange(8)).ravel()] = 0
+        dora_planes = np.matmul(self.dora_counts[rows], _FOLD_MATRIX)
+        self._dora_planes[rows] = dora_planes
+        self._seen_planes[rows] = dora_planes
+
+    def _encode(self, rows):
+        """
+        以各局當前玩家的視角寫入指定局的觀察向量
+        rows為全部局時直接寫入緩衝區，否則寫入暫存數組後再放回
+        """
+        count = len(rows)
+        obs = self._observations if count == self.num_envs else np.empty((count, OBSERVATION_SIZE), np.float32)
+        player = self.current_player[rows]
+
+        hand = np.take(self._hand_planes, rows * 4 + player, axis=0)
+        obs[:, HAND_SLICE] = hand
+        obs[:, RED_FIVE_SLICE] = self.hand_counts[rows, player, RED_FIVE_MAN:]
+        river_rows = (rows * 8 + player)[:, None] + self._seats
+        obs[:, RIVER_SLICE] = np.take(self._river_planes, river_rows, axis=0).reshape(count, -1)
+        obs[:, DORA_SLICE] = self._dora_planes[rows]
+        obs[:, ROUND_WIND_SLICE] = _ONE_HOT[self.round_wind[rows]]
+        obs[:, SEAT_WIND_SLICE] = _ONE_HOT[(player - self.dealer[rows]) % 4]
+        np.add(hand, self._seen_planes[rows], out=obs[:, VISIBLE_SLICE])
+        obs[:, RIICHI_SLICE] = 0
+        obs[:, WALL_SLICE] = (self.wall_remaining[rows] / NUM_INSTANCES)[:, None]
+        if obs is not self._observations:
+            self._observations[rows] = obs
@@ -0,0 +1,69 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from src.environment.observation import (OBSERVATION_SIZE, HAND_SLICE, RED_FIVE_SLICE, RIVER_SLICE, DORA_SLICE,
+                                         ROUND_WIND_SLICE, SEAT_WIND_SLICE, VISIBLE_SLICE, RIICHI_SLICE, WALL_SLICE)
+
+# 打牌動作：0-33為各種牌，34-36為赤五萬、赤五筒、赤五索（對應第4、13、22欄）
+_NUM_TILE_ACTIONS = 37
+_FIVE_COLUMNS = [4, 13, 22]
+
+def _plane_index():
+    """
+    建立 (通道, 34) 的索引：觀察向量末端補一個0後以此索引取值，一次得到所有牌面平面
+    通道依序為 手牌、4家河牌、寶牌指示牌、可見牌、赤五（只在五的欄位有值），
+    以及場風、自風、立直、牌山剩餘等純量特徵（每個純量擴展成一整個通道）
+    """
+    zero = OBSERVATION_SIZE
+    rows = [np.arange(HAND_SLICE.start, HAND_SLICE.stop)]
+    rows += list(np.arange(RIVER_SLICE.start, RIVER_SLICE.stop).reshape(4, 34))
+    rows += [np.arange(DORA_SLICE.start, DORA_SLICE.stop), np.arange(VISIBLE_SLICE.start, VISIBLE_SLICE.stop)]
+    red_row = np.full(34, zero)
+    red_row[_FIVE_COLUMNS] = np.arange(RED_FIVE_SLICE.start, RED_FIVE_SLICE.stop)
+    rows.append(red_row)
+    for field in (ROUND_WIND_SLICE, SEAT_WIND_SLICE, RIICHI_SLICE, WALL_SLICE):
+        rows += [np.full(34, i) for i in range(field.start, field.stop)]
+    return torch.as_tensor(np.stack(rows), dtype=torch.long)
+
+
+class ResidualBlock(nn.Module):
+    def __init__(self, channels):
+        super(ResidualBlock, self).__init__()
+        self.conv1 = nn.Conv1d(channels, channels, kernel_size=3, padding=1)
+        self.conv2 = nn.Conv1d(channels, channels, kernel_size=3, padding=1)
+
+    def forward(self, x):
+        return F.relu(x + self.conv2(F.relu(self.conv1(x))))
+
+
+class TilePlaneDQN(nn.Module):
+    """
+    以34欄牌面平面為輸入的卷積網絡：一維卷積與殘差塊在所有牌之間共用權重，
+    參數量與每種牌的特徵數成正比，而不是與整個觀察向量的長度成正比
+    每張牌的打牌Q值由該欄的輸出直接得到（赤五使用第二個輸出通道的五的欄位），
+    其餘保留動作由全域平均後的特徵以線性層輸出
+    """
+    def __init__(self, input_dim, output_dim, channels=32, blocks=2):
+        super(TilePlaneDQN, self).__init__()
+        if input_dim != OBSERVATION_SIZE:
+            raise ValueError(f"TilePlaneDQN需要長度{OBSERVATION_SIZE}的觀察向量")
+        plane_index = _plane_index()
+        self.num_planes = plane_index.shape[0]
+        self.register_buffer("plane_index", plane_index.reshape(-1), persistent=False)
+        self.stem = nn.Conv1d(self.num_planes, channels, kernel_size=3, padding=1)
+        self.blocks = nn.Sequential(*(ResidualBlock(channels) for _ in range(blocks)))
+        self.tile_head = nn.Conv1d(channels, 2, kernel_size=1)
+        self.other_head = nn.Linear(channels, output_dim - _NUM_TILE_ACTIONS)
+
+    def planes(self, x):
+        """
+        (N, OBSERVATION_SIZE) 的觀察 -> (N, 通道, 34) 的牌面平面
+        """
+        x = F.pad(x, (0, 1))
+        return x.index_select(1, self.plane_index).view(-1, self.num_planes, 34)
+
+    def forward(self, x):
+        x = self.blocks(F.relu(self.stem(self.planes(x))))
+        tiles = self.tile_head(x)
+        return torch.cat((tiles[:, 0], tiles[:, 1, _FIVE_COLUMNS], self.other_head(x.mean(dim=2))), dim=1)
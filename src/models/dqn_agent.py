@@ -4,7 +4,10 @@ import torch.optim as optim
 import torch.nn.functional as F
 import numpy as np
 import random
-from collections import deque
+import warnings
+from src.models.replay_buffer import ReplayBuffer, CompactReplayBuffer, PrioritizedReplayBuffer
+from src.models.conv_dqn import TilePlaneDQN
+from src.environment.observation import HAND_SLICE, RED_FIVE_SLICE
 
 # 定義神經網絡模型
 class MahjongDQN(nn.Module):
@@ -21,17 +24,129 @@ class MahjongDQN(nn.Module):
         x = F.relu(self.fc3(x))
         return self.fc4(x)
 
+class DuelingMahjongDQN(nn.Module):
+    """
+    Dueling架構：共用前兩層後分為狀態價值V(s)與動作優勢A(s, a)兩個分支，
+    Q(s, a) = V(s) + A(s, a) - mean_a A(s, a)
+    """
+    def __init__(self, input_dim, output_dim):
+        super(DuelingMahjongDQN, self).__init__()
+        self.fc1 = nn.Linear(input_dim, 256)
+        self.fc2 = nn.Linear(256, 128)
+        self.value_fc = nn.Linear(128, 64)
+        self.value = nn.Linear(64, 1)
+        self.advantage_fc = nn.Linear(128, 64)
+        self.advantage = nn.Linear(64, output_dim)
+
+    def forward(self, x):
+        x = F.relu(self.fc1(x))
+        x = F.relu(self.fc2(x))
+        value = self.value(F.relu(self.value_fc(x)))
+        advantage = self.advantage(F.relu(self.advantage_fc(x)))
+        return value + advantage - advantage.mean(dim=1, keepdim=True)
+
+def masked_argmax(q_values, mask=None):
+    """
+    在合法動作中取Q值最大的動作
+    q_values: (N, A) 的Q值張量；mask: (N, A) 的bool張量，None表示所有動作皆合法
+    返回: 長度N的動作張量
+    """
+    if mask is not None:
+        q_values = q_values.masked_fill(~mask, float('-inf'))
+    return q_values.argmax(dim=1)
+
+def masked_random_actions(mask=None, batch_size=None, action_size=None, device=None):
+    """
+    在合法動作中均勻隨機選擇動作（對每個合法動作取均勻隨機數，不合法動作設為-1，再取argmax）
+    mask: (N, A) 的bool張量；為None時需提供batch_size與action_size，在所有動作中選擇
+    返回: 長度N的動作張量
+    """
+    if mask is None:
+        return torch.randint(action_size, (batch_size,), device=device)
+    return torch.rand(mask.shape, device=mask.device).masked_fill(~mask, -1).argmax(dim=1)
+
+def legal_action_masks(states):
+    """
+    由觀察向量的手牌欄位推得合法動作遮罩，與環境的fill_action_mask一致
+    （手牌中有的牌可以打出，赤五另外對應動作34-36）
+    states: (N, OBSERVATION_SIZE) 的觀察張量
+    返回: (N, 37) 的bool張量，即打牌動作部分的遮罩
+    """
+    return torch.cat((states[:, HAND_SLICE] > 0, states[:, RED_FIVE_SLICE] > 0), dim=1)
+
+def compile_for_inference(model, method, example_input):
+    """
+    返回用於推論的模型（與model共用參數，訓練更新後不需重新編譯）
+    method: "trace" 以TorchScript追蹤；"compile" 以torch.compile編譯
+    編譯失敗或以example_input試跑的結果與eager不一致時印出原因，返回原本的eager模型
+    """
+    if method not in ("trace", "compile"):
+        raise ValueError(f"不支援的編譯方式: {method}")
+    try:
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message=".*torch.jit.*deprecated")
+            if method == "trace":
+                with torch.no_grad():
+                    compiled = torch.jit.trace(model, example_input)
+            else:
+                compiled = torch.compile(model)
+            with torch.inference_mode():
+                if not torch.allclose(compiled(example_input), model(example_input), atol=1e-5):
+                    raise RuntimeError("編譯後的輸出與eager模型不一致")
+    except Exception as error:
+        print(f"推論模型編譯失敗，改用eager模式: {error}")
+        return model
+    return compiled
+
+def apex_epsilons(num_envs, base=0.4, alpha=7.0):
+    """
+    Ape-X的各環境固定探索率：第i個環境為 base ** (1 + alpha * i / (N - 1))
+    從base到接近0，讓不同環境同時進行大量探索與接近貪婪的行動
+    """
+    if num_envs == 1:
+        return np.array([base], dtype=np.float32)
+    exponents = 1 + alpha * np.arange(num_envs) / (num_envs - 1)
+    return (base ** exponents).astype(np.float32)
+
 # 定義DQN代理
 class DQNAgent:
-    def __init__(self, state_size, action_size, device=None):
+    def __init__(self, state_size, action_size, device=None, memory_size=10000, compact_memory=False,
+                 prioritized=False, n_step=1, num_envs=1, double_dqn=False, dueling=False, tau=None,
+                 conv=False, compile_inference=None, n_step_accumulated=False):
         self.state_size = state_size
         self.action_size = action_size
-        self.memory = deque(maxlen=10000)  # 經驗回放記憶體
         self.gamma = 0.95    # 折扣因子
+        # 經驗回放記憶體（預先配置的環形緩衝區）；compact_memory時以uint8保存且每個觀察只存一次，
+        # prioritized時依TD誤差優先抽樣並以重要性抽樣權重修正損失，
+        # n_step > 1 時存入n步回報（num_envs為向量化環境的環境數），自舉折扣為 gamma ** n_step；
+        # n_step_accumulated時存入的經驗已在外部累積n步回報（例如Ape-X的actors），記憶體直接保存
+        self.prioritized = prioritized
+        self.n_step = n_step
+        memory_n_step = 1 if n_step_accumulated else n_step
+        if compact_memory and n_step > 1:
+            raise ValueError("精簡經驗回放不支援n步回報")
+        if compact_memory and prioritized:
+            raise ValueError("精簡經驗回放不支援優先經驗回放")
+        if conv and dueling:
+            raise ValueError("牌面卷積網絡不支援dueling架構")
+        if prioritized:
+            self.memory = PrioritizedReplayBuffer(memory_size, state_size, n_step=memory_n_step, gamma=self.gamma,
+                                                  num_envs=num_envs)
+        elif compact_memory:
+            self.memory = CompactReplayBuffer(memory_size, state_size, num_envs=num_envs)
+        else:
+            self.memory = ReplayBuffer(memory_size, state_size, n_step=memory_n_step, gamma=self.gamma,
+                                       num_envs=num_envs)
         self.epsilon = 1.0   # 探索率
         self.epsilon_min = 0.01
         self.epsilon_decay = 0.995
         self.batch_size = 64
+        # double_dqn: 以線上網絡在下一狀態的合法動作中選動作、目標網絡估值，減少高估
+        # conv: 使用以牌面平面為輸入的卷積網絡（TilePlaneDQN）取代全連接網絡
+        # compile_inference: "trace" 或 "compile" 時act/act_batch使用編譯後的推論模型（失敗時自動退回eager）
+        # tau: 設定時每次梯度更新後以Polyak平均軟更新目標網絡（target = (1 - tau) * target + tau * online）
+        self.double_dqn = double_dqn
+        self.tau = tau
         
         # 明確檢測CUDA可用性
         if device is None:
@@ -44,69 +159,152 @@ class DQNAgent:
             print(f"GPU名稱: {torch.cuda.get_device_name(0)}")
             print(f"GPU記憶體: {torch.cuda.get_device_properties(0).total_memory / 1024 / 1024 / 1024:.2f} GB")
         
-        self.model = MahjongDQN(state_size, action_size).to(self.device)
-        self.target_model = MahjongDQN(state_size, action_size).to(self.device)
+        network = TilePlaneDQN if conv else DuelingMahjongDQN if dueling else MahjongDQN
+        self.model = network(state_size, action_size).to(self.device)
+        self.target_model = network(state_size, action_size).to(self.device)
         self.optimizer = optim.Adam(self.model.parameters())
+        self.policy_model = self.model
+        if compile_inference is not None:
+            example_input = torch.zeros(1, state_size, device=self.device)
+            self.policy_model = compile_for_inference(self.model, compile_inference, example_input)
+        self._online_parameters = list(self.model.parameters())
+        self._target_parameters = list(self.target_model.parameters())
         self.update_target_network()
         
     def update_target_network(self):
         """更新目標網絡參數"""
         self.target_model.load_state_dict(self.model.state_dict())
     
+    def soft_update_target_network(self, tau=None):
+        """
+        以Polyak平均原地軟更新目標網絡參數：target += tau * (online - target)
+        以torch._foreach的融合運算一次處理所有參數，不經過state_dict
+        """
+        tau = self.tau if tau is None else tau
+        with torch.no_grad():
+            torch._foreach_lerp_(self._target_parameters, self._online_parameters, tau)
+    
     def remember(self, state, action, reward, next_state, done):
         """存儲經驗到記憶體"""
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
     
-    def act(self, state, valid_actions=None, epsilon=None):
-        """選擇動作"""
-        if valid_actions is None:
-            valid_actions = list(range(self.action_size))
-            
+    def _action_mask_tensor(self, action_mask, valid_actions, batch_size):
+        """
+        將合法動作遮罩（bool張量/數組）或合法動作列表轉為裝置上的 (batch_size, action_size) bool張量
+        兩者皆未提供時返回None（所有動作皆合法）
+        """
+        if action_mask is None and valid_actions is None:
+            return None
+        if action_mask is None:
+            action_mask = torch.zeros(self.action_size, dtype=torch.bool)
+            action_mask[torch.as_tensor(valid_actions, dtype=torch.long)] = True
+        mask = torch.as_tensor(action_mask, dtype=torch.bool, device=self.device)
+        return mask.reshape(batch_size, self.action_size)
+    
+    def act(self, state, valid_actions=None, epsilon=None, action_mask=None):
+        """
+        選擇動作
+        action_mask: 長度action_size的bool遮罩（張量或數組），例如環境info['action_mask']
+        valid_actions: 舊版的合法動作列表，提供action_mask時忽略
+        """
         # 使用提供的epsilon或者實例的epsilon
         current_epsilon = self.epsilon if epsilon is None else epsilon
-            
+        mask = self._action_mask_tensor(action_mask, valid_actions, 1)
+        
+        # 探索：在合法動作中均勻隨機選擇
         if random.random() <= current_epsilon:
-            return random.choice(valid_actions)
+            if mask is None:
+                return random.randrange(self.action_size)
+            return int(masked_random_actions(mask)[0])
         
-        state_tensor = torch.FloatTensor(state).unsqueeze(0).to(self.device)
-        q_values = self.model(state_tensor).cpu().detach().numpy()[0]
+        state_tensor = torch.as_tensor(state, dtype=torch.float32, device=self.device).unsqueeze(0)
+        with torch.inference_mode():
+            q_values = self.policy_model(state_tensor)
         
-        # 只考慮有效動作
-        valid_q_values = {a: q_values[a] for a in valid_actions}
-        return max(valid_q_values, key=valid_q_values.get)
+        # 只考慮有效動作（在裝置上遮罩後取argmax）
+        return int(masked_argmax(q_values, mask)[0])
+    
+    def act_batch(self, states, action_masks=None, epsilons=None):
+        """
+        一次為多個環境的狀態選擇動作（一次前向傳播），用於向量化環境
+        states: (N, state_size) 的狀態
+        action_masks: (N, action_size) 的bool遮罩（張量或數組），None表示所有動作皆合法
+        epsilons: 各環境的探索率（長度N的數組，見apex_epsilons）或單一數值，None時使用self.epsilon
+        返回: 長度N的動作數組（int64）
+        """
+        if epsilons is None:
+            epsilons = self.epsilon
+        states = torch.as_tensor(states, dtype=torch.float32, device=self.device)
+        batch_size = states.shape[0]
+        mask = self._action_mask_tensor(action_masks, None, batch_size)
+        
+        epsilons = torch.as_tensor(epsilons, dtype=torch.float32, device=self.device)
+        explore = torch.rand(batch_size, device=self.device) <= epsilons
+        if bool(explore.all()):
+            actions = masked_random_actions(mask, batch_size, self.action_size, self.device)
+        else:
+            with torch.inference_mode():
+                actions = masked_argmax(self.policy_model(states), mask)
+            if bool(explore.any()):
+                random_actions = masked_random_actions(mask, batch_size, self.action_size, self.device)
+                actions = torch.where(explore, random_actions, actions)
+        return actions.cpu().numpy()
+    
+    def next_q_values(self, next_states):
+        """
+        目標中下一個狀態的Q值：預設為目標網絡的最大Q值；
+        double DQN時由線上網絡在下一狀態的合法動作中選擇動作，再以目標網絡估值
+        """
+        target_q_values = self.target_model(next_states)
+        if not self.double_dqn:
+            return target_q_values.max(1)[0]
+        next_mask = torch.zeros_like(target_q_values, dtype=torch.bool)
+        next_mask[:, :37] = legal_action_masks(next_states)
+        next_actions = masked_argmax(self.model(next_states), next_mask)
+        return target_q_values.gather(1, next_actions.unsqueeze(1)).squeeze(1)
     
     def replay(self):
-        """從記憶體中隨機抽取批次經驗進行學習"""
+        """
+        從記憶體中隨機抽取批次經驗進行學習
+        返回: 是否進行了梯度更新（記憶體不足一個批次時返回False）
+        """
         if len(self.memory) < self.batch_size:
-            return
-        
-        minibatch = random.sample(self.memory, self.batch_size)
-        states, actions, rewards, next_states, dones = zip(*minibatch)
+            return False
         
-        states = torch.FloatTensor(np.array(states)).to(self.device)
-        actions = torch.LongTensor(actions).to(self.device)
-        rewards = torch.FloatTensor(rewards).to(self.device)
-        next_states = torch.FloatTensor(np.array(next_states)).to(self.device)
-        dones = torch.FloatTensor(dones).to(self.device)
+        # 一次以索引取出整個批次，再直接轉為張量
+        indices = self.memory.sample_indices(self.batch_size)
+        states, actions, rewards, next_states, dones = (
+            torch.from_numpy(array).to(self.device) for array in self.memory.gather(indices))
         
         # 計算當前Q值
         curr_q_values = self.model(states).gather(1, actions.unsqueeze(1)).squeeze(1)
         
-        # 計算下一個狀態的最大Q值
-        next_q_values = self.target_model(next_states).max(1)[0]
+        # 計算下一個狀態的Q值
+        with torch.no_grad():
+            next_q_values = self.next_q_values(next_states)
         
-        # 計算目標Q值
-        target_q_values = rewards + (1 - dones) * self.gamma * next_q_values
+        # 計算目標Q值（n步回報時next_state為n步後的狀態）
+        target_q_values = rewards + (1 - dones) * (self.gamma ** self.n_step) * next_q_values
         
-        # 計算損失並更新網絡
-        loss = F.smooth_l1_loss(curr_q_values, target_q_values)
+        # 計算損失並更新網絡（優先回放時以重要性抽樣權重加權，並以TD誤差更新優先度）
+        if self.prioritized:
+            weights = torch.from_numpy(self.memory.importance_weights(indices)).to(self.device)
+            losses = F.smooth_l1_loss(curr_q_values, target_q_values, reduction='none')
+            loss = (losses * weights).mean()
+            td_errors = (target_q_values - curr_q_values).detach().abs().cpu().numpy()
+            self.memory.update_priorities(indices, td_errors)
+        else:
+            loss = F.smooth_l1_loss(curr_q_values, target_q_values)
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
+        if self.tau is not None:
+            self.soft_update_target_network()
         
         # 更新探索率
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
+        return True
             
     def load(self, name):
         """載入模型權重"""
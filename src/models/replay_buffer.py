@@ -0,0 +1,415 @@
+import numpy as np
+
+class NStepAccumulator:
+    """
+    在存入回放記憶體前累積n步回報
+    每個環境保存最近n筆尚未存入的 (state, action, reward)，滿n筆時輸出最舊的一筆：
+    reward為 sum(gamma**k * r_k)，next_state為n步後的觀察（以 gamma**n 自舉）；
+    局結束（done）時把剩餘各筆以截至結束的折扣回報輸出，done=1（不自舉）
+    """
+
+    def __init__(self, num_envs, n_step, gamma, state_size, state_dtype=np.float32):
+        self.num_envs = num_envs
+        self.n_step = n_step
+        self.gamma = gamma
+        self.states = np.zeros((num_envs, n_step, state_size), dtype=state_dtype)
+        self.actions = np.zeros((num_envs, n_step), dtype=np.int64)
+        self.rewards = np.zeros((num_envs, n_step), dtype=np.float64)
+        self.heads = np.zeros(num_envs, dtype=np.int64)   # 各環境最舊一筆的位置
+        self.counts = np.zeros(num_envs, dtype=np.int64)  # 各環境尚未輸出的筆數
+
+        steps = np.arange(n_step)
+        self._powers = gamma ** steps
+        # _returns_matrix[k, j] = gamma**(k-j)（k >= j），以從第j筆起的折扣回報 = rewards @ 此矩陣
+        self._returns_matrix = np.triu(gamma ** (steps[None, :] - steps[:, None]).astype(np.float64)).T
+        self._index = np.arange(num_envs)
+
+    def _ordered(self, envs):
+        """
+        指定環境由舊到新排列的位置，(len(envs), n_step)
+        """
+        return (self.heads[envs, None] + np.arange(self.n_step)) % self.n_step
+
+    def push(self, states, actions, rewards, next_states, dones, envs=None):
+        """
+        加入各環境的一步，返回可存入的n步經驗
+        (states, actions, rewards, next_states, dones)，沒有時返回None
+        envs: 各筆所屬的環境索引（不可重複），None表示第i筆屬於第i個環境且包含所有環境
+        """
+        envs = self._index if envs is None else np.asarray(envs, dtype=np.int64)
+        slots = (self.heads[envs] + self.counts[envs]) % self.n_step
+        self.states[envs, slots] = states
+        self.actions[envs, slots] = actions
+        self.rewards[envs, slots] = rewards
+        self.counts[envs] += 1
+        dones = np.asarray(dones, dtype=bool)
+        outputs = []
+
+        # 已滿n筆且未結束：輸出最舊的一筆，以n步後的觀察自舉
+        full_rows = np.flatnonzero((self.counts[envs] == self.n_step) & ~dones)
+        full = envs[full_rows]
+        if len(full):
+            order = self._ordered(full)
+            heads = self.heads[full]
+            outputs.append((self.states[full, heads], self.actions[full, heads],
+                            self.rewards[full[:, None], order] @ self._powers,
+                            next_states[full_rows], np.zeros(len(full), dtype=np.float32)))
+            self.heads[full] = (heads + 1) % self.n_step
+            self.counts[full] -= 1
+
+        # 結束：輸出剩餘的每一筆，回報只累積到結束為止
+        ended_rows = np.flatnonzero(dones)
+        ended = envs[ended_rows]
+        if len(ended):
+            order = self._ordered(ended)
+            counts = self.counts[ended]
+            valid = np.arange(self.n_step) < counts[:, None]
+            rewards = np.where(valid, self.rewards[ended[:, None], order], 0)
+            returns = rewards @ self._returns_matrix
+            rows, columns = np.nonzero(valid)
+            positions = order[rows, columns]
+            outputs.append((self.states[ended[rows], positions], self.actions[ended[rows], positions],
+                            returns[rows, columns], next_states[ended_rows[rows]],
+                            np.ones(len(rows), dtype=np.float32)))
+            self.heads[ended] = 0
+            self.counts[ended] = 0
+
+        if not outputs:
+            return None
+        if len(outputs) == 1:
+            return outputs[0]
+        return tuple(np.concatenate(parts) for parts in zip(*outputs))
+
+    def reset(self, envs=None):
+        """
+        捨棄指定環境（預設全部）尚未輸出的步，用於沒有done就中止的局
+        """
+        envs = self._index if envs is None else envs
+        self.heads[envs] = 0
+        self.counts[envs] = 0
+
+
+class ReplayBuffer:
+    """
+    環形緩衝區經驗回放記憶體
+    以預先配置的連續數組保存 (state, action, reward, next_state, done)，
+    寫滿後從頭覆寫最舊的經驗；抽樣時以整數索引一次取出整個批次
+    n_step > 1 時在存入前累積n步回報（見NStepAccumulator），此時add_batch每次須為
+    num_envs個環境各一筆，學習時的自舉折扣應為 gamma ** n_step
+    """
+
+    def __init__(self, capacity, state_size, state_dtype=np.float32, seed=None, n_step=1, gamma=0.95, num_envs=1):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.rng = np.random.default_rng(seed)
+        self.n_step = n_step
+        self.n_step_accumulator = None
+        if n_step > 1:
+            self.n_step_accumulator = NStepAccumulator(num_envs, n_step, gamma, state_size, state_dtype)
+
+        # np.zeros在大多數平台上延遲配置實際記憶體，容量數百萬時也只佔用已寫入的部分
+        self.states = np.zeros((capacity, state_size), dtype=state_dtype)
+        self.next_states = np.zeros((capacity, state_size), dtype=state_dtype)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+
+        self.position = 0  # 下一個寫入位置
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        存入一筆經驗（n_step > 1 時視為第0個環境的一步，其餘環境的累積不受影響）
+        """
+        if self.n_step_accumulator is not None:
+            transitions = self.n_step_accumulator.push(np.asarray(state)[None], [action], [reward],
+                                                       np.asarray(next_state)[None], [done], envs=[0])
+            if transitions is not None:
+                self._store_batch(*transitions)
+        else:
+            self._store(state, action, reward, next_state, done)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        一次存入多筆經驗（例如向量化環境的一步），結果與依序呼叫add相同
+        """
+        if self.n_step_accumulator is not None:
+            transitions = self.n_step_accumulator.push(states, actions, rewards, next_states, dones)
+            if transitions is not None:
+                self._store_batch(*transitions)
+        else:
+            self._store_batch(states, actions, rewards, next_states, dones)
+
+    def _store(self, state, action, reward, next_state, done):
+        position = self.position
+        self.states[position] = state
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.next_states[position] = next_state
+        self.dones[position] = done
+        self.position = (position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _store_batch(self, states, actions, rewards, next_states, dones):
+        count = len(actions)
+        if count > self.capacity:
+            # 超過容量時只有最後capacity筆會留下
+            skip = count - self.capacity
+            self.position = (self.position + skip) % self.capacity
+            self.size = self.capacity
+            states, actions, rewards = states[skip:], actions[skip:], rewards[skip:]
+            next_states, dones = next_states[skip:], dones[skip:]
+            count = self.capacity
+        indices = (self.position + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample_indices(self, batch_size):
+        """
+        均勻隨機抽取batch_size個已存入經驗的索引（可重複）
+        """
+        return self.rng.integers(0, self.size, batch_size)
+
+    def gather(self, indices):
+        """
+        依索引取出批次：返回 (states, actions, rewards, next_states, dones) 的NumPy數組
+        """
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices])
+
+    def sample(self, batch_size):
+        """
+        均勻隨機抽取一個批次
+        """
+        return self.gather(self.sample_indices(batch_size))
+
+
+class CompactReplayBuffer:
+    """
+    觀察去重的精簡經驗回放記憶體
+    每個環境一條環形序列，每一格保存一個以uint8量化的觀察及以該觀察為起點的
+    (action, reward, done)，next_state即為下一格的觀察，因此連續的經驗只保存一次觀察
+    一局結束（或新的state與上一筆的next_state不同）時，上一筆的next_state留在
+    獨立的邊界格中，不作為經驗抽樣，以確保next_state可完全還原
+    觀察值需可由divisors無損量化（見observation.quantize_observations），
+    每筆經驗約佔 state_size + 17 位元組，約為ReplayBuffer的1/7
+    """
+
+    def __init__(self, capacity, state_size, num_envs=1, divisors=None, seed=None):
+        if divisors is None:
+            from src.environment.observation import OBSERVATION_DIVISORS
+            divisors = OBSERVATION_DIVISORS
+        self.num_envs = num_envs
+        self.env_capacity = max(2, capacity // num_envs)  # 每個環境的格數
+        self.capacity = self.env_capacity * num_envs
+        self.state_size = state_size
+        self.divisors = np.asarray(divisors, dtype=np.float32)
+        self.rng = np.random.default_rng(seed)
+
+        # 第e個環境使用第 e*env_capacity 起的連續env_capacity格
+        self.frames = np.zeros((self.capacity, state_size), dtype=np.uint8)
+        self.actions = np.zeros(self.capacity, dtype=np.int64)
+        self.rewards = np.zeros(self.capacity, dtype=np.float32)
+        self.dones = np.zeros(self.capacity, dtype=np.float32)
+        self.valid = np.zeros(self.capacity, dtype=bool)  # 該格是否為可抽樣經驗的起點
+
+        self._bases = np.arange(num_envs) * self.env_capacity
+        self._pending = np.full(num_envs, -1, dtype=np.int64)  # 各環境最後一個next_state所在的格（環境內位置）
+        self._written = np.zeros(num_envs, dtype=np.int64)     # 各環境已寫入的格數（不超過env_capacity）
+        self.size = 0                                          # 可抽樣的經驗數
+
+    def __len__(self):
+        return self.size
+
+    def _quantize(self, observations):
+        return np.rint(np.multiply(observations, self.divisors)).astype(np.uint8)
+
+    def _dequantize(self, frames):
+        return np.divide(frames, self.divisors, dtype=np.float32)
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        存入一筆經驗（視為第0個環境的一步，其餘環境的序列不受影響）
+        """
+        self.add_batch(np.asarray(state)[None], np.asarray([action]), np.asarray([reward]),
+                       np.asarray(next_state)[None], np.asarray([done]), envs=[0])
+
+    def add_batch(self, states, actions, rewards, next_states, dones, envs=None):
+        """
+        存入各環境的一筆經驗（例如向量化環境的一步）
+        envs: 各筆所屬的環境索引（不可重複），None表示第i筆屬於第i個環境且包含所有環境
+        """
+        envs = np.arange(self.num_envs) if envs is None else np.asarray(envs, dtype=np.int64)
+        states = self._quantize(states)
+        next_states = self._quantize(next_states)
+        bases = self._bases[envs]
+        pending = self._pending[envs]
+
+        # state與上一筆的next_state相同時接續使用該格，否則寫在下一格（上一格成為邊界格）
+        has_pending = pending >= 0
+        continued = has_pending & (self.frames[bases + np.maximum(pending, 0)] == states).all(axis=1)
+        start = np.where(continued, pending, (pending + 1) % self.env_capacity)
+        following = (start + 1) % self.env_capacity
+        start_slots = bases + start
+        next_slots = bases + following
+
+        self.size -= int(self.valid[start_slots].sum() + self.valid[next_slots].sum())
+        self.frames[start_slots] = states
+        self.actions[start_slots] = actions
+        self.rewards[start_slots] = rewards
+        self.dones[start_slots] = dones
+        self.valid[start_slots] = True
+        self.frames[next_slots] = next_states
+        self.valid[next_slots] = False
+        self.size += len(envs)
+
+        self._written[envs] = np.minimum(self._written[envs] + np.where(continued, 1, 2), self.env_capacity)
+        self._pending[envs] = following
+
+    def sample_indices(self, batch_size):
+        """
+        均勻隨機抽取batch_size個可抽樣經驗的格索引（可重複）
+        先依各環境已寫入的格數均勻抽取，再對抽到邊界格的部分重新抽取
+        """
+        filled = np.cumsum(self._written)
+        indices = np.empty(batch_size, dtype=np.int64)
+        remaining = np.arange(batch_size)
+        while len(remaining):
+            draws = self.rng.integers(0, filled[-1], len(remaining))
+            envs = np.searchsorted(filled, draws, side="right")
+            slots = self._bases[envs] + draws - (filled[envs] - self._written[envs])
+            indices[remaining] = slots
+            remaining = remaining[~self.valid[slots]]
+        return indices
+
+    def gather(self, indices):
+        """
+        依格索引取出批次：返回 (states, actions, rewards, next_states, dones) 的NumPy數組（觀察還原為float32）
+        """
+        offsets = indices % self.env_capacity
+        next_indices = indices - offsets + (offsets + 1) % self.env_capacity
+        return (self._dequantize(self.frames[indices]), self.actions[indices], self.rewards[indices],
+                self._dequantize(self.frames[next_indices]), self.dones[indices])
+
+    def sample(self, batch_size):
+        """
+        均勻隨機抽取一個批次
+        """
+        return self.gather(self.sample_indices(batch_size))
+
+
+class SumTree:
+    """
+    以數組實作的完全二元樹，同時維護區間和與區間最小值
+    葉節點為第 leaf_count..2*leaf_count-1 格（leaf_count為不小於容量的2的冪），根為第1格
+    update與find都以NumPy對整批索引逐層處理，每層一次向量運算，共O(log n)層
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.leaf_count = 1 << max(0, int(capacity - 1).bit_length())
+        self.depth = self.leaf_count.bit_length() - 1
+        self.sums = np.zeros(2 * self.leaf_count, dtype=np.float64)
+        self.mins = np.full(2 * self.leaf_count, np.inf, dtype=np.float64)
+
+    @property
+    def total(self):
+        return self.sums[1]
+
+    @property
+    def min(self):
+        return self.mins[1]
+
+    def update(self, indices, values):
+        """
+        設定indices位置的值（索引重複時以最後一個為準），並更新所有祖先節點
+        """
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaf_count
+        self.sums[nodes] = values
+        self.mins[nodes] = values
+        # 同一父節點重複出現時計算結果相同，不需去重
+        for _ in range(self.depth):
+            nodes >>= 1
+            children = nodes << 1
+            self.sums[nodes] = self.sums[children] + self.sums[children + 1]
+            self.mins[nodes] = np.minimum(self.mins[children], self.mins[children + 1])
+
+    def get(self, indices):
+        return self.sums[np.asarray(indices, dtype=np.int64) + self.leaf_count]
+
+    def find(self, values):
+        """
+        對每個前綴和values（0 <= v < total）找出累積和首次超過v的葉索引
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.sums[nodes << 1]
+            go_right = values >= left
+            values -= np.where(go_right, left, 0)
+            nodes = (nodes << 1) + go_right
+        return nodes - self.leaf_count
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    優先經驗回放（Prioritized Experience Replay）
+    每筆經驗的抽樣機率與 (|TD誤差| + epsilon) ** alpha 成正比，新經驗以目前最大優先度存入，
+    以重要性抽樣權重 (N * P(i)) ** -beta / max_w 修正偏差，beta隨每次update_priorities逐步增加至1
+    """
+
+    def __init__(self, capacity, state_size, alpha=0.6, beta=0.4, beta_increment=1e-4,
+                 epsilon=1e-6, state_dtype=np.float32, seed=None, n_step=1, gamma=0.95, num_envs=1):
+        super().__init__(capacity, state_size, state_dtype=state_dtype, seed=seed,
+                         n_step=n_step, gamma=gamma, num_envs=num_envs)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0  # 已乘上alpha次方的最大優先度
+
+    def _store(self, state, action, reward, next_state, done):
+        position = self.position
+        super()._store(state, action, reward, next_state, done)
+        self.tree.update([position], [self.max_priority])
+
+    def _store_batch(self, states, actions, rewards, next_states, dones):
+        count = min(len(actions), self.capacity)
+        indices = (self.position + len(actions) - count + np.arange(count)) % self.capacity
+        super()._store_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(indices, np.full(count, self.max_priority))
+
+    def sample_indices(self, batch_size):
+        """
+        依優先度分層抽樣：將總和分成batch_size段，每段各抽一個前綴和
+        """
+        segment = self.tree.total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        return np.minimum(self.tree.find(values), self.size - 1)
+
+    def importance_weights(self, indices):
+        """
+        抽到的經驗的重要性抽樣權重（除以最大可能權重，範圍0-1）
+        """
+        probabilities = self.tree.get(indices) / self.tree.total
+        min_probability = self.tree.min / self.tree.total
+        weights = (probabilities / min_probability) ** -self.beta
+        return weights.astype(np.float32)
+
+    def update_priorities(self, indices, td_errors):
+        """
+        以新的TD誤差批次更新優先度，並增加beta
+        """
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+        self.tree.update(indices, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.beta = min(1.0, self.beta + self.beta_increment)
@@ -0,0 +1,116 @@
+import multiprocessing as mp
+import time
+import numpy as np
+import torch
+
+class SharedWeights:
+    """
+    learner與actors共享的模型參數：共享記憶體中的扁平float32數組加上版本號
+    版本號以seqlock方式使用：寫入期間為奇數，寫入完成後為偶數，讀取端不需要鎖
+    只支援單一寫入者（learner），讀取端以WeightSubscriber把參數映射進自己的模型
+    """
+
+    def __init__(self, model, ctx=None):
+        ctx = ctx or mp.get_context()
+        self.shapes = [tuple(parameter.shape) for parameter in model.parameters()]
+        self.size = sum(int(np.prod(shape)) for shape in self.shapes)
+        self.nbytes = self.size * 4
+        self.buffer = ctx.RawArray("f", self.size)
+        self._version = ctx.RawValue("q", 0)
+        self._views = None
+        # 發佈統計（只在寫入端累計）
+        self.publishes = 0
+        self.publish_seconds = 0.0
+        self.bytes_published = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_views"] = None
+        return state
+
+    @property
+    def version(self):
+        """
+        最近一次完成發佈的版本號（從1開始，0表示尚未發佈）
+        """
+        return self._version.value // 2
+
+    def flat(self):
+        """
+        共享數組的torch視圖（不複製）
+        """
+        return torch.from_numpy(np.frombuffer(self.buffer, dtype=np.float32))
+
+    def publish(self, model):
+        """
+        把模型的目前參數寫入共享數組並增加版本號，返回新版本號
+        """
+        start_time = time.perf_counter()
+        if self._views is None:
+            self._views = [view.view(shape) for view, shape in
+                           zip(self.flat().split([int(np.prod(shape)) for shape in self.shapes]), self.shapes)]
+        self._version.value += 1
+        with torch.no_grad():
+            torch._foreach_copy_(self._views, [parameter.detach().cpu() for parameter in model.parameters()])
+        self._version.value += 1
+        self.publishes += 1
+        self.bytes_published += self.nbytes
+        self.publish_seconds += time.perf_counter() - start_time
+        return self.version
+
+    def publish_stats(self):
+        """
+        返回發佈次數、平均延遲（秒）與累計寫入的位元組數
+        """
+        return {
+            "publishes": self.publishes,
+            "publish_latency": self.publish_seconds / max(self.publishes, 1),
+            "bytes_published": self.bytes_published,
+        }
+
+
+class WeightSubscriber:
+    """
+    讀取端：把模型的所有參數改為同一塊本地扁平張量的視圖，
+    sync時只比較版本號，版本改變才以一次記憶體複製載入全部參數，不經過state_dict或pickle
+    """
+
+    def __init__(self, shared_weights, model):
+        self.shared_weights = shared_weights
+        parameters = list(model.parameters())
+        if [tuple(parameter.shape) for parameter in parameters] != shared_weights.shapes:
+            raise ValueError("模型參數形狀與共享參數不一致")
+        self._flat = torch.empty(shared_weights.size, dtype=torch.float32)
+        offset = 0
+        with torch.no_grad():
+            for parameter in parameters:
+                count = parameter.numel()
+                view = self._flat[offset:offset + count].view_as(parameter)
+                view.copy_(parameter)
+                parameter.data = view
+                offset += count
+        self._source = shared_weights.flat()
+        self.version = 0
+        self.loads = 0
+        self.bytes_loaded = 0
+
+    def sync(self):
+        """
+        共享參數有新版本時載入，返回是否有更新
+        寫入進行中或讀取期間版本改變（讀到不一致的參數）時重新讀取
+        """
+        version = self.shared_weights._version
+        while True:
+            sequence = version.value
+            if sequence // 2 == self.version:
+                return False
+            if sequence % 2:
+                continue
+            with torch.no_grad():
+                self._flat.copy_(self._source)
+            if version.value == sequence:
+                break
+        self.version = sequence // 2
+        self.loads += 1
+        self.bytes_loaded += self.shared_weights.nbytes
+        return True
@@ -6,8 +6,13 @@ from environment.mahjong_env import MahjongEnv
 from models.dqn_agent import DQNAgent
 import time
 import gc
+import argparse
+import random
 
-# 確保隨機性的可重現性
+# 確保隨機性的可重現性（環境的洗牌使用各自的種子，見train_agent的seed與評估環境的EVAL_SEED）
+TRAIN_SEED = 42
+EVAL_SEED = 43
+random.seed(42)
 np.random.seed(42)
 torch.manual_seed(42)
 if torch.cuda.is_available():
@@ -25,12 +30,24 @@ def print_gpu_memory_usage():
             
             print(f"GPU {i} - 已分配: {memory_allocated:.3f} GB, 已保留: {memory_reserved:.3f} GB, 最大分配: {max_memory_allocated:.3f} GB")
 
-def train_agent(episodes=1000, max_steps=1000, target_update=10, save_freq=100, debug_freq=10):
+def train_agent(episodes=1000, max_steps=1000, target_update=10, save_freq=100, debug_freq=10,
+                train_every=1, gradient_steps=1, batch_size=64, warmup=None, double_dqn=False, dueling=False,
+                tau=None, seed=TRAIN_SEED):
     """
     訓練DQN代理
+    train_every: 每執行幾個環境步進行一次訓練
+    gradient_steps: 每次訓練的梯度更新次數
+    batch_size: 每次梯度更新的批次大小
+    warmup: 記憶體中至少有幾筆經驗才開始訓練（預設為batch_size）
+    double_dqn / dueling: 使用double DQN目標 / dueling網絡
+    tau: 設定時每次梯度更新後軟更新目標網絡，不再每target_update個episode硬複製
+    seed: 訓練環境洗牌的種子
+    回放比例（replay ratio）= 梯度更新次數 * batch_size / 環境步數，即每個環境步平均被學習幾次
     """
+    if warmup is None:
+        warmup = batch_size
     # 創建環境
-    env = MahjongEnv()
+    env = MahjongEnv(seed=seed)
     
     # 獲取狀態和動作空間大小
     state_size = env.observation_space.shape[0]
@@ -43,7 +60,8 @@ def train_agent(episodes=1000, max_steps=1000, target_update=10, save_freq=100,
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"訓練使用設備: {device}")
     
-    agent = DQNAgent(state_size, action_size, device)
+    agent = DQNAgent(state_size, action_size, device, double_dqn=double_dqn, dueling=dueling, tau=tau)
+    agent.batch_size = batch_size
     
     # 創建模型保存目錄
     if not os.path.exists('checkpoints'):
@@ -55,22 +73,30 @@ def train_agent(episodes=1000, max_steps=1000, target_update=10, save_freq=100,
     losses = []
     replay_times = []
     
+    # 環境步數與梯度更新次數分開計時
+    env_steps = 0
+    updates = 0
+    env_time = 0.0
+    update_time = 0.0
+    
     # 開始訓練
     total_start_time = time.time()
     
     for episode in range(episodes):
         episode_start_time = time.time()
         # 重置環境
-        state = env.reset()
+        state, info = env.reset(return_info=True)
         total_reward = 0
         replay_count = 0
         
         for step in range(max_steps):
-            # 選擇動作
-            action = agent.act(state)
+            step_start_time = time.perf_counter()
+            
+            # 選擇動作（只從合法動作中選擇，避免浪費步數在無效動作上）
+            action = agent.act(state, action_mask=info['action_mask'])
             
             # 執行動作
-            next_state, reward, done, _ = env.step(action)
+            next_state, reward, done, info = env.step(action)
             
             # 記憶經驗
             agent.remember(state, action, reward, next_state, done)
@@ -78,11 +104,17 @@ def train_agent(episodes=1000, max_steps=1000, target_update=10, save_freq=100,
             # 更新狀態和獎勵
             state = next_state
             total_reward += reward
+            env_steps += 1
+            env_time += time.perf_counter() - step_start_time
             
-            # 從經驗中學習
-            if len(agent.memory) >= agent.batch_size:
-                agent.replay()
-                replay_count += 1
+            # 從經驗中學習：暖身後每train_every步進行gradient_steps次梯度更新
+            if len(agent.memory) >= warmup and env_steps % train_every == 0:
+                update_start_time = time.perf_counter()
+                # 只計入實際進行的更新（warmup小於batch_size時記憶體可能仍不足一個批次）
+                performed = sum(agent.replay() for _ in range(gradient_steps))
+                update_time += time.perf_counter() - update_start_time
+                updates += performed
+                replay_count += performed
             
             # 如果遊戲結束，退出循環
             if done:
@@ -91,8 +123,8 @@ def train_agent(episodes=1000, max_steps=1000, target_update=10, save_freq=100,
         # 記錄每個episode的回放次數
         replay_times.append(replay_count)
         
-        # 定期更新目標網絡
-        if episode % target_update == 0:
+        # 定期更新目標網絡（軟更新時已在每次梯度更新後進行）
+        if tau is None and episode % target_update == 0:
             agent.update_target_network()
         
         # 定期保存模型
@@ -137,6 +169,9 @@ def train_agent(episodes=1000, max_steps=1000, target_update=10, save_freq=100,
             print(f"  平均分數: {avg_score:.2f}")
             print(f"  探索率: {agent.epsilon:.4f}")
             print(f"  平均回放次數: {avg_replay:.2f}")
+            print(f"  環境步數/秒: {env_steps / max(env_time, 1e-9):.1f}")
+            print(f"  梯度更新/秒: {updates / max(update_time, 1e-9):.1f}")
+            print(f"  回放比例: {updates * batch_size / max(env_steps, 1):.2f}")
             print(f"  本集耗時: {episode_time:.2f} 秒")
             print(f"  估計剩餘時間: {remaining_time/60:.2f} 分鐘")
             print_gpu_memory_usage()
@@ -183,13 +218,13 @@ def evaluate_agent(agent, env, episodes=100):
     eval_start_time = time.time()
     
     for episode in range(episodes):
-        state = env.reset()
+        state, info = env.reset(return_info=True)
         total_reward = 0
         done = False
         
         while not done:
-            action = agent.act(state, epsilon=0)  # 無探索
-            next_state, reward, done, _ = env.step(action)
+            action = agent.act(state, action_mask=info['action_mask'], epsilon=0)  # 無探索
+            next_state, reward, done, info = env.step(action)
             state = next_state
             total_reward += reward
             
@@ -214,6 +249,12 @@ def evaluate_agent(agent, env, episodes=100):
     return avg_reward, win_rate
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="訓練麻將AI")
+    parser.add_argument("--actors", type=int, default=0,
+                        help="Ape-X actor進程數量，0表示使用單進程訓練迴圈")
+    parser.add_argument("--updates", type=int, default=10000, help="Ape-X learner的梯度更新次數")
+    args = parser.parse_args()
+
     print("開始訓練麻將AI...")
     print("=" * 50)
     print("系統資訊:")
@@ -232,13 +273,22 @@ if __name__ == "__main__":
     start_time = time.time()
     
     # 訓練代理
-    agent, scores = train_agent(episodes=500, debug_freq=5)
+    if args.actors > 0:
+        from apex import train_apex
+        print(f"Ape-X訓練: {args.actors} 個actor進程 (CPU)")
+        agent, stats = train_apex(num_actors=args.actors, total_updates=args.updates)
+        actor_rates = ", ".join(f"{rate:.0f}" for rate in stats["actor_steps_per_second"])
+        print(f"actors: [{actor_rates}] 步/秒, learner: {stats['updates_per_second']:.1f} 更新/秒")
+        print(f"參數發佈: {stats['publishes']} 次, 平均 {stats['publish_latency'] * 1e6:.0f} 微秒, "
+              f"共 {stats['bytes_published'] / 2 ** 20:.1f} MiB")
+    else:
+        agent, scores = train_agent(episodes=500, debug_freq=5)
     
     training_time = time.time() - start_time
     print(f"訓練完成！總耗時: {training_time/60:.2f} 分鐘")
     
     # 創建新環境進行評估
-    eval_env = MahjongEnv()
+    eval_env = MahjongEnv(seed=EVAL_SEED)
     avg_reward, win_rate = evaluate_agent(agent, eval_env)
     
     print("訓練與評估完成!") 
\ No newline at end of file
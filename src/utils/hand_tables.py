@@ -0,0 +1,606 @@
+from operator import add
+
+import numpy as np
+
+# 每種花色以9個計數（字牌為7個）表示，每個計數0-4，以5進制編碼為查表鍵值
+SUIT_SIZE = 9
+HONOR_SIZE = 7
+SUIT_OFFSETS = (0, 9, 18, 27)  # 萬子, 筒子, 索子, 字牌 在34種牌中的起始位置
+SUIT_LENGTHS = (SUIT_SIZE, SUIT_SIZE, SUIT_SIZE, HONOR_SIZE)
+POW5 = tuple(5 ** i for i in range(SUIT_SIZE + 1))
+
+# 拆解方式中的區塊種類
+SHUNTSU = "順子"
+KOUTSU = "刻子"
+TOITSU = "對子"
+
+# 和牌表的標記位
+FLAG_SETS = 1  # 該花色可完全拆解為順子/刻子
+FLAG_PAIR = 2  # 該花色可拆解為順子/刻子加一組雀頭
+
+
+def encode_suit(counts, start=0, size=SUIT_SIZE):
+    """
+    將一個花色的計數編碼為5進制鍵值
+    counts: 計數序列
+    start: 花色在序列中的起始位置
+    size: 花色的牌種數（數牌9，字牌7）
+    返回: 整數鍵值
+    """
+    key = 0
+    for i in range(start + size - 1, start - 1, -1):
+        key = key * 5 + counts[i]
+    return key
+
+
+def decode_suit(key, size=SUIT_SIZE):
+    """
+    將5進制鍵值還原為計數列表
+    """
+    counts = []
+    for _ in range(size):
+        counts.append(key % 5)
+        key //= 5
+    return counts
+
+
+def enumerate_patterns(size, allow_shuntsu, max_mentsu=4):
+    """
+    列舉一個花色內所有由順子、刻子（最多max_mentsu組）及至多一組雀頭組成的牌型
+    每種牌不超過4張
+    size: 花色的牌種數
+    allow_shuntsu: 是否允許順子（字牌不允許）
+    返回: [(計數列表, 面子數, 雀頭數, 拆解方式), ...]
+          拆解方式為 ((SHUNTSU|KOUTSU|TOITSU, 花色內位置), ...)
+    """
+    # 所有面子（順子以起始位置表示，刻子以位置表示），依固定順序排列以避免重複組合
+    blocks = []
+    if allow_shuntsu:
+        blocks += [(SHUNTSU, i) for i in range(size - 2)]
+    blocks += [(KOUTSU, i) for i in range(size)]
+
+    patterns = []
+    counts = [0] * size
+
+    def add_block(kind, pos, sign):
+        if kind == SHUNTSU:
+            for j in range(3):
+                counts[pos + j] += sign
+        elif kind == KOUTSU:
+            counts[pos] += 3 * sign
+        else:
+            counts[pos] += 2 * sign
+
+    def valid():
+        return all(c <= 4 for c in counts)
+
+    def search(first_block, mentsu, chosen):
+        # 記錄不含雀頭與含雀頭的牌型
+        patterns.append((list(counts), mentsu, 0, tuple(chosen)))
+        for pos in range(size):
+            add_block(TOITSU, pos, 1)
+            if valid():
+                patterns.append((list(counts), mentsu, 1, tuple(chosen) + ((TOITSU, pos),)))
+            add_block(TOITSU, pos, -1)
+
+        if mentsu == max_mentsu:
+            return
+        for b in range(first_block, len(blocks)):
+            kind, pos = blocks[b]
+            add_block(kind, pos, 1)
+            if valid():
+                chosen.append(blocks[b])
+                search(b, mentsu + 1, chosen)
+                chosen.pop()
+            add_block(kind, pos, -1)
+
+    search(0, 0, [])
+    return patterns
+
+
+def _build_agari_table(size, allow_shuntsu):
+    """
+    建立單一花色的和牌查表：鍵值 -> FLAG_SETS / FLAG_PAIR 標記
+    """
+    table = np.zeros(POW5[size], dtype=np.uint8)
+    for pattern, _, pairs, _ in enumerate_patterns(size, allow_shuntsu):
+        key = encode_suit(pattern, 0, size)
+        table[key] |= FLAG_PAIR if pairs else FLAG_SETS
+    return table
+
+
+# 預先計算的和牌表（數牌共用一張表，字牌一張表）
+SUIT_AGARI_TABLE = _build_agari_table(SUIT_SIZE, allow_shuntsu=True)
+HONOR_AGARI_TABLE = _build_agari_table(HONOR_SIZE, allow_shuntsu=False)
+AGARI_TABLES = (SUIT_AGARI_TABLE, SUIT_AGARI_TABLE, SUIT_AGARI_TABLE, HONOR_AGARI_TABLE)
+
+# bytes版本用於單手查表（索引bytes直接得到Python整數，比索引NumPy數組快）
+SUIT_AGARI_BYTES = SUIT_AGARI_TABLE.tobytes()
+HONOR_AGARI_BYTES = HONOR_AGARI_TABLE.tobytes()
+
+
+def hand_keys(normalized):
+    """
+    將長度34的計數列表（每種牌0-4張）一次編碼為四個花色的鍵值
+    normalized: 已將赤寶牌計入普通牌的計數列表
+    返回: [萬子鍵值, 筒子鍵值, 索子鍵值, 字牌鍵值]
+    """
+    (m1, m2, m3, m4, m5, m6, m7, m8, m9,
+     p1, p2, p3, p4, p5, p6, p7, p8, p9,
+     s1, s2, s3, s4, s5, s6, s7, s8, s9,
+     z1, z2, z3, z4, z5, z6, z7) = normalized
+    return [m1 + 5 * (m2 + 5 * (m3 + 5 * (m4 + 5 * (m5 + 5 * (m6 + 5 * (m7 + 5 * (m8 + 5 * m9))))))),
+            p1 + 5 * (p2 + 5 * (p3 + 5 * (p4 + 5 * (p5 + 5 * (p6 + 5 * (p7 + 5 * (p8 + 5 * p9))))))),
+            s1 + 5 * (s2 + 5 * (s3 + 5 * (s4 + 5 * (s5 + 5 * (s6 + 5 * (s7 + 5 * (s8 + 5 * s9))))))),
+            z1 + 5 * (z2 + 5 * (z3 + 5 * (z4 + 5 * (z5 + 5 * (z6 + 5 * z7)))))]
+
+
+# ---------------------------------------------------------------------------
+# 批量和牌判斷用的查表
+#
+# 批量版本將每列計數以一次矩陣乘法轉為四個花色的鍵值（赤寶牌直接計入
+# 對應的五）及總張數，再以一次查表取得每個花色的：
+#   位元0-1: 和牌標記（FLAG_SETS / FLAG_PAIR）
+#   位元2:   國士無雙條件（數牌只有1和9且都有，字牌七種都有）
+#   位元3-6: 恰好2張的牌種數（七對子用）
+# ---------------------------------------------------------------------------
+
+FLAG_KOKUSHI = 4
+PAIR_COUNT_SHIFT = 3
+
+
+def _build_batch_weights():
+    weights = np.zeros((37, 5), dtype=np.float32)
+    for suit, (offset, size) in enumerate(zip(SUIT_OFFSETS, SUIT_LENGTHS)):
+        weights[offset:offset + size, suit] = POW5[:size]
+    # 赤寶牌（ID 34-36）計入各花色的五
+    for suit in range(3):
+        weights[34 + suit, suit] = POW5[4]
+    # 最後一欄為總張數
+    weights[:, 4] = 1
+    return weights
+
+
+def _build_batch_table(agari_table, size):
+    keys = np.arange(POW5[size])
+    digits = np.stack([(keys // POW5[i]) % 5 for i in range(size)], axis=1)
+    pair_counts = (digits == 2).sum(axis=1)
+    if size == SUIT_SIZE:
+        kokushi = (digits[:, 0] >= 1) & (digits[:, -1] >= 1) & (digits[:, 1:-1].sum(axis=1) == 0)
+    else:
+        kokushi = (digits >= 1).all(axis=1)
+    return (agari_table | (kokushi * FLAG_KOKUSHI) | (pair_counts << PAIR_COUNT_SHIFT)).astype(np.uint8)
+
+
+# (37, 5)權重矩陣：前四欄為花色鍵值，最後一欄為總張數
+BATCH_KEY_WEIGHTS = _build_batch_weights()
+
+_batch_tables = None
+
+
+def batch_tables():
+    """
+    取得（首次呼叫時建立）批量判斷用的數牌與字牌查表
+    """
+    global _batch_tables
+    if _batch_tables is None:
+        _batch_tables = (_build_batch_table(SUIT_AGARI_TABLE, SUIT_SIZE),
+                         _build_batch_table(HONOR_AGARI_TABLE, HONOR_SIZE))
+    return _batch_tables
+
+
+def batch_flags(keys):
+    """
+    批量查詢四個花色的標記
+    keys: (N, 4) 鍵值矩陣
+    返回: (N, 4) uint8 標記矩陣
+    """
+    suit_table, honor_table = batch_tables()
+    flags = np.empty(keys.shape, dtype=np.uint8)
+    flags[:, :3] = suit_table[keys[:, :3]]
+    flags[:, 3] = honor_table[keys[:, 3]]
+    return flags
+
+
+def is_standard_agari_batch(flags):
+    """
+    is_standard_agari的向量化版本
+    flags: (N, 4) 標記矩陣
+    返回: (N,) 布林數組
+    """
+    sets = flags & FLAG_SETS
+    has_pair = (flags & FLAG_PAIR) != 0
+    sets_count = sets.sum(axis=1, keepdims=True)
+    return (has_pair & (sets_count - sets == 3)).any(axis=1)
+
+
+def agari_flags(keys):
+    """
+    查詢四個花色鍵值對應的和牌標記
+    """
+    return (SUIT_AGARI_BYTES[keys[0]], SUIT_AGARI_BYTES[keys[1]],
+            SUIT_AGARI_BYTES[keys[2]], HONOR_AGARI_BYTES[keys[3]])
+
+
+_decompositions = None
+
+
+def _build_decompositions(size, allow_shuntsu, offsets):
+    patterns = enumerate_patterns(size, allow_shuntsu)
+    tables = []
+    for offset in offsets:
+        table = {}
+        for pattern, _, pairs, blocks in patterns:
+            key = encode_suit(pattern, 0, size)
+            blocks = tuple((kind, offset + pos) for kind, pos in blocks)
+            table.setdefault(key, ([], []))[pairs].append(blocks)
+        tables.append(table)
+    return tables
+
+
+def suit_decompositions():
+    """
+    取得（首次呼叫時建立）四個花色的拆解表
+    返回: 長度4的列表，每個元素為 {鍵值: (不含雀頭的拆解列表, 含雀頭的拆解列表)}
+          拆解為 ((SHUNTSU|KOUTSU|TOITSU, 牌ID), ...)，牌ID已換算為0-33
+    """
+    global _decompositions
+    if _decompositions is None:
+        _decompositions = (_build_decompositions(SUIT_SIZE, True, SUIT_OFFSETS[:3]) +
+                           _build_decompositions(HONOR_SIZE, False, SUIT_OFFSETS[3:]))
+    return _decompositions
+
+
+def standard_decompositions(keys):
+    """
+    列出四個花色鍵值組成4面子1雀頭（或少於4面子時的n面子1雀頭）的所有拆解方式
+    keys: 四個花色的鍵值
+    返回: 拆解方式列表，每個拆解為依花色順序排列的區塊元組
+    """
+    tables = suit_decompositions()
+    parts = []
+    for suit, key in enumerate(keys):
+        entry = tables[suit].get(key)
+        if entry is None:
+            return []
+        parts.append(entry)
+    
+    results = []
+    for pair_suit in range(4):
+        if not parts[pair_suit][1]:
+            continue
+        combos = [()]
+        for suit in range(4):
+            options = parts[suit][1 if suit == pair_suit else 0]
+            if len(options) == 1:
+                option = options[0]
+                combos = [combo + option for combo in combos]
+            else:
+                combos = [combo + option for combo in combos for option in options]
+        results += combos
+    return results
+
+
+def is_standard_agari(flags):
+    """
+    根據四個花色的查表標記判斷是否為4面子1雀頭的和牌形
+    flags: 四個花色的標記
+    """
+    sets_count = (flags[0] & FLAG_SETS) + (flags[1] & FLAG_SETS) + (flags[2] & FLAG_SETS) + (flags[3] & FLAG_SETS)
+    for flag in flags:
+        # 雀頭所在花色需可拆成面子+雀頭，其餘三個花色需可完全拆成面子
+        if flag & FLAG_PAIR and sets_count - (flag & FLAG_SETS) == 3:
+            return True
+    return False
+
+
+# ---------------------------------------------------------------------------
+# 向聽數計算用的花色距離表
+#
+# 對於一個花色的手牌h與目標牌型w（m組面子+p組雀頭），距離定義為
+# sum(max(w_i - h_i, 0))，即還需要摸入的牌數。每個花色對每種(m, p)
+# 取最小距離，四個花色組合成4面子1雀頭的最小距離減一即為一般形向聽數。
+#
+# 距離表對所有5^9個鍵值一次性計算：距離(h) = min |h' - h|，其中 h' >= h
+# 且包含某個目標牌型。先沿每種牌做前綴最小值得到「包含目標牌型」的標記，
+# 再沿每種牌做後綴最小值（每多摸一張加一）得到距離，兩步都可逐維向量化。
+# ---------------------------------------------------------------------------
+
+MAX_MENTSU = 4
+DISTANCE_SLOTS = (MAX_MENTSU + 1) * 2  # 索引為 面子數 * 2 + 雀頭數
+INFINITE_DISTANCE = 99
+
+
+def _build_distance_table(size, allow_shuntsu):
+    """
+    建立單一花色的距離表
+    返回: 形狀為 (5^size, DISTANCE_SLOTS) 的int8數組
+    """
+    table = np.full((POW5[size], DISTANCE_SLOTS), INFINITE_DISTANCE, dtype=np.int8)
+    for pattern, mentsu, pairs, _ in enumerate_patterns(size, allow_shuntsu):
+        table[encode_suit(pattern, 0, size), mentsu * 2 + pairs] = 0
+
+    # 每一維對應一種牌的張數(0-4)
+    cube = table.reshape((5,) * size + (DISTANCE_SLOTS,))
+    for axis in range(size):
+        view = np.moveaxis(cube, axis, 0)
+        # 包含目標牌型的手牌再多一張仍然包含
+        for count in range(1, 5):
+            np.minimum(view[count], view[count - 1], out=view[count])
+    for axis in range(size):
+        view = np.moveaxis(cube, axis, 0)
+        # 少一張則需多摸一張
+        for count in range(3, -1, -1):
+            np.minimum(view[count], view[count + 1] + 1, out=view[count])
+    return table
+
+
+_distance_tables = None
+# 數牌與字牌距離表上下相接的同一塊數組（字牌從第5^9列起），兩個距離表皆為其視圖
+_stacked_distances = None
+
+
+def distance_tables():
+    """
+    取得（首次呼叫時建立）數牌與字牌的距離表
+    返回: (數牌距離表, 字牌距離表, 數牌距離bytes, 字牌距離bytes)
+    """
+    global _distance_tables, _stacked_distances
+    if _distance_tables is None:
+        _stacked_distances = np.concatenate([_build_distance_table(SUIT_SIZE, allow_shuntsu=True),
+                                             _build_distance_table(HONOR_SIZE, allow_shuntsu=False)])
+        suit_table = _stacked_distances[:POW5[SUIT_SIZE]]
+        honor_table = _stacked_distances[POW5[SUIT_SIZE]:]
+        _distance_tables = (suit_table, honor_table, suit_table.tobytes(), honor_table.tobytes())
+    return _distance_tables
+
+
+def suit_distances(key):
+    """
+    查詢數牌花色鍵值的距離向量
+    返回: 長度10的bytes，索引 面子數 * 2 + 雀頭數
+    """
+    start = key * DISTANCE_SLOTS
+    return distance_tables()[2][start:start + DISTANCE_SLOTS]
+
+
+def honor_distances(key):
+    """
+    查詢字牌鍵值的距離向量
+    返回: 長度10的bytes，索引 面子數 * 2 + 雀頭數
+    """
+    start = key * DISTANCE_SLOTS
+    return distance_tables()[3][start:start + DISTANCE_SLOTS]
+
+
+def combine_distances(a, b):
+    """
+    合併兩組距離向量（min-plus卷積）：面子數相加，雀頭至多一組
+    索引k = 面子數 * 2 + 雀頭數，故兩邊索引相加即為合併後的索引；
+    k為偶數時兩邊都不能含雀頭（索引皆為偶數）
+    """
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, a9 = a
+    b0, b1, b2, b3, b4, b5, b6, b7, b8, b9 = b
+    return (a0 + b0,
+            min(a0 + b1, a1 + b0),
+            min(a0 + b2, a2 + b0),
+            min(a0 + b3, a1 + b2, a2 + b1, a3 + b0),
+            min(a0 + b4, a2 + b2, a4 + b0),
+            min(a0 + b5, a1 + b4, a2 + b3, a3 + b2, a4 + b1, a5 + b0),
+            min(a0 + b6, a2 + b4, a4 + b2, a6 + b0),
+            min(a0 + b7, a1 + b6, a2 + b5, a3 + b4, a4 + b3, a5 + b2, a6 + b1, a7 + b0),
+            min(a0 + b8, a2 + b6, a4 + b4, a6 + b2, a8 + b0),
+            min(a0 + b9, a1 + b8, a2 + b7, a3 + b6, a4 + b5, a5 + b4, a6 + b3, a7 + b2, a8 + b1, a9 + b0))
+
+
+def final_distance(a, b, mentsu):
+    """
+    合併最後兩組距離向量，只計算mentsu組面子加一組雀頭的最小距離
+    """
+    slot = mentsu * 2 + 1
+    return min(map(add, a[:slot + 1], b[slot::-1]))
+
+
+def standard_distance(keys, mentsu=MAX_MENTSU):
+    """
+    計算四個花色鍵值組成mentsu組面子加一組雀頭所需的最少摸牌數
+    """
+    _, _, suit_bytes, honor_bytes = distance_tables()
+    a = keys[0] * DISTANCE_SLOTS
+    b = keys[1] * DISTANCE_SLOTS
+    c = keys[2] * DISTANCE_SLOTS
+    d = keys[3] * DISTANCE_SLOTS
+    combined = combine_distances(suit_bytes[a:a + DISTANCE_SLOTS], suit_bytes[b:b + DISTANCE_SLOTS])
+    combined = combine_distances(combined, suit_bytes[c:c + DISTANCE_SLOTS])
+    return final_distance(combined, honor_bytes[d:d + DISTANCE_SLOTS], mentsu)
+
+
+def distance_row(suit, key):
+    """
+    查詢第suit個花色（0-2數牌，3字牌）鍵值的距離向量
+    """
+    _, _, suit_bytes, honor_bytes = distance_tables()
+    start = key * DISTANCE_SLOTS
+    if suit < 3:
+        return suit_bytes[start:start + DISTANCE_SLOTS]
+    return honor_bytes[start:start + DISTANCE_SLOTS]
+
+
+def leave_one_out(vectors):
+    """
+    對四個花色的距離向量，計算每個花色以外其餘三個花色的合併結果
+    以前後兩半的合併結果共用，只需6次合併
+    """
+    v0, v1, v2, v3 = vectors
+    first = combine_distances(v0, v1)
+    second = combine_distances(v2, v3)
+    return [combine_distances(v1, second), combine_distances(v0, second),
+            combine_distances(first, v3), combine_distances(first, v2)]
+
+
+def _build_effective_masks(table, size):
+    """
+    對每個鍵值與(面子數, 雀頭數)，以位元遮罩記錄摸入哪些牌可使距離減一
+    """
+    masks = np.zeros(table.shape, dtype=np.uint16)
+    cube = table.reshape((5,) * size + (DISTANCE_SLOTS,))
+    mask_cube = masks.reshape(cube.shape)
+    for axis in range(size):
+        # 鍵值中第i種牌對應第 size - 1 - i 維
+        bit = np.uint16(1 << (size - 1 - axis))
+        view = np.moveaxis(cube, axis, 0)
+        mask_view = np.moveaxis(mask_cube, axis, 0)
+        for count in range(4):
+            mask_view[count] |= np.where(view[count + 1] < view[count], bit, np.uint16(0))
+    return masks
+
+
+_effective_masks = None
+_stacked_masks = None
+
+
+def effective_masks():
+    """
+    取得（首次呼叫時建立）數牌與字牌的有效牌遮罩表
+    返回: (數牌遮罩, 字牌遮罩)，皆為可直接以 鍵值 * DISTANCE_SLOTS + 索引 取值的memoryview
+    """
+    global _effective_masks, _stacked_masks
+    if _effective_masks is None:
+        suit_table, honor_table, _, _ = distance_tables()
+        _stacked_masks = np.concatenate([_build_effective_masks(suit_table, SUIT_SIZE),
+                                         _build_effective_masks(honor_table, HONOR_SIZE)])
+        suit_masks = _stacked_masks[:POW5[SUIT_SIZE]]
+        honor_masks = _stacked_masks[POW5[SUIT_SIZE]:]
+        _effective_masks = (memoryview(suit_masks).cast('B').cast('H'),
+                            memoryview(honor_masks).cast('B').cast('H'))
+    return _effective_masks
+
+
+def standard_effective_tiles(keys, vectors, others, mentsu, distance):
+    """
+    列出使一般形距離減少的牌（有效牌）
+    keys: 四個花色的鍵值
+    vectors: 四個花色的距離向量
+    others: 每個花色以外其餘三個花色的合併距離向量（見leave_one_out）
+    mentsu: 目標面子數
+    distance: 目前的一般形距離
+    返回: 有效牌ID列表（0-33，由小到大）
+    
+    某張牌有效，若且唯若其花色在某個達到最小距離的(面子數, 雀頭數)分配下
+    距離會減一，因此只需找出每個花色的最佳分配並合併遮罩
+    """
+    suit_masks, honor_masks = effective_masks()
+    slot = mentsu * 2 + 1
+    tiles = []
+    for suit in range(4):
+        vector = vectors[suit]
+        other = others[suit]
+        masks = suit_masks if suit < 3 else honor_masks
+        base = keys[suit] * DISTANCE_SLOTS
+        mask = 0
+        for index in range(slot + 1):
+            if vector[index] + other[slot - index] == distance:
+                mask |= masks[base + index]
+        offset = SUIT_OFFSETS[suit]
+        while mask:
+            low = mask & -mask
+            tiles.append(offset + low.bit_length() - 1)
+            mask ^= low
+    return tiles
+
+
+# ---------------------------------------------------------------------------
+# 整手打法的向量化有效牌計算（calculate_ukeire用）
+#
+# 打出一張牌只改變一個花色的鍵值。四個花色的兩兩合併對所有打法共用，只計算一次；
+# 每個花色以外三個花色的合併 = 一個花色與另兩個花色的兩兩合併結果再合併，因此每種打法
+# 只需一次合併（四個花色同時進行）加上一次遮罩查表，所有打法以NumPy一次處理。數組以 (DISTANCE_SLOTS, ...) 的索引在前的方式排列，
+# 使取最小值、位元或等歸約都沿第0軸進行（沿很短的最後一軸歸約在NumPy中很慢）。
+# ---------------------------------------------------------------------------
+
+def _build_merge_index():
+    """
+    combine_distances的索引配置：輸出索引k由所有 i + j = k 且兩邊不同時含雀頭的(i, j)取最小值
+    返回: (左索引, 右索引)，皆為 (i, k) 攤平後的數組；不合法的組合以左邊補上的第DISTANCE_SLOTS列（無法達成）代替
+    """
+    left = np.full((DISTANCE_SLOTS, DISTANCE_SLOTS), DISTANCE_SLOTS, dtype=np.intp)
+    right = np.zeros((DISTANCE_SLOTS, DISTANCE_SLOTS), dtype=np.intp)
+    for k in range(DISTANCE_SLOTS):
+        for i in range(k + 1):
+            if i % 2 == 0 or (k - i) % 2 == 0:
+                left[i, k] = i
+                right[i, k] = k - i
+    return left.ravel(), right.ravel()
+
+
+_MERGE_LEFT, _MERGE_RIGHT = _build_merge_index()
+_SUIT_PAIRS = ((0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3))
+_PAIR_FIRST = np.array([a for a, _ in _SUIT_PAIRS])
+_PAIR_SECOND = np.array([b for _, b in _SUIT_PAIRS])
+# 打出花色s的牌時，花色u以外三個花色 = 單一花色_MERGE_SINGLE[s][u]（u != s時為打牌後的花色s）
+# 與兩兩合併_MERGE_PAIR[s][u]的合併
+_MERGE_SINGLE = np.array([[s if u != s else min({0, 1, 2, 3} - {s}) for u in range(4)] for s in range(4)])
+_MERGE_PAIR = np.array([[_SUIT_PAIRS.index(tuple(sorted(set(range(4)) - {u, int(_MERGE_SINGLE[s][u])})))
+                         for u in range(4)] for s in range(4)])
+_SUIT_RANGE = np.arange(4)
+_TILE_SUITS = np.array([min(tile // SUIT_SIZE, 3) for tile in range(34)])
+_TILE_POWERS = np.array([POW5[tile - SUIT_OFFSETS[_TILE_SUITS[tile]]] for tile in range(34)])
+# 9位元遮罩展開為各位元的bool；四個花色各9欄展開後對應的牌（字牌只有7欄）
+_BIT_TABLE = (np.arange(1 << SUIT_SIZE)[:, None] >> np.arange(SUIT_SIZE) & 1).astype(bool)
+_BIT_COLUMNS = np.array([suit * SUIT_SIZE + bit for suit in range(4) for bit in range(SUIT_LENGTHS[suit])])
+# 四個花色在上下相接的距離表/遮罩表中的列偏移
+_SUIT_BASES = np.array([0, 0, 0, POW5[SUIT_SIZE]])
+
+
+def stacked_tables():
+    """
+    取得上下相接的距離表與有效牌遮罩表（與distance_tables、effective_masks共用記憶體）
+    返回: (距離表 (5^9 + 5^7, DISTANCE_SLOTS) int8, 遮罩表 (5^9 + 5^7, DISTANCE_SLOTS) uint16)
+    """
+    effective_masks()
+    return _stacked_distances, _stacked_masks
+
+
+def _merge_columns(a, b):
+    """
+    combine_distances的向量化版本：a為 (DISTANCE_SLOTS + 1, ...)（最後一列為無法達成），
+    b為 (DISTANCE_SLOTS, ...) 的int16數組
+    """
+    merged = a.take(_MERGE_LEFT, axis=0) + b.take(_MERGE_RIGHT, axis=0)
+    return merged.reshape((DISTANCE_SLOTS, DISTANCE_SLOTS) + b.shape[1:]).min(axis=0)
+
+
+def discard_effective_tiles(keys, discards, mentsu):
+    """
+    對3n+2張手牌的每種打法一次計算一般形距離與有效牌
+    keys: 四個花色的鍵值；discards: 打出的牌（0-33，不重複）的數組；mentsu: 打牌後的目標面子數
+    返回: (各打法打牌後的一般形距離 (D,), 各打法的有效牌 (D, 34) bool數組)
+    """
+    distances, masks = stacked_tables()
+    slot = mentsu * 2 + 1
+    count = len(discards)
+    rows = _SUIT_BASES + np.asarray(keys)
+    suits = _TILE_SUITS[discards]
+    own = suits[:, None] == _SUIT_RANGE
+    discard_keys = rows[suits] - _TILE_POWERS[discards]
+    # 前4欄為原本四個花色的距離向量，其後為各打法打牌花色的新向量，最後補一列無法達成供合併使用
+    # int8的距離相加可能溢位（無法達成為99），取出後轉為int16
+    columns = np.full((DISTANCE_SLOTS + 1, count + 4), INFINITE_DISTANCE, dtype=np.int16)
+    columns[:DISTANCE_SLOTS] = distances[np.concatenate((rows, discard_keys))].T
+    pairs = _merge_columns(columns.take(_PAIR_FIRST, axis=1), columns.take(_PAIR_SECOND, axis=1))
+
+    # 每種打法中每個花色u以外三個花色的合併結果：u不是打牌花色時，單一花色為打牌花色的新向量
+    discard_columns = np.arange(4, count + 4)[:, None]
+    singles = np.where(own, _MERGE_SINGLE[suits], discard_columns)
+    others = _merge_columns(columns.take(singles, axis=1), pairs.take(_MERGE_PAIR[suits], axis=1))
+
+    # 任一花色的距離向量與其餘三個花色的合併結果相加，最小值皆為打牌後的一般形距離
+    vectors = columns[:slot + 1].take(np.where(own, discard_columns, _SUIT_RANGE), axis=1)
+    totals = vectors + others[slot::-1]
+    standard = totals[:, :, 0].min(axis=0)
+
+    # 在達到最小距離的分配下，該花色摸入後距離減一的牌即為有效牌
+    discard_rows = np.where(own, discard_keys[:, None], rows)
+    suit_masks = masks[discard_rows].transpose(2, 0, 1)[:slot + 1]
+    bits = np.bitwise_or.reduce(np.where(totals == standard[:, None], suit_masks, 0), axis=0)
+    return standard, _BIT_TABLE[bits].reshape(count, -1)[:, _BIT_COLUMNS]
@@ -1,7 +1,15 @@
 import os
 import json
 import datetime
-from src.utils.mahjong_utils import id_to_string, id_to_emoji, tile_to_id, sort_hand, analyze_winning_hand, calculate_score, hand_to_counts
+from src.utils.mahjong_utils import id_to_string, id_to_emoji, tile_to_id, sort_hand, analyze_winning_hand, calculate_score, hand_to_counts, get_yaku_han
+
+def _to_id(tile):
+    """
+    將牌轉換為牌ID，接受牌ID(0-36)或舊版的 (suit, value) 表示
+    """
+    if isinstance(tile, tuple):
+        return tile_to_id(tile)
+    return int(tile)
 
 class MahjongLogger:
     """
@@ -59,8 +67,8 @@ class MahjongLogger:
             
         try:
             # 轉換牌ID為可讀形式和Emoji
-            readable_tiles = [id_to_string(tile_to_id(tile)) for tile in tiles]
-            emoji_tiles = [id_to_emoji(tile_to_id(tile)) for tile in tiles]
+            readable_tiles = [id_to_string(_to_id(tile)) for tile in tiles]
+            emoji_tiles = [id_to_emoji(_to_id(tile)) for tile in tiles]
             
             # 記錄牌山
             self.initial_tiles = readable_tiles
@@ -86,11 +94,11 @@ class MahjongLogger:
             
         try:
             # 轉換牌ID為可讀形式和Emoji
-            readable_hand = [id_to_string(tile_to_id(tile)) for tile in hand]
-            emoji_hand = [id_to_emoji(tile_to_id(tile)) for tile in hand]
+            readable_hand = [id_to_string(_to_id(tile)) for tile in hand]
+            emoji_hand = [id_to_emoji(_to_id(tile)) for tile in hand]
             
             # 對手牌進行排序
-            sorted_tile_ids = [tile_to_id(tile) for tile in hand]
+            sorted_tile_ids = [_to_id(tile) for tile in hand]
             sorted_tile_ids = sort_hand(sorted_tile_ids)
             sorted_emoji_hand = [id_to_emoji(tile_id) for tile_id in sorted_tile_ids]
             
@@ -117,16 +125,16 @@ class MahjongLogger:
             
         try:
             # 轉換牌ID為可讀形式和Emoji
-            readable_hand = [id_to_string(tile_to_id(tile)) for tile in hand]
-            readable_drawn = id_to_string(tile_to_id(drawn_tile))
+            readable_hand = [id_to_string(_to_id(tile)) for tile in hand]
+            readable_drawn = id_to_string(_to_id(drawn_tile))
             
             # 對手牌進行排序
-            sorted_tile_ids = [tile_to_id(tile) for tile in hand]
+            sorted_tile_ids = [_to_id(tile) for tile in hand]
             sorted_tile_ids = sort_hand(sorted_tile_ids)
             sorted_emoji_hand = [id_to_emoji(tile_id) for tile_id in sorted_tile_ids]
             
-            emoji_hand = [id_to_emoji(tile_to_id(tile)) for tile in hand]
-            emoji_drawn = id_to_emoji(tile_to_id(drawn_tile))
+            emoji_hand = [id_to_emoji(_to_id(tile)) for tile in hand]
+            emoji_drawn = id_to_emoji(_to_id(drawn_tile))
             
             entry = {
                 "action_type": "draw",
@@ -153,19 +161,19 @@ class MahjongLogger:
             
         try:
             # 轉換牌ID為可讀形式和Emoji
-            readable_hand = [id_to_string(tile_to_id(tile)) for tile in hand]
-            readable_discarded = id_to_string(tile_to_id(discarded_tile))
+            readable_hand = [id_to_string(_to_id(tile)) for tile in hand]
+            readable_discarded = id_to_string(_to_id(discarded_tile))
             
             # 對手牌進行排序
-            sorted_tile_ids = [tile_to_id(tile) for tile in hand]
+            sorted_tile_ids = [_to_id(tile) for tile in hand]
             sorted_tile_ids = sort_hand(sorted_tile_ids)
             sorted_emoji_hand = [id_to_emoji(tile_id) for tile_id in sorted_tile_ids]
             
-            emoji_hand = [id_to_emoji(tile_to_id(tile)) for tile in hand]
-            emoji_discarded = id_to_emoji(tile_to_id(discarded_tile))
+            emoji_hand = [id_to_emoji(_to_id(tile)) for tile in hand]
+            emoji_discarded = id_to_emoji(_to_id(discarded_tile))
             
             # 添加到玩家的牌河
-            tile_id = tile_to_id(discarded_tile)
+            tile_id = _to_id(discarded_tile)
             self.player_discard_tiles[player_id].append(tile_id)
             
             entry = {
@@ -201,11 +209,11 @@ class MahjongLogger:
             
             if hand is not None:
                 # 轉換牌ID為可讀形式和Emoji
-                readable_hand = [id_to_string(tile_to_id(tile)) for tile in hand]
-                emoji_hand = [id_to_emoji(tile_to_id(tile)) for tile in hand]
+                readable_hand = [id_to_string(_to_id(tile)) for tile in hand]
+                emoji_hand = [id_to_emoji(_to_id(tile)) for tile in hand]
                 
                 # 對手牌進行排序
-                sorted_tile_ids = [tile_to_id(tile) for tile in hand]
+                sorted_tile_ids = [_to_id(tile) for tile in hand]
                 sorted_tile_ids = sort_hand(sorted_tile_ids)
                 sorted_emoji_hand = [id_to_emoji(tile_id) for tile_id in sorted_tile_ids]
                 
@@ -228,8 +236,8 @@ class MahjongLogger:
             
         try:
             # 轉換牌ID
-            hand_ids = [tile_to_id(tile) for tile in hand]
-            win_tile_id = tile_to_id(win_tile)
+            hand_ids = [_to_id(tile) for tile in hand]
+            win_tile_id = _to_id(win_tile)
             
             # 記錄胡牌玩家和牌型
             self.winning_player = player_id
@@ -251,23 +259,9 @@ class MahjongLogger:
             total_han = 0
             if yaku_list:
                 for yaku in yaku_list:
-                    if "寶牌" in yaku:
-                        han = int(yaku.split()[1])
-                        yaku_details.append(f"{yaku} (+{han}翻)")
-                        total_han += han
-                    elif "赤寶牌" in yaku:
-                        han = int(yaku.split()[1])
-                        yaku_details.append(f"{yaku} (+{han}翻)")
-                        total_han += han
-                    elif yaku == "立直":
-                        yaku_details.append(f"{yaku} (+1翻)")
-                        total_han += 1
-                    elif yaku == "門前清自摸和":
-                        yaku_details.append(f"{yaku} (+1翻)")
-                        total_han += 1
-                    else:
-                        yaku_details.append(f"{yaku} (+1翻)")
-                        total_han += 1
+                    han = get_yaku_han(yaku)
+                    yaku_details.append(f"{yaku} (+{han}翻)")
+                    total_han += han
             
             # 計算滿貫等級
             if total_han >= 13:
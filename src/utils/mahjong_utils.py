@@ -1,4 +1,13 @@
+from collections import OrderedDict
+from operator import itemgetter
+
 import numpy as np
+from src.utils.hand_tables import (hand_keys, agari_flags, is_standard_agari, standard_distance,
+                                   final_distance, distance_row, leave_one_out,
+                                   standard_effective_tiles, SUIT_OFFSETS, POW5, BATCH_KEY_WEIGHTS,
+                                   batch_flags, is_standard_agari_batch, FLAG_KOKUSHI, PAIR_COUNT_SHIFT,
+                                   SUIT_AGARI_BYTES, HONOR_AGARI_BYTES, standard_decompositions,
+                                   SHUNTSU, KOUTSU, TOITSU, discard_effective_tiles)
 
 # 牌型定義
 SUITS = ['萬', '筒', '索', '字']
@@ -13,6 +22,29 @@ RED_FIVE_MAN = 34  # 赤五萬
 RED_FIVE_PIN = 35  # 赤五筒
 RED_FIVE_SOU = 36  # 赤五索
 
+# 136張牌的實例編號：實例i為第i//4種牌的第i%4張，每種五的第0張為赤寶牌
+NUM_INSTANCES = 136
+RED_FIVE_INSTANCES = (4 * 4, 13 * 4, 22 * 4)
+
+def _build_instance_ids():
+    ids = np.repeat(np.arange(34, dtype=np.uint8), 4)
+    ids[list(RED_FIVE_INSTANCES)] = (RED_FIVE_MAN, RED_FIVE_PIN, RED_FIVE_SOU)
+    return ids
+
+# 實例編號 -> 牌ID(0-36)
+INSTANCE_TO_ID = _build_instance_ids()
+
+# 么九牌ID（1、9數牌及字牌）
+YAOCHUUHAI = (0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33)
+_yaochuu_getter = itemgetter(*YAOCHUUHAI)
+_YAOCHUU_MASK = np.isin(np.arange(34), YAOCHUUHAI)
+_YAOCHUU_FLAGS = _YAOCHUU_MASK.astype(np.intp)
+# 第i列為只有第i種牌一張的計數，用於一次得到所有打法打牌後的手牌
+_DISCARD_ROWS = np.eye(34, dtype=np.int64)
+# 以 [種類不足7種/已有么九對子, 剩餘張數] 查詢某張牌是否為七對子/國士無雙（么九牌）的有效牌
+_CHIITOITSU_EFFECTIVE = np.array([[False, True, False, False, False], [True, True, False, False, False]])
+_KOKUSHI_EFFECTIVE = np.array([[True, True, False, False, False], [True, False, False, False, False]])
+
 # 役種定義
 class YakuType:
     # 1 番役
@@ -49,12 +81,9 @@ class YakuType:
     JUNCHAN = "純全帶么九"         # 所有順子、刻子都包含么九牌，不含字牌
     RYANPEIKOU = "兩盃口"          # 門前清限定，兩組一盃口
     
-    # 4 番役（字一色以下在食斷時減一番）
+    # 6 番役（副露時減一番）
     CHINITSU = "清一色"            # 僅包含同一花色的和牌
     
-    # 6 番役
-    # 在某些規則中，這些役被視為日本麻將的"六番役"
-    
     # 役滿
     KOKUSHI_MUSOU = "國士無雙"     # 13種么九牌加其中一種
     SUUANKOU = "四暗刻"            # 四組暗刻
@@ -73,6 +102,63 @@ class YakuType:
     DAISUURIN = "大數隣"          # 索子的22334455667788
     KOKUSHI_MUSOU_13 = "國士無雙十三面待ち" # 國士無雙13面聽，獲勝牌是14張不同的么九牌中的任意一張
 
+# 各役的番數：(門前清, 副露)，副露欄為0表示門前清限定役
+# 寶牌與赤寶牌按張數計算，不在此表中
+YAKU_HAN = {
+    YakuType.RIICHI: (1, 0),
+    YakuType.IPPATSU: (1, 0),
+    YakuType.TSUMO: (1, 0),
+    YakuType.PINFU: (1, 0),
+    YakuType.TANYAO: (1, 1),
+    YakuType.IIPEIKOU: (1, 0),
+    YakuType.HAKU: (1, 1),
+    YakuType.HATSU: (1, 1),
+    YakuType.CHUN: (1, 1),
+    YakuType.EAST: (1, 1),
+    YakuType.SOUTH: (1, 1),
+    YakuType.WEST: (1, 1),
+    YakuType.NORTH: (1, 1),
+    YakuType.DOUBLE_RIICHI: (2, 0),
+    YakuType.CHANTAIYAO: (2, 1),
+    YakuType.SANSHOKU_DOUJUN: (2, 1),
+    YakuType.ITTSU: (2, 1),
+    YakuType.TOITOI: (2, 2),
+    YakuType.SANANKOU: (2, 2),
+    YakuType.SANKANTSU: (2, 2),
+    YakuType.CHIITOITSU: (2, 0),
+    YakuType.HONROUTOU: (2, 2),
+    YakuType.SHOUSANGEN: (2, 2),
+    YakuType.DOUBLE_WIND: (2, 2),
+    YakuType.HONITSU: (3, 2),
+    YakuType.JUNCHAN: (3, 2),
+    YakuType.RYANPEIKOU: (3, 0),
+    YakuType.CHINITSU: (6, 5),
+    YakuType.KOKUSHI_MUSOU: (13, 0),
+    YakuType.SUUANKOU: (13, 0),
+    YakuType.DAISANGEN: (13, 13),
+    YakuType.SHOUSUUSHII: (13, 13),
+    YakuType.DAISUUSHII: (13, 13),
+    YakuType.TSUUIISOU: (13, 13),
+    YakuType.CHINROUTOU: (13, 13),
+    YakuType.RYUUIISOU: (13, 13),
+    YakuType.CHUUREN_POUTOU: (13, 0),
+    YakuType.SUUKANTSU: (13, 13),
+    YakuType.TENHOU: (26, 0),
+    YakuType.CHIIHOU: (26, 0),
+    YakuType.DAISUURIN: (26, 0),
+    YakuType.KOKUSHI_MUSOU_13: (26, 0),
+}
+
+# 役滿的番數（役滿之間可以複合，例如雙倍役滿為26番）
+YAKUMAN_HAN = 13
+
+# 和牌拆解的區塊種類
+class BlockType:
+    SHUNTSU = SHUNTSU       # 順子，以最小的牌表示
+    KOUTSU = KOUTSU         # 刻子
+    TOITSU = TOITSU         # 對子（雀頭，或七對子的對子）
+    KOKUSHI = "國士"        # 國士無雙，以重複的么九牌表示
+
 # 麻將牌的Emoji表示
 TILE_EMOJIS = {
     # 萬子 (Characters)
@@ -221,6 +307,18 @@ def sort_hand(hand_ids):
     # 返回原始ID
     return [original_id for _, original_id in sorted_hand]
 
+def instances_to_ids(instances):
+    """
+    將實例編號（0-135）數組轉換為牌ID(0-36)列表
+    """
+    return INSTANCE_TO_ID[np.asarray(instances, dtype=np.intp)].tolist()
+
+def instances_to_counts(instances):
+    """
+    將實例編號數組轉換為計數數組，格式與hand_to_counts相同
+    """
+    return np.bincount(INSTANCE_TO_ID[np.asarray(instances, dtype=np.intp)], minlength=37).astype(np.int32)
+
 def hand_to_counts(hand):
     """
     將手牌轉換為計數數組
@@ -255,11 +353,105 @@ def is_valid_hand(counts):
     """
     return np.sum(counts[:34]) == 14  # 只檢查標準牌的數量，不包括赤寶牌
 
+def counts_to_list(counts):
+    """
+    將計數數組轉換為長度34的Python列表，赤寶牌計入對應的普通牌
+    與normalize_counts相同，但不複製NumPy數組，供查表類函數使用
+    """
+    normalized = counts.tolist() if hasattr(counts, 'tolist') else list(counts)
+    if len(normalized) > RED_FIVE_MAN:
+        normalized[4] += normalized[RED_FIVE_MAN]
+    if len(normalized) > RED_FIVE_PIN:
+        normalized[13] += normalized[RED_FIVE_PIN]
+    if len(normalized) > RED_FIVE_SOU:
+        normalized[22] += normalized[RED_FIVE_SOU]
+    del normalized[34:]
+    return normalized
+
 def check_win(counts):
     """
     檢查是否和牌
     counts: 長度為37的數組，表示每種牌的數量
     返回: 是否和牌
+    
+    一般形透過預先計算的花色和牌表判斷（每個花色查表一次），
+    結果與check_win_recursive完全相同
+    """
+    # 首先將赤寶牌計入對應的普通牌
+    normalized = counts_to_list(counts)
+    
+    # 檢查總牌數
+    if sum(normalized) != 14:
+        return False
+    
+    if max(normalized) > 4:
+        # 不可能出現的牌數（超過4張），交由遞迴版本處理
+        return check_win_recursive(counts)
+    
+    # 檢查雀頭+順子+刻子的形式
+    if is_standard_agari(agari_flags(hand_keys(normalized))):
+        return True
+    
+    # 檢查特殊和牌：七對子
+    if normalized.count(2) == 7:
+        return True
+    
+    # 檢查特殊和牌：國士無雙
+    if normalized[0] and normalized[33] and check_kokushi_musou(np.asarray(normalized)):
+        return True
+    
+    return False
+
+def check_win_batch(counts_matrix):
+    """
+    批量檢查是否和牌
+    counts_matrix: (N, 37) 的整數計數矩陣（每列格式同hand_to_counts，赤寶牌會計入對應的五）
+    返回: (N,) 布林數組，結果與逐列呼叫check_win相同
+    
+    以一次矩陣乘法求得四個花色的鍵值與總張數，每個花色查表一次即可
+    同時判斷一般形、七對子與國士無雙
+    """
+    counts_matrix = np.asarray(counts_matrix)
+    if len(counts_matrix) < 8:
+        # 手牌數很少時NumPy的固定開銷大於逐手查表
+        return np.array([check_win(counts) for counts in counts_matrix], dtype=bool)
+    
+    columns = counts_matrix.shape[1]
+    keys = (counts_matrix.astype(np.float32) @ BATCH_KEY_WEIGHTS[:columns]).astype(np.int64)
+    total = keys[:, 4]
+    
+    # 超過4張的列無法編碼，改用check_win逐列處理（正常牌局不會出現）
+    overflow = None
+    fives = counts_matrix[:, [4, 13, 22]]
+    if columns > RED_FIVE_MAN:
+        fives = fives + counts_matrix[:, RED_FIVE_MAN:RED_FIVE_SOU + 1]
+    if counts_matrix.max(initial=0) > 4 or fives.max(initial=0) > 4:
+        overflow = (counts_matrix[:, :34] > 4).any(axis=1) | (fives > 4).any(axis=1)
+        keys[overflow] = 0
+    
+    flags = batch_flags(keys[:, :4])
+    
+    # 檢查雀頭+順子+刻子的形式
+    win = is_standard_agari_batch(flags)
+    
+    # 檢查特殊和牌：七對子
+    win |= (flags >> PAIR_COUNT_SHIFT).sum(axis=1) == 7
+    
+    # 檢查特殊和牌：國士無雙
+    win |= (flags & FLAG_KOKUSHI).all(axis=1)
+    
+    win &= total == 14
+    if overflow is not None:
+        for row in np.flatnonzero(overflow):
+            win[row] = check_win(counts_matrix[row])
+    return win
+
+def check_win_recursive(counts):
+    """
+    檢查是否和牌（遞迴版本）
+    逐一嘗試雀頭後以check_sets遞迴拆解，作為查表版本check_win的參考實現
+    counts: 長度為37的數組，表示每種牌的數量
+    返回: 是否和牌
     """
     # 首先將赤寶牌計入對應的普通牌
     normalized_counts = normalize_counts(counts)
@@ -329,14 +521,276 @@ def check_kokushi_musou(counts):
     檢查是否為國士無雙
     """
     # 國士無雙要求手牌有全部13種么九牌，其中一種有2張
-    yaochuuhai = [0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33]  # 所有么九牌的ID
-    
     # 檢查么九牌出現的數量
-    yaochuu_counts = counts[yaochuuhai]
+    yaochuu_counts = counts[list(YAOCHUUHAI)]
     
     # 所有么九牌必須至少出現一次，其中一種出現兩次
     return np.all(yaochuu_counts >= 1) and np.sum(yaochuu_counts) == 14
 
+def calculate_standard_shanten(counts):
+    """
+    計算一般形（面子+雀頭）的向聽數
+    counts: 長度為37的數組，手牌張數需為3n+1或3n+2
+    返回: 向聽數，-1表示和牌，0表示聽牌
+    """
+    normalized = counts_to_list(counts)
+    if max(normalized) > 4:
+        raise ValueError(f"每種牌最多4張: {normalized}")
+    mentsu = sum(normalized) // 3
+    return standard_distance(hand_keys(normalized), mentsu) - 1
+
+def _chiitoitsu_shanten(normalized):
+    pairs = normalized.count(2) + normalized.count(3) + normalized.count(4)
+    kinds = len(normalized) - normalized.count(0)
+    return 6 - pairs + max(0, 7 - kinds)
+
+def _kokushi_shanten(normalized):
+    yaochuu_counts = _yaochuu_getter(normalized)
+    kinds = len(YAOCHUUHAI) - yaochuu_counts.count(0)
+    return 13 - kinds - (max(yaochuu_counts) >= 2)
+
+def calculate_chiitoitsu_shanten(counts):
+    """
+    計算七對子的向聽數（僅適用於13或14張的門前手牌）
+    """
+    return _chiitoitsu_shanten(counts_to_list(counts))
+
+def calculate_kokushi_shanten(counts):
+    """
+    計算國士無雙的向聽數（僅適用於13或14張的門前手牌）
+    """
+    return _kokushi_shanten(counts_to_list(counts))
+
+def calculate_shanten(counts):
+    """
+    計算向聽數，取一般形、七對子、國士無雙中的最小值
+    counts: 長度為37的數組（與hand_to_counts相同格式），手牌張數需為3n+1或3n+2
+    返回: 向聽數，-1表示和牌，0表示聽牌
+    
+    一般形使用hand_tables中預先計算的花色距離表，每次計算只需四次查表
+    及三次小型的向量合併，不複製NumPy數組
+    """
+    normalized = counts_to_list(counts)
+    if max(normalized) > 4:
+        raise ValueError(f"每種牌最多4張: {normalized}")
+    tile_count = sum(normalized)
+    shanten = standard_distance(hand_keys(normalized), tile_count // 3) - 1
+    if tile_count < 13 or shanten < 0:
+        return shanten
+    return min(shanten, _chiitoitsu_shanten(normalized), _kokushi_shanten(normalized))
+
+def _special_effective_tiles(normalized, chiitoitsu, kokushi, shanten):
+    """
+    七對子與國士無雙形式下的有效牌（僅在該形式達到最小向聽數時計入）
+    """
+    tiles = set()
+    if chiitoitsu == shanten:
+        kinds = len(normalized) - normalized.count(0)
+        for tile, count in enumerate(normalized):
+            # 單張成對，或種類不足7種時的新牌
+            if count == 1 or (count == 0 and kinds < 7):
+                tiles.add(tile)
+    if kokushi == shanten:
+        has_pair = max(_yaochuu_getter(normalized)) >= 2
+        for tile in YAOCHUUHAI:
+            if normalized[tile] == 0 or (normalized[tile] == 1 and not has_pair):
+                tiles.add(tile)
+    return tiles
+
+def _count_unseen(normalized, visible, tiles):
+    """
+    計算有效牌的剩餘張數（扣除自己手牌及可見的牌）
+    """
+    unseen = 0
+    for tile in tiles:
+        remaining = 4 - normalized[tile] - visible[tile]
+        if remaining > 0:
+            unseen += remaining
+    return unseen
+
+def calculate_effective_tiles(counts, visible_counts=None):
+    """
+    計算3n+1張手牌的有效牌（摸入後可使向聽數減少的牌）
+    counts: 長度為37的數組（與hand_to_counts相同格式）
+    visible_counts: 場上可見牌的計數數組（河牌、寶牌指示牌等），可為None
+    返回: (向聽數, 有效牌ID列表, 有效牌剩餘張數)
+    """
+    normalized = counts_to_list(counts)
+    if max(normalized) > 4:
+        raise ValueError(f"每種牌最多4張: {normalized}")
+    visible = counts_to_list(visible_counts) if visible_counts is not None else [0] * 34
+    tile_count = sum(normalized)
+    mentsu = tile_count // 3
+    keys = hand_keys(normalized)
+    vectors = [distance_row(suit, key) for suit, key in enumerate(keys)]
+    others = leave_one_out(vectors)
+    standard = final_distance(others[3], vectors[3], mentsu) - 1
+    
+    shanten = standard
+    chiitoitsu = kokushi = None
+    if tile_count >= 13:
+        chiitoitsu = _chiitoitsu_shanten(normalized)
+        kokushi = _kokushi_shanten(normalized)
+        shanten = min(standard, chiitoitsu, kokushi)
+    
+    tiles = set()
+    if standard == shanten:
+        tiles.update(standard_effective_tiles(keys, vectors, others, mentsu, standard + 1))
+    tiles |= _special_effective_tiles(normalized, chiitoitsu, kokushi, shanten)
+    tiles = sorted(tiles)
+    return shanten, tiles, _count_unseen(normalized, visible, tiles)
+
+def _discard_special_forms(normalized, hand, discards, worst):
+    """
+    3n+2張手牌各打法打牌後的七對子與國士無雙向聽數及有效牌
+    打牌後的張數只有打出的牌少一張（單張少一種牌、對子少一組對子），先對 張數0-4 建表再以打出的牌查表；
+    打牌不會增加對子數與種類數，打牌前的向聽數即為下限，下限高於worst（一般形的最大向聽數）的形式不影響結果而略過
+    返回: [(各打法向聽數 (D,), 各打法有效牌 (D, 34) bool數組), ...]
+    """
+    forms = []
+    discarded = hand[discards]
+    remaining = hand - _DISCARD_ROWS[discards]
+    if _chiitoitsu_shanten(normalized) <= worst:
+        kinds = len(normalized) - normalized.count(0)
+        pairs = kinds - normalized.count(1)
+        kinds_after = [kinds - (count == 1) for count in range(5)]
+        pairs_after = [pairs - (count == 2) for count in range(5)]
+        shanten = np.array([6 - p + max(0, 7 - k) for k, p in zip(kinds_after, pairs_after)])[discarded]
+        # 單張成對，或種類不足7種時的新牌
+        few_kinds = np.array([k < 7 for k in kinds_after], dtype=np.intp)[discarded]
+        forms.append((shanten, _CHIITOITSU_EFFECTIVE[few_kinds[:, None], remaining]))
+    if _kokushi_shanten(normalized) <= worst:
+        yaochuu = _yaochuu_getter(normalized)
+        kinds = len(yaochuu) - yaochuu.count(0)
+        pairs = kinds - yaochuu.count(1)
+        # [是否為么九牌][張數]
+        kinds_after = [[kinds - (is_yaochuu and count == 1) for count in range(5)] for is_yaochuu in (False, True)]
+        has_pair = [[pairs - (is_yaochuu and count == 2) > 0 for count in range(5)] for is_yaochuu in (False, True)]
+        is_yaochuu = _YAOCHUU_FLAGS[discards]
+        shanten = 13 - np.array(kinds_after)[is_yaochuu, discarded] - np.array(has_pair)[is_yaochuu, discarded]
+        # 缺少的么九牌，或尚無對子時的么九牌單張
+        has_pair = np.array(has_pair, dtype=np.intp)[is_yaochuu, discarded]
+        forms.append((shanten, _KOKUSHI_EFFECTIVE[has_pair[:, None], remaining] & _YAOCHUU_MASK))
+    return forms
+
+def calculate_ukeire(counts, visible_counts=None):
+    """
+    計算3n+2張手牌每種打法的有效牌（受け入れ）
+    counts: 長度為37的數組（與hand_to_counts相同格式）
+    visible_counts: 場上可見牌的計數數組（河牌、寶牌指示牌等），可為None
+    返回: {打出的牌ID: (打出後向聽數, 有效牌ID列表, 有效牌剩餘張數)}
+          赤寶牌與普通牌分別列出（牌型效果相同）
+    
+    打出一張牌只改變一個花色的距離向量：四個花色的兩兩合併與「某花色以外三個花色」
+    的合併只計算一次，每種打法只需一次合併與一次遮罩查表，所有打法以NumPy一次處理
+    （見hand_tables.discard_effective_tiles）；七對子與國士無雙的向聽數也以張數差一次算出
+    """
+    normalized = counts_to_list(counts)
+    if max(normalized) > 4:
+        raise ValueError(f"每種牌最多4張: {normalized}")
+    visible = counts_to_list(visible_counts) if visible_counts is not None else [0] * 34
+    tile_count = sum(normalized) - 1
+    mentsu = tile_count // 3
+    hand = np.array(normalized)
+    discards = np.flatnonzero(hand)
+    standard, effective = discard_effective_tiles(hand_keys(normalized), discards, mentsu)
+    standard -= 1
+    
+    shanten = standard
+    if tile_count >= 13:
+        forms = _discard_special_forms(normalized, hand, discards, standard.max())
+        for form_shanten, _ in forms:
+            shanten = np.minimum(shanten, form_shanten)
+        if forms:
+            effective &= (standard == shanten)[:, None]
+            for form_shanten, form_effective in forms:
+                effective |= form_effective & (form_shanten == shanten)[:, None]
+    
+    # 各打法的剩餘張數只在打出的牌上比打牌前多一張
+    unseen = np.maximum(_DISCARD_ROWS[discards] + (4 - np.array(visible) - hand), 0)
+    unseen = np.vecdot(effective, unseen).tolist()
+    tiles = np.nonzero(effective)[1].tolist()
+    ends = effective.sum(axis=1).cumsum().tolist()
+    results = {}
+    start = 0
+    for tile, tile_shanten, end, tile_unseen in zip(discards.tolist(), shanten.tolist(), ends, unseen):
+        results[tile] = (tile_shanten, tiles[start:end], tile_unseen)
+        start = end
+    
+    # 赤寶牌的打法與對應普通牌相同
+    for red_id in (RED_FIVE_MAN, RED_FIVE_PIN, RED_FIVE_SOU):
+        if red_id < len(counts) and counts[red_id] > 0:
+            results[red_id] = results[normalize_red_five(red_id)]
+    for normal_id in (4, 13, 22):
+        if normal_id in results and counts[normal_id] == 0:
+            del results[normal_id]
+    return results
+
+def find_waits(counts):
+    """
+    列出3n+1張手牌的所有和了牌及和牌時的拆解方式（待牌）
+    counts: 長度為37的數組（與hand_to_counts相同格式）
+    返回: {和了牌ID(0-33): [拆解方式, ...]}，未聽牌時為空字典
+          拆解方式為 ((BlockType, 牌ID), ...)；七對子為7個對子，
+          國士無雙為 ((BlockType.KOKUSHI, 重複的么九牌),)
+    
+    與check_win共用花色和牌表：其餘三個花色的標記只查一次，
+    每張候選牌只需重新查詢其所在花色，一次掃描即可得到全部待牌
+    """
+    normalized = counts_to_list(counts)
+    if max(normalized) > 4:
+        raise ValueError(f"每種牌最多4張: {normalized}")
+    keys = hand_keys(normalized)
+    flags = list(agari_flags(keys))
+    waits = {}
+    
+    # 一般形：只有摸入牌的花色標記會改變
+    for suit in range(4):
+        table = SUIT_AGARI_BYTES if suit < 3 else HONOR_AGARI_BYTES
+        original_flag = flags[suit]
+        offset = SUIT_OFFSETS[suit]
+        for i in range(9 if suit < 3 else 7):
+            if normalized[offset + i] == 4:
+                continue
+            flags[suit] = table[keys[suit] + POW5[i]]
+            if is_standard_agari(flags):
+                win_keys = list(keys)
+                win_keys[suit] += POW5[i]
+                waits[offset + i] = standard_decompositions(win_keys)
+        flags[suit] = original_flag
+    
+    if sum(normalized) != 13:
+        return waits
+    
+    # 七對子：六個對子加一張單張
+    if normalized.count(2) == 6 and normalized.count(1) == 1:
+        single = normalized.index(1)
+        pairs = tuple((BlockType.TOITSU, tile) for tile in range(34)
+                      if normalized[tile] == 2 or tile == single)
+        waits.setdefault(single, []).append(pairs)
+    
+    # 國士無雙：全為么九牌，且缺一種（單騎）或十三種齊全（十三面）
+    yaochuu_counts = _yaochuu_getter(normalized)
+    if sum(yaochuu_counts) == 13 and max(yaochuu_counts) <= 2:
+        missing = [tile for tile in YAOCHUUHAI if normalized[tile] == 0]
+        if not missing:
+            for tile in YAOCHUUHAI:
+                waits.setdefault(tile, []).append(((BlockType.KOKUSHI, tile),))
+        elif len(missing) == 1:
+            pair_tile = normalized.index(2)
+            waits.setdefault(missing[0], []).append(((BlockType.KOKUSHI, pair_tile),))
+    
+    return dict(sorted(waits.items()))
+
+def is_furiten(waits, discard_ids):
+    """
+    檢查是否振聽（待牌之一在自己的河中）
+    waits: find_waits的結果或待牌ID列表
+    discard_ids: 自己打出過的牌ID列表（可含赤寶牌）
+    """
+    discarded = {normalize_red_five(tile_id) for tile_id in discard_ids}
+    return any(tile in discarded for tile in waits)
+
 def count_red_fives(hand_ids):
     """
     計算手牌中赤寶牌的數量
@@ -390,61 +844,451 @@ def is_wind(tile_id):
     tile_id = normalize_red_five(tile_id)
     return 27 <= tile_id <= 30
 
-def calculate_fu(hand, win_tile, is_open, is_self_draw, has_waiting, is_pinfu=False):
+# 役牌（字牌刻子）對應的役種，索引為牌ID-27
+_WIND_YAKU = (YakuType.EAST, YakuType.SOUTH, YakuType.WEST, YakuType.NORTH)
+_DRAGON_YAKU = (YakuType.HAKU, YakuType.HATSU, YakuType.CHUN)
+_IS_YAOCHUU = tuple(tile in YAOCHUUHAI for tile in range(34))
+_simple_getter = itemgetter(*(tile for tile in range(34) if not _IS_YAOCHUU[tile]))
+# 綠一色可用的牌：二三四六八索及發
+_GREEN_TILES = (19, 20, 21, 23, 25, 32)
+_non_green_getter = itemgetter(*(tile for tile in range(34) if tile not in _GREEN_TILES))
+# 大數隣：二至八索各兩張
+_DAISUURIN_COUNTS = [0] * 19 + [2] * 7 + [0] * 8
+
+def find_decompositions(counts):
     """
-    計算符數
+    列出和牌手牌（含和了牌）的所有拆解方式
+    counts: 長度為37的數組（與hand_to_counts相同格式）
+    返回: 拆解方式列表，格式與find_waits相同；
+          一般形為面子+雀頭，七對子為7個對子，國士無雙為 ((BlockType.KOKUSHI, 重複的么九牌),)
+          不是和牌形時為空列表
+    
+    一般形直接取自花色拆解表（與check_win共用），不需回溯搜索
+    """
+    normalized = counts_to_list(counts)
+    if max(normalized) > 4:
+        raise ValueError(f"每種牌最多4張: {normalized}")
+    return _decompose(normalized)
+
+def _decompose(normalized):
     """
-    # 基本符
-    fu = 20
+    find_decompositions的內部版本，輸入為counts_to_list的結果
+    """
+    keys = hand_keys(normalized)
+    decompositions = []
+    if is_standard_agari(agari_flags(keys)):
+        decompositions = standard_decompositions(keys)
     
-    # 門前清自摸加符
-    if not is_open and is_self_draw:
-        fu += 2
+    if sum(normalized) == 14:
+        if normalized.count(2) == 7:
+            decompositions.append(tuple((BlockType.TOITSU, tile) for tile in range(34) if normalized[tile] == 2))
+        yaochuu_counts = _yaochuu_getter(normalized)
+        if min(yaochuu_counts) == 1 and sum(yaochuu_counts) == 14:
+            decompositions.append(((BlockType.KOKUSHI, YAOCHUUHAI[yaochuu_counts.index(2)]),))
+    return decompositions
+
+def _base_points(han, fu, yakuman=False):
+    """
+    由番數和符數計算基本點
+    yakuman: 是否為役滿（可複合，每13番計一倍）；否則13番以上為累計役滿
+    """
+    if yakuman:
+        return 8000 * (han // YAKUMAN_HAN)
+    if han >= 13:
+        return 8000
+    if han >= 11:
+        return 6000
+    if han >= 8:
+        return 4000
+    if han >= 6:
+        return 3000
+    return min(fu * (2 ** (han + 2)), 2000)
+
+# 點數表的範圍：符數以5符為一格（20、25、30...），13番欄為累計役滿
+FU_STEP = 5
+MAX_TABLE_FU = 140
+MAX_TABLE_HAN = 13
+# 和牌者得到的基本點倍數，索引為 [是否莊家][是否自摸]
+PAYMENT_MULTIPLIERS = ((1, 4), (2, 6))
+
+def _build_score_table():
+    table = np.zeros((MAX_TABLE_HAN + 1, MAX_TABLE_FU // FU_STEP + 1, 2, 2), dtype=np.int32)
+    for han in range(1, MAX_TABLE_HAN + 1):
+        for fu in range(20, MAX_TABLE_FU + 1, FU_STEP):
+            base_points = _base_points(han, fu)
+            for is_dealer in (0, 1):
+                for is_self_draw in (0, 1):
+                    table[han, fu // FU_STEP, is_dealer, is_self_draw] = \
+                        base_points * PAYMENT_MULTIPLIERS[is_dealer][is_self_draw]
+    return table
+
+def lookup_score(han, fu, is_dealer=False, is_self_draw=False, yakuman=False):
+    """
+    從點數表查詢和牌得分
+    han: 總番數（役滿時為13的倍數）
+    fu: 符數
+    yakuman: 是否為役滿，役滿按倍數計算，不受符數影響
+    """
+    if han <= 0:
+        return 0
+    row = _SCORE_ROWS[MAX_TABLE_HAN] if yakuman else _SCORE_ROWS[min(han, MAX_TABLE_HAN)]
+    score = row[min(fu, MAX_TABLE_FU) // FU_STEP][is_dealer][is_self_draw]
+    if yakuman:
+        score *= han // YAKUMAN_HAN
+    return score
+
+class ScoreCache:
+    """
+    calculate_score的有界LRU快取
+    鍵值為正規化手牌（四個花色鍵值與赤寶牌數）、和了牌及所有場況參數，
+    命中時跳過拆解與役判斷，只查點數表
+    """
     
-    # 如果是平和形，且門前清榮和，總共只有30符
-    if is_pinfu and not is_open and not is_self_draw:
-        return 30
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
     
-    # 自摸非平和加符
-    if is_self_draw and not is_pinfu:
-        fu += 2
+    def get(self, key):
+        """
+        查詢快取，未命中時返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
     
-    # 七對子固定25符
-    normalized_hand = normalize_counts(hand)
-    pairs_count = np.sum(normalized_hand[:34] == 2)
-    if pairs_count == 7:
-        return 25
+    def put(self, key, entry):
+        """
+        加入快取，超過容量時移除最久未使用的項目
+        """
+        self._entries[key] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        """
+        清空快取並重置計數
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def info(self):
+        """
+        返回快取統計：命中、未命中、命中率、目前大小及容量
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+
+_score_cache = None
+
+def configure_score_cache(maxsize=65536):
+    """
+    啟用calculate_score的LRU快取（預設停用）
+    maxsize: 快取容量，0或None表示停用
+    返回: 新的ScoreCache，停用時為None
+    """
+    global _score_cache
+    _score_cache = ScoreCache(maxsize) if maxsize else None
+    return _score_cache
+
+def score_cache_info():
+    """
+    返回calculate_score快取的統計資料，未啟用時返回None
+    """
+    return _score_cache.info() if _score_cache is not None else None
+
+def _round_fu(fu):
+    """
+    符數進位到10符
+    """
+    return (fu + 9) // 10 * 10
+
+# SCORE_TABLE[番數][符數 // FU_STEP][是否莊家][是否自摸] = 和牌得分
+SCORE_TABLE = _build_score_table()
+_SCORE_ROWS = SCORE_TABLE.tolist()
+
+def _hand_yaku(normalized, is_open, round_wind, player_wind, standard):
+    """
+    計算與拆解方式無關的役（只由各種牌的張數決定）
+    standard: 是否為一般形（役牌、三元牌、風牌類的役只在一般形成立）
+    返回: (役列表, 役滿列表)
+    """
+    yaku = []
+    yakuman = []
+    suits = [any(normalized[offset:offset + 9]) for offset in (0, 9, 18)]
+    has_honor = any(normalized[27:])
+    all_yaochuu = not any(_simple_getter(normalized))
+    
+    if not any(_yaochuu_getter(normalized)):
+        yaku.append(YakuType.TANYAO)
+    if sum(suits) == 1:
+        yaku.append(YakuType.HONITSU if has_honor else YakuType.CHINITSU)
+    if all_yaochuu:
+        if not any(suits):
+            yakuman.append(YakuType.TSUUIISOU)
+        elif not has_honor:
+            yakuman.append(YakuType.CHINROUTOU)
+        else:
+            yaku.append(YakuType.HONROUTOU)
+    if not any(_non_green_getter(normalized)):
+        yakuman.append(YakuType.RYUUIISOU)
+    
+    if standard and has_honor:
+        dragons = normalized[31:34]
+        winds = normalized[27:31]
+        dragon_sets = sum(count >= 3 for count in dragons)
+        wind_sets = sum(count >= 3 for count in winds)
+        for index, count in enumerate(dragons):
+            if count >= 3:
+                yaku.append(_DRAGON_YAKU[index])
+        for index, count in enumerate(winds):
+            if count >= 3:
+                if index == round_wind and index == player_wind:
+                    yaku.append(YakuType.DOUBLE_WIND)
+                elif index == round_wind or index == player_wind:
+                    yaku.append(_WIND_YAKU[index])
+        if dragon_sets == 3:
+            yakuman.append(YakuType.DAISANGEN)
+        elif dragon_sets == 2 and 2 in dragons:
+            yaku.append(YakuType.SHOUSANGEN)
+        if wind_sets == 4:
+            yakuman.append(YakuType.DAISUUSHII)
+        elif wind_sets == 3 and 2 in winds:
+            yakuman.append(YakuType.SHOUSUUSHII)
+    
+    if standard and not is_open and sum(suits) == 1 and not has_honor:
+        offset = 9 * suits.index(True)
+        suit_counts = normalized[offset:offset + 9]
+        if suit_counts[0] >= 3 and suit_counts[8] >= 3 and min(suit_counts) >= 1:
+            yakuman.append(YakuType.CHUUREN_POUTOU)
     
-    # 待以後實現更複雜的符數計算
-    # 包括雀頭是否為役牌、刻子是否為么九牌、是否為明刻暗刻等計算
+    if not is_open and normalized == _DAISUURIN_COUNTS:
+        yakuman.append(YakuType.DAISUURIN)
+    return yaku, yakuman
+
+def _standard_candidates(blocks, win, is_open, is_self_draw, round_wind, player_wind):
+    """
+    評估一般形的一種拆解方式，對和了牌可能所在的每個區塊各產生一組結果
+    返回: [(役列表, 役滿列表, 符數), ...]
+    """
+    shuntsu = []
+    koutsu = []
+    pair = None
+    for kind, tile in blocks:
+        if kind == SHUNTSU:
+            shuntsu.append(tile)
+        elif kind == KOUTSU:
+            koutsu.append(tile)
+        else:
+            pair = tile
+    starts = set(shuntsu)
+    
+    # 與和了牌位置無關的役
+    yaku = []
+    if not is_open and len(starts) < len(shuntsu):
+        duplicates = sum(shuntsu.count(tile) // 2 for tile in starts)
+        if duplicates == 2:
+            yaku.append(YakuType.RYANPEIKOU)
+        elif duplicates == 1:
+            yaku.append(YakuType.IIPEIKOU)
+    if shuntsu and _IS_YAOCHUU[pair] and all(_IS_YAOCHUU[tile] for tile in koutsu) \
+            and all(tile % 9 in (0, 6) for tile in shuntsu):
+        has_honor = pair >= 27 or any(tile >= 27 for tile in koutsu)
+        yaku.append(YakuType.CHANTAIYAO if has_honor else YakuType.JUNCHAN)
+    if len(starts) >= 3:
+        if any(value in starts and value + 9 in starts and value + 18 in starts for value in range(7)):
+            yaku.append(YakuType.SANSHOKU_DOUJUN)
+        if any(offset in starts and offset + 3 in starts and offset + 6 in starts for offset in (0, 9, 18)):
+            yaku.append(YakuType.ITTSU)
+    if len(koutsu) == 4:
+        yaku.append(YakuType.TOITOI)
+    
+    # 雀頭符：三元牌、場風、自風各2符
+    pair_fu = 0
+    if pair >= 31:
+        pair_fu = 2
+    elif pair >= 27:
+        pair_fu = 2 * ((pair - 27 == round_wind) + (pair - 27 == player_wind))
+    
+    candidates = []
+    seen = set()
+    for kind, tile in blocks:
+        if (kind, tile) in seen:
+            continue
+        if kind == SHUNTSU:
+            if not tile <= win <= tile + 2:
+                continue
+            # 兩面：和了牌在兩端且非邊張（12聽3、89聽7）
+            position = win - tile
+            ryanmen = (position == 0 and tile % 9 != 6) or (position == 2 and tile % 9 != 0)
+        elif tile != win:
+            continue
+        else:
+            ryanmen = False
+        seen.add((kind, tile))
+        
+        # 榮和時由和了牌完成的刻子視為明刻；副露手牌無法區分，刻子一律視為明刻
+        concealed = 0 if is_open else len(koutsu) - (kind == KOUTSU and not is_self_draw)
+        set_fu = 0
+        for set_tile in koutsu:
+            fu = 8 if _IS_YAOCHUU[set_tile] else 4
+            if is_open or (set_tile == win and kind == KOUTSU and not is_self_draw):
+                fu //= 2
+            set_fu += fu
+        wait_fu = 0 if ryanmen or kind == KOUTSU else 2
+        
+        position_yaku = list(yaku)
+        position_yakuman = []
+        pinfu = not is_open and len(shuntsu) == 4 and ryanmen and pair_fu == 0
+        if pinfu:
+            position_yaku.append(YakuType.PINFU)
+            fu = 20 if is_self_draw else 30
+        else:
+            fu = 20 + set_fu + pair_fu + wait_fu
+            if is_self_draw:
+                fu += 2
+            elif not is_open:
+                fu += 10
+            fu = max(_round_fu(fu), 30)
+        if concealed == 4:
+            position_yakuman.append(YakuType.SUUANKOU)
+        elif concealed == 3:
+            position_yaku.append(YakuType.SANANKOU)
+        candidates.append((position_yaku, position_yakuman, fu))
+    return candidates
+
+def evaluate_yaku(counts, win_tile, is_self_draw=False, is_open=False, round_wind=0, player_wind=0,
+                  is_riichi=False, is_ippatsu=False, is_double_riichi=False, is_first_turn=False,
+                  is_dealer=False, bonus_han=0):
+    """
+    評估和牌手牌的役與符數，在所有拆解方式中選擇得分最高的一種
+    
+    參數:
+        counts: 手牌的計數數組（含和了牌，可含赤寶牌）
+        win_tile: 和了牌ID
+        is_self_draw / is_open / round_wind / player_wind / is_riichi: 同calculate_score
+        is_ippatsu: 是否一發
+        is_double_riichi: 是否雙立直（取代立直）
+        is_first_turn: 是否第一巡無人鳴牌前自摸（天和/地和）
+        is_dealer: 是否為莊家
+        bonus_han: 寶牌等不影響役判斷的額外番數，只用於比較不同拆解的得分
+    
+    返回:
+        han: 役的番數（不含寶牌），無和牌形或無役時為0
+        fu: 符數
+        yaku_list: 役列表；成立役滿時只包含役滿
+    
+    手牌不含副露資訊：副露時門前清限定役不成立、刻子一律視為明刻，槓子無法判斷
+    """
+    normalized = counts_to_list(counts)
+    win = normalize_red_five(win_tile)
+    if max(normalized) > 4 or not normalized[win]:
+        return 0, 0, []
+    decompositions = _decompose(normalized)
+    if not decompositions:
+        return 0, 0, []
+    
+    # 狀況役
+    situation = []
+    situation_yakuman = []
+    if not is_open:
+        if is_double_riichi:
+            situation.append(YakuType.DOUBLE_RIICHI)
+        elif is_riichi:
+            situation.append(YakuType.RIICHI)
+        if is_ippatsu and (is_riichi or is_double_riichi):
+            situation.append(YakuType.IPPATSU)
+        if is_self_draw:
+            situation.append(YakuType.TSUMO)
+            if is_first_turn:
+                situation_yakuman.append(YakuType.TENHOU if is_dealer else YakuType.CHIIHOU)
     
-    # 進位到10符
-    fu = ((fu + 9) // 10) * 10
+    han_index = 1 if is_open else 0
+    standard_hand = None
+    best = None
+    for blocks in decompositions:
+        kind = blocks[0][0]
+        if kind == BlockType.KOKUSHI:
+            yakuman = [YakuType.KOKUSHI_MUSOU_13 if blocks[0][1] == win else YakuType.KOKUSHI_MUSOU]
+            candidates = [([], yakuman, 30)]
+            hand_yaku, hand_yakuman = [], []
+        elif len(blocks) == 7 and all(block[0] == BlockType.TOITSU for block in blocks):
+            hand_yaku, hand_yakuman = _hand_yaku(normalized, is_open, round_wind, player_wind, False)
+            candidates = [([YakuType.CHIITOITSU], [], 25)]
+        else:
+            if standard_hand is None:
+                standard_hand = _hand_yaku(normalized, is_open, round_wind, player_wind, True)
+            hand_yaku, hand_yakuman = standard_hand
+            candidates = _standard_candidates(blocks, win, is_open, is_self_draw, round_wind, player_wind)
+        
+        for yaku, yakuman, fu in candidates:
+            yakuman = situation_yakuman + hand_yakuman + yakuman
+            if yakuman:
+                yaku_list = yakuman
+            else:
+                yaku_list = situation + hand_yaku + yaku
+            han = sum(YAKU_HAN[name][han_index] for name in yaku_list)
+            if not han:
+                continue
+            if yakuman:
+                rank = (_base_points(han, fu, True), han, fu)
+            else:
+                rank = (_base_points(han + bonus_han, fu), han, fu)
+            if best is None or rank > best[0]:
+                best = (rank, han, fu, yaku_list)
     
+    if best is None:
+        return 0, 0, []
+    return best[1], best[2], best[3]
+
+def is_yakuman(yaku_list):
+    """
+    檢查役列表是否為役滿
+    """
+    return any(YAKU_HAN.get(name, (0, 0))[0] >= YAKUMAN_HAN for name in yaku_list)
+
+def get_yaku_han(yaku, is_open=False):
+    """
+    取得役列表中一項的番數，支援 "寶牌 N" / "赤寶牌 N" 格式
+    """
+    if yaku in YAKU_HAN:
+        return YAKU_HAN[yaku][1 if is_open else 0]
+    parts = yaku.split()
+    if len(parts) == 2 and parts[1].isdigit():
+        return int(parts[1])
+    return 0
+
+def calculate_fu(hand, win_tile, is_open, is_self_draw, has_waiting=True, is_pinfu=False,
+                 round_wind=0, player_wind=0):
+    """
+    計算符數（取得分最高的拆解方式）
+    has_waiting / is_pinfu 僅為相容舊介面而保留，聽牌形與平和由拆解方式自動判斷
+    """
+    _, fu, _ = evaluate_yaku(hand, win_tile, is_self_draw, is_open, round_wind, player_wind)
     return fu
 
-def calculate_han(hand, win_tile, is_open, is_self_draw, round_wind=0, player_wind=0, dora_count=0, is_riichi=False):
+def _dora_yaku(hand, dora_count):
     """
-    計算翻數（番數）
+    產生寶牌與赤寶牌的役列表項目及番數
     """
     han = 0
     yakus = []
-    
-    # 先加入寶牌（dora）的翻數
     if dora_count > 0:
         han += dora_count
         yakus.append(f"寶牌 {dora_count}")
     
-    # 立直
-    if is_riichi:
-        han += 1
-        yakus.append(YakuType.RIICHI)
-    
-    # 自摸
-    if is_self_draw and not is_open:
-        han += 1
-        yakus.append(YakuType.TSUMO)
-    
     # 檢查赤寶牌
     red_five_count = 0
     for i in range(34, 37):
@@ -454,11 +1298,36 @@ def calculate_han(hand, win_tile, is_open, is_self_draw, round_wind=0, player_wi
     if red_five_count > 0:
         han += red_five_count
         yakus.append(f"{YakuType.AKADORA} {red_five_count}")
-    
-    # 待以後實現更多役種判斷
-    
     return han, yakus
 
+def calculate_han(hand, win_tile, is_open, is_self_draw, round_wind=0, player_wind=0, dora_count=0, is_riichi=False,
+                  is_ippatsu=False, is_double_riichi=False, is_first_turn=False, is_dealer=False):
+    """
+    計算翻數（番數）
+    返回: (番數, 役列表)；無役時為 (0, [])，寶牌不算役
+    """
+    han, _, yakus = _evaluate_with_dora(hand, win_tile, is_self_draw, is_open, round_wind, player_wind,
+                                        dora_count, is_riichi, is_ippatsu, is_double_riichi,
+                                        is_first_turn, is_dealer)
+    return han, yakus
+
+def _evaluate_with_dora(hand, win_tile, is_self_draw, is_open, round_wind, player_wind, dora_count,
+                        is_riichi, is_ippatsu, is_double_riichi, is_first_turn, is_dealer):
+    """
+    評估役並加上寶牌，返回 (總番數, 符數, 役列表)
+    """
+    dora_han, dora_yakus = _dora_yaku(hand, dora_count)
+    han, fu, yakus = evaluate_yaku(hand, win_tile, is_self_draw, is_open, round_wind, player_wind,
+                                   is_riichi, is_ippatsu, is_double_riichi, is_first_turn, is_dealer,
+                                   bonus_han=dora_han)
+    if han == 0:
+        return 0, 0, []
+    # 役滿不計寶牌
+    if not is_yakuman(yakus):
+        han += dora_han
+        yakus = yakus + dora_yakus
+    return han, fu, yakus
+
 def analyze_winning_hand(hand_ids, win_tile_id):
     """
     分析和牌結構，返回整理後的牌型
@@ -479,7 +1348,8 @@ def analyze_winning_hand(hand_ids, win_tile_id):
     
     return sorted_tiles
 
-def calculate_score(hand, win_tile, is_self_draw=False, is_open=False, is_dealer=False, round_wind=0, player_wind=0, dora_count=0, is_riichi=False):
+def calculate_score(hand, win_tile, is_self_draw=False, is_open=False, is_dealer=False, round_wind=0, player_wind=0, dora_count=0, is_riichi=False,
+                    is_ippatsu=False, is_double_riichi=False, is_first_turn=False):
     """
     計算和牌得分
     基於日本麻將（東大式）的計分規則
@@ -494,57 +1364,40 @@ def calculate_score(hand, win_tile, is_self_draw=False, is_open=False, is_dealer
         player_wind: 自風（0=東, 1=南, 2=西, 3=北）
         dora_count: 寶牌數量
         is_riichi: 是否立直
+        is_ippatsu: 是否一發
+        is_double_riichi: 是否雙立直
+        is_first_turn: 是否第一巡自摸（天和/地和）
     
     返回:
         score: 分數
         yaku_list: 役列表
     """
-    # 計算赤寶牌的數量
-    akadora_count = 0
-    if len(hand) > 34:
-        for i in range(34, min(len(hand), 37)):
-            akadora_count += hand[i]
+    # 已啟用快取時，以正規化手牌與場況參數查詢
+    cache = _score_cache
+    key = None
+    entry = None
+    if cache is not None:
+        normalized = counts_to_list(hand)
+        if max(normalized) <= 4:
+            raw = hand.tolist() if hasattr(hand, 'tolist') else list(hand)
+            key = (tuple(hand_keys(normalized)), tuple(raw[RED_FIVE_MAN:]), normalize_red_five(win_tile), is_self_draw, is_open,
+                   is_dealer, round_wind, player_wind, dora_count, is_riichi, is_ippatsu,
+                   is_double_riichi, is_first_turn)
+            entry = cache.get(key)
     
-    # 將赤寶牌計入對應的普通牌，用於和牌判斷和符數計算
-    normalized_hand = normalize_counts(hand)
-    
-    # 計算符數
-    fu = calculate_fu(normalized_hand, win_tile, is_open, is_self_draw, has_waiting=True)
-    
-    # 計算翻數
-    han, yaku_list = calculate_han(hand, win_tile, is_open, is_self_draw, round_wind, player_wind, dora_count, is_riichi)
+    if entry is None:
+        # 在所有拆解方式中選擇得分最高的役與符數
+        han, fu, yaku_list = _evaluate_with_dora(hand, win_tile, is_self_draw, is_open, round_wind, player_wind,
+                                                 dora_count, is_riichi, is_ippatsu, is_double_riichi,
+                                                 is_first_turn, is_dealer)
+        entry = (han, fu, tuple(yaku_list), is_yakuman(yaku_list))
+        if key is not None:
+            cache.put(key, entry)
+    han, fu, yaku_list, yakuman = entry
     
     # 如果沒有役，則無法和牌
-    if han == 0 or (han == dora_count + akadora_count and not is_riichi and not is_self_draw):
+    if han == 0:
         return 0, []
     
-    # 計算基本點數
-    if han >= 13:  # 役滿
-        base_points = 8000
-    elif han >= 11:  # 三倍滿
-        base_points = 6000
-    elif han >= 8:  # 倍滿
-        base_points = 4000
-    elif han >= 6:  # 跳滿
-        base_points = 3000
-    elif han >= 5:  # 滿貫
-        base_points = 2000
-    else:
-        base_points = fu * (2 ** (han + 2))
-        # 限制上限
-        if base_points > 2000:
-            base_points = 2000
-    
-    # 根據自摸/榮和和是否為莊家計算最終得分
-    if is_self_draw:
-        if is_dealer:  # 莊家自摸
-            score = base_points * 6  # 閒家各支付2倍基本分
-        else:  # 子家自摸
-            score = base_points * 4  # 莊家支付2倍基本分，閒家各支付基本分
-    else:
-        if is_dealer:  # 莊家榮和
-            score = base_points * 2  # 放銃者支付2倍基本分
-        else:  # 子家榮和
-            score = base_points * 1  # 放銃者支付1倍基本分
-    
-    return score, yaku_list 
\ No newline at end of file
+    return lookup_score(han, fu, is_dealer, is_self_draw, yakuman), list(yaku_list)
+ 
\ No newline at end of file
@@ -0,0 +1,44 @@
+import src.apex
+from src.apex import train_apex
+from src.environment.mahjong_env import MahjongEnv
+
+def test_train_apex():
+    print("測試Ape-X actor-learner訓練...")
+    agent, stats = train_apex(num_actors=2, total_updates=100, batch_size=32, warmup=200,
+                              publish_interval=10, report_interval=50, seed=0)
+    assert stats["updates"] == 100
+    assert stats["transitions_received"] >= 200 and len(agent.memory) == stats["transitions_received"]
+    assert (stats["actor_steps"] > 0).all() and (stats["actor_steps_per_second"] > 0).all()
+    assert stats["publishes"] == 11 and (stats["actor_bytes_loaded"] > 0).all()
+    actor_rates = ", ".join(f"{rate:.0f}" for rate in stats["actor_steps_per_second"])
+    print(f"actors: [{actor_rates}] 步/秒, learner: {stats['updates_per_second']:.1f} 更新/秒")
+
+def test_train_apex_architectures():
+    print("測試actors使用與learner相同的網絡架構...")
+    for options in ({"dueling": True, "double_dqn": True}, {"conv": True}):
+        agent, stats = train_apex(num_actors=2, total_updates=10, batch_size=32, warmup=100, publish_interval=5,
+                                  seed=1, **options)
+        assert stats["updates"] == 10 and (stats["actor_bytes_loaded"] > 0).all()
+
+class CrashingEnv(MahjongEnv):
+    def step(self, action):
+        raise RuntimeError("模擬環境錯誤")
+
+def test_actor_crash():
+    print("測試所有actor結束時learner報錯而非無限等待...")
+    original_env = src.apex.MahjongEnv
+    src.apex.MahjongEnv = CrashingEnv
+    try:
+        train_apex(num_actors=2, total_updates=10, warmup=100, seed=0)
+    except RuntimeError as error:
+        assert "actor" in str(error)
+        print(f"錯誤訊息: {error}")
+    else:
+        raise AssertionError("應拋出RuntimeError")
+    finally:
+        src.apex.MahjongEnv = original_env
+
+if __name__ == "__main__":
+    test_train_apex()
+    test_train_apex_architectures()
+    test_actor_crash()
@@ -0,0 +1,71 @@
+from src.environment.mahjong_env import MahjongEnv
+from src.environment.observation import HAND_SLICE, RIVER_SLICE, VISIBLE_SLICE, RED_FIVE_SLICE, WALL_SLICE
+from src.models.conv_dqn import TilePlaneDQN
+from src.models.dqn_agent import DQNAgent, MahjongDQN
+import numpy as np
+import torch
+import time
+
+def count_parameters(model):
+    return sum(parameter.numel() for parameter in model.parameters())
+
+def test_tile_planes():
+    print("測試觀察向量轉為牌面平面...")
+    env = MahjongEnv(enable_logging=False, seed=0)
+    env.reset()
+    for action in range(37):
+        observation, _, done, _ = env.step(action)
+        if done:
+            break
+    model = TilePlaneDQN(len(observation), env.action_space.n)
+    planes = model.planes(torch.from_numpy(observation)[None])[0].numpy()
+    assert planes.shape == (21, 34)
+    assert np.array_equal(planes[0], observation[HAND_SLICE])
+    assert np.array_equal(planes[1:5].ravel(), observation[RIVER_SLICE])
+    assert np.array_equal(planes[6], observation[VISIBLE_SLICE])
+    assert np.array_equal(planes[7, [4, 13, 22]], observation[RED_FIVE_SLICE])
+    assert np.count_nonzero(np.delete(planes[7], [4, 13, 22])) == 0
+    assert np.all(planes[20] == observation[WALL_SLICE])
+
+def test_tile_plane_agent():
+    print("測試使用卷積網絡的代理...")
+    env = MahjongEnv(enable_logging=False, seed=1)
+    agent = DQNAgent(env.observation_space.shape[0], env.action_space.n, torch.device("cpu"), conv=True,
+                     double_dqn=True, tau=0.01)
+    assert isinstance(agent.model, TilePlaneDQN)
+    assert count_parameters(agent.model) < count_parameters(MahjongDQN(env.observation_space.shape[0],
+                                                                       env.action_space.n)) / 1.5
+    agent.batch_size = 16
+    state, info = env.reset(return_info=True)
+    for _ in range(64):
+        action = agent.act(state, action_mask=info["action_mask"])
+        assert info["action_mask"][action]
+        next_state, reward, done, info = env.step(action)
+        agent.remember(state, action, reward, next_state, done)
+        state = next_state
+        if done:
+            state, info = env.reset(return_info=True)
+        agent.replay()
+
+def test_inference_speed():
+    rng = np.random.default_rng(0)
+    models = {"MLP": MahjongDQN(254, 100), "TilePlaneDQN": TilePlaneDQN(254, 100)}
+    for name, model in models.items():
+        print(f"{name}: {count_parameters(model)} 個參數")
+    for batch_size in (1, 64, 1024):
+        states = torch.from_numpy(rng.random((batch_size, 254), dtype=np.float32))
+        results = []
+        for name, model in models.items():
+            repeats = max(20, 2000 // batch_size)
+            with torch.no_grad():
+                model(states)
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    model(states)
+            results.append(f"{name} {(time.perf_counter() - start) / repeats * 1e6:.1f}")
+        print(f"批次 {batch_size}: " + ", ".join(results) + " 微秒/次")
+
+if __name__ == "__main__":
+    test_tile_planes()
+    test_tile_plane_agent()
+    test_inference_speed()
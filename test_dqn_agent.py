@@ -0,0 +1,296 @@
+from src.environment.mahjong_env import MahjongEnv
+from src.environment.vec_env import MahjongVecEnv
+from src.models.dqn_agent import (DQNAgent, DuelingMahjongDQN, masked_argmax, masked_random_actions, apex_epsilons,
+                                  legal_action_masks, compile_for_inference, MahjongDQN)
+import numpy as np
+import torch
+import time
+
+def make_agent():
+    env = MahjongEnv(enable_logging=False, seed=0)
+    return env, DQNAgent(env.observation_space.shape[0], env.action_space.n, torch.device("cpu"))
+
+def test_masked_argmax():
+    q_values = torch.tensor([[1.0, 5.0, 3.0, 4.0], [2.0, 1.0, 0.0, -1.0]])
+    mask = torch.tensor([[True, False, True, True], [False, False, True, True]])
+    assert masked_argmax(q_values).tolist() == [1, 0]
+    assert masked_argmax(q_values, mask).tolist() == [3, 2]
+
+    # 隨機選擇只會選到合法動作，且大致均勻
+    torch.manual_seed(0)
+    mask = torch.zeros(20000, 6, dtype=torch.bool)
+    mask[:, [1, 2, 4]] = True
+    actions = masked_random_actions(mask)
+    counts = np.bincount(actions.numpy(), minlength=6)
+    print(f"遮罩隨機選擇的分佈: {counts.tolist()}")
+    assert counts[[0, 3, 5]].sum() == 0
+    assert counts[[1, 2, 4]].min() > 6000
+    assert masked_random_actions(None, 5, 6).shape == (5,)
+
+def test_act_with_mask():
+    print("測試以遮罩選擇動作...")
+    env, agent = make_agent()
+    state, info = env.reset(return_info=True)
+    for epsilon in (0, 1):
+        for _ in range(200):
+            mask = info["action_mask"]
+            action = agent.act(state, action_mask=mask, epsilon=epsilon)
+            assert mask[action]
+            state, _, done, info = env.step(action)
+            if done:
+                state, info = env.reset(return_info=True)
+
+    # 遮罩可以是裝置上的張量；舊版valid_actions列表仍可使用
+    mask = torch.as_tensor(info["action_mask"])
+    assert mask[agent.act(state, action_mask=mask, epsilon=0)]
+    assert agent.act(state, valid_actions=[3, 7], epsilon=1) in (3, 7)
+    assert agent.act(state, valid_actions=[3, 7], epsilon=0) in (3, 7)
+
+    # 批次選擇與逐一選擇的貪婪動作一致
+    vec_states = np.random.default_rng(0).random((32, env.observation_space.shape[0]), dtype=np.float32)
+    vec_masks = np.random.default_rng(1).random((32, env.action_space.n)) < 0.2
+    actions = agent.act_batch(vec_states, vec_masks, epsilons=0)
+    assert actions.shape == (32,) and vec_masks[np.arange(32), actions].all()
+    expected = [agent.act(s, action_mask=m, epsilon=0) for s, m in zip(vec_states, vec_masks)]
+    assert actions.tolist() == expected
+    actions = agent.act_batch(vec_states, vec_masks, epsilons=1)
+    assert vec_masks[np.arange(32), actions].all()
+
+def test_legal_action_masks():
+    print("測試由觀察向量推得的合法動作遮罩...")
+    env = MahjongEnv(enable_logging=False, seed=3)
+    state, info = env.reset(return_info=True)
+    rng = np.random.default_rng(3)
+    for _ in range(300):
+        mask = legal_action_masks(torch.from_numpy(state)[None])[0].numpy()
+        assert np.array_equal(mask, info["action_mask"][:37]) and not info["action_mask"][37:].any()
+        state, _, done, info = env.step(int(rng.choice(np.flatnonzero(info["action_mask"]))))
+        if done:
+            state, info = env.reset(return_info=True)
+
+def test_double_dqn_target():
+    print("測試double DQN目標只考慮下一狀態的合法動作...")
+    env, agent = make_agent()
+    state, info = env.reset(return_info=True)
+    next_states = []
+    for _ in range(64):
+        state, _, done, info = env.step(int(np.flatnonzero(info["action_mask"])[0]))
+        next_states.append(state)
+        if done:
+            state, info = env.reset(return_info=True)
+    next_states = torch.from_numpy(np.array(next_states))
+    with torch.no_grad():
+        agent.target_model.fc4.bias.add_(torch.linspace(0, 1, env.action_space.n))
+        target_q_values = agent.target_model(next_states)
+        assert torch.equal(agent.next_q_values(next_states), target_q_values.max(1)[0])
+
+        # 以線上網絡在合法動作中選動作，目標網絡估值
+        agent.double_dqn = True
+        masks = legal_action_masks(next_states)
+        next_actions = agent.model(next_states)[:, :37].masked_fill(~masks, float("-inf")).argmax(1)
+        expected = target_q_values[torch.arange(64), next_actions]
+        assert torch.equal(agent.next_q_values(next_states), expected)
+
+def test_dueling_network():
+    model = DuelingMahjongDQN(254, 100)
+    states = torch.rand(8, 254)
+    q_values = model(states)
+    assert q_values.shape == (8, 100)
+    # 優勢均值為0，Q值均值即為狀態價值
+    value = model.value(torch.relu(model.value_fc(torch.relu(model.fc2(torch.relu(model.fc1(states)))))))
+    assert torch.allclose(q_values.mean(dim=1, keepdim=True), value, atol=1e-5)
+    agent = DQNAgent(254, 100, torch.device("cpu"), dueling=True, double_dqn=True, tau=0.01)
+    assert isinstance(agent.model, DuelingMahjongDQN)
+
+def test_soft_update():
+    print("測試Polyak軟更新...")
+    env, agent = make_agent()
+    with torch.no_grad():
+        for parameter in agent.model.parameters():
+            parameter.add_(1.0)
+    before = [parameter.clone() for parameter in agent.target_model.parameters()]
+    agent.soft_update_target_network(0.1)
+    for old, online, target in zip(before, agent.model.parameters(), agent.target_model.parameters()):
+        assert torch.allclose(target, 0.9 * old + 0.1 * online, atol=1e-6)
+
+    # 設定tau時每次梯度更新後自動軟更新
+    agent.tau = 0.5
+    agent.batch_size = 8
+    state = env.reset()
+    # 記憶體不足一個批次時不更新，並返回False
+    assert agent.replay() is False
+    for _ in range(8):
+        agent.remember(state, 0, 0.0, state, False)
+    before = agent.target_model.fc1.weight.clone()
+    assert agent.replay() is True
+    assert not torch.equal(before, agent.target_model.fc1.weight)
+
+    repeats = 500
+    start = time.perf_counter()
+    for _ in range(repeats):
+        agent.update_target_network()
+    hard_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        agent.soft_update_target_network(0.005)
+    soft_time = (time.perf_counter() - start) / repeats
+    print(f"load_state_dict硬更新: {hard_time * 1e6:.1f} 微秒/次, _foreach軟更新: {soft_time * 1e6:.1f} 微秒/次")
+
+def test_compiled_inference():
+    print("測試編譯後的推論模型...")
+    env = MahjongEnv(enable_logging=False, seed=4)
+    agent = DQNAgent(env.observation_space.shape[0], env.action_space.n, torch.device("cpu"),
+                     compile_inference="trace")
+    assert agent.policy_model is not agent.model
+    eager = DQNAgent(env.observation_space.shape[0], env.action_space.n, torch.device("cpu"))
+    eager.model.load_state_dict(agent.model.state_dict())
+
+    # 訓練更新後編譯模型仍使用最新參數
+    agent.batch_size = 16
+    state, info = env.reset(return_info=True)
+    for _ in range(32):
+        agent.remember(state, int(np.flatnonzero(info["action_mask"])[0]), 1.0, state, False)
+    agent.replay()
+    eager.model.load_state_dict(agent.model.state_dict())
+    states = np.random.default_rng(0).random((64, env.observation_space.shape[0]), dtype=np.float32)
+    masks = np.random.default_rng(1).random((64, env.action_space.n)) < 0.3
+    assert np.array_equal(agent.act_batch(states, masks, epsilons=0), eager.act_batch(states, masks, epsilons=0))
+    assert agent.act(states[0], action_mask=masks[0], epsilon=0) == eager.act(states[0], action_mask=masks[0],
+                                                                              epsilon=0)
+
+    # 編譯失敗時退回eager模式
+    original_trace = torch.jit.trace
+
+    def failing_trace(*args, **kwargs):
+        raise RuntimeError("模擬編譯失敗")
+
+    torch.jit.trace = failing_trace
+    try:
+        model = MahjongDQN(254, 100)
+        assert compile_for_inference(model, "trace", torch.zeros(1, 254)) is model
+    finally:
+        torch.jit.trace = original_trace
+
+def test_compiled_inference_speed(methods=("trace",)):
+    model = MahjongDQN(254, 100)
+    rng = np.random.default_rng(0)
+    for batch_size in (1, 256):
+        states = torch.from_numpy(rng.random((batch_size, 254), dtype=np.float32))
+        repeats = 2000 if batch_size == 1 else 200
+        results = []
+        for method in ("eager",) + tuple(methods):
+            policy = model if method == "eager" else compile_for_inference(model, method, states)
+            with torch.inference_mode():
+                policy(states)
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    policy(states)
+            results.append(f"{method} {(time.perf_counter() - start) / repeats * 1e6:.1f}")
+        print(f"批次 {batch_size}: " + ", ".join(results) + " 微秒/次")
+
+def test_memory_options():
+    # 精簡經驗回放不能與n步回報或優先經驗回放同時使用
+    for options in ({"n_step": 3}, {"prioritized": True}):
+        try:
+            DQNAgent(254, 100, torch.device("cpu"), compact_memory=True, **options)
+        except ValueError:
+            continue
+        raise AssertionError(f"compact_memory與{options}應拋出ValueError")
+
+    # 已在外部累積n步回報時，記憶體直接保存，只以 gamma ** n_step 自舉
+    for prioritized in (False, True):
+        agent = DQNAgent(254, 100, torch.device("cpu"), prioritized=prioritized, n_step=3, n_step_accumulated=True)
+        assert agent.n_step == 3 and agent.memory.n_step_accumulator is None
+        agent.remember(np.zeros(254), 1, 2.0, np.ones(254), False)
+        assert len(agent.memory) == 1
+
+def test_act_speed():
+    env, agent = make_agent()
+    state, info = env.reset(return_info=True)
+    mask = info["action_mask"]
+    valid_actions = list(np.flatnonzero(mask))
+
+    def dict_act(state, valid_actions):
+        # 舊版做法：移到CPU後以字典與max選出合法動作中Q值最大者
+        state_tensor = torch.FloatTensor(state).unsqueeze(0).to(agent.device)
+        q_values = agent.model(state_tensor).cpu().detach().numpy()[0]
+        valid_q_values = {a: q_values[a] for a in valid_actions}
+        return max(valid_q_values, key=valid_q_values.get)
+
+    repeats = 2000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        dict_act(state, valid_actions)
+    dict_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        agent.act(state, action_mask=mask, epsilon=0)
+    mask_time = (time.perf_counter() - start) / repeats
+    print(f"字典選擇: {dict_time * 1e6:.1f} 微秒/次, 遮罩選擇: {mask_time * 1e6:.1f} 微秒/次")
+
+def test_act_batch_epsilons():
+    print("測試各環境獨立探索率的批次選擇...")
+    epsilons = apex_epsilons(8)
+    assert np.isclose(epsilons[0], 0.4) and np.isclose(epsilons[-1], 0.4 ** 8)
+    assert np.all(np.diff(epsilons) < 0) and apex_epsilons(1).tolist() == [np.float32(0.4)]
+
+    env, agent = make_agent()
+    rng = np.random.default_rng(2)
+    states = rng.random((64, env.observation_space.shape[0]), dtype=np.float32)
+    masks = rng.random((64, env.action_space.n)) < 0.3
+    greedy = agent.act_batch(states, masks, epsilons=0)
+
+    # 前半環境完全貪婪，後半完全隨機
+    epsilons = np.repeat([0.0, 1.0], 32)
+    changed = np.zeros(64, dtype=bool)
+    for _ in range(20):
+        actions = agent.act_batch(states, masks, epsilons)
+        assert masks[np.arange(64), actions].all()
+        assert np.array_equal(actions[:32], greedy[:32])
+        changed |= actions != greedy
+    assert changed[32:].sum() > 24
+
+def test_act_batch_speed():
+    env, agent = make_agent()
+    num_envs = 256
+    vec_env = MahjongVecEnv(num_envs, seed=0)
+    states, infos = vec_env.reset(return_info=True)
+    masks = np.array([info["action_mask"] for info in infos])
+    epsilons = apex_epsilons(num_envs)
+
+    start = time.perf_counter()
+    for i in range(num_envs):
+        agent.act(states[i], action_mask=masks[i], epsilon=float(epsilons[i]))
+    single_time = (time.perf_counter() - start) / num_envs
+
+    repeats = 20
+    start = time.perf_counter()
+    for _ in range(repeats):
+        agent.act_batch(states, masks, epsilons)
+    batch_time = (time.perf_counter() - start) / repeats / num_envs
+    print(f"逐一act: {single_time * 1e6:.1f} 微秒/環境, act_batch N={num_envs}: {batch_time * 1e6:.2f} 微秒/環境")
+
+    # 向量化環境 + 批次推論的完整收集迴圈
+    steps = 50
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = agent.act_batch(states, masks, epsilons)
+        states, rewards, dones, infos = vec_env.step(actions)
+        masks = vec_env.action_masks()
+    rollout_time = (time.perf_counter() - start) / (steps * num_envs)
+    print(f"向量化收集: {rollout_time * 1e6:.2f} 微秒/步")
+
+if __name__ == "__main__":
+    test_masked_argmax()
+    test_act_with_mask()
+    test_legal_action_masks()
+    test_double_dqn_target()
+    test_dueling_network()
+    test_soft_update()
+    test_memory_options()
+    test_compiled_inference()
+    test_compiled_inference_speed(("trace", "compile"))
+    test_act_speed()
+    test_act_batch_epsilons()
+    test_act_batch_speed()
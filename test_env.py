@@ -1,5 +1,9 @@
 from src.environment.mahjong_env import MahjongEnv
-from src.utils.mahjong_utils import id_to_string
+from src.environment.observation import OBSERVATION_SIZE, OBSERVATION_SLICES
+from src.utils.mahjong_utils import (id_to_string, tile_to_id, normalize_red_five, normalize_counts, hand_to_counts,
+                                     instances_to_counts, NUM_INSTANCES, RED_FIVE_MAN)
+import numpy as np
+import time
 
 def test_environment():
     # 創建環境
@@ -40,7 +44,132 @@ def test_environment():
     
     print("\n環境測試完成")
 
+def test_compact_tiles():
+    print("檢查整數牌表示與增量計數...")
+    env = MahjongEnv(enable_logging=False)
+    np.random.seed(3)
+    for _ in range(3):
+        env.reset()
+        done = False
+        while not done:
+            player = env.current_player
+            hand_ids = env.hand_ids(player)
+            _, _, done, _ = env.step(hand_ids[np.random.randint(len(hand_ids))])
+            
+            # 牌山、手牌與河牌恰好是136張牌各一張
+            instances = [env.wall[env.wall_position:]]
+            instances += [env.hands[p, :env.hand_sizes[p]] for p in range(4)]
+            discards = np.concatenate([np.array(d, dtype=np.uint8) for d in env.discards])
+            instances = np.concatenate(instances + [discards])
+            assert np.array_equal(np.sort(instances), np.arange(NUM_INSTANCES))
+            
+            # 增量維護的計數與重新計算的一致
+            for p in range(4):
+                assert np.array_equal(env.hand_counts[p], instances_to_counts(env.hands[p, :env.hand_sizes[p]]))
+            assert np.array_equal(env.get_visible_counts(), instances_to_counts(discards))
+        
+        # 打出後的手牌應為13張
+        assert all(size in (13, 14) for size in env.hand_sizes)
+    
+    # 舊版 (suit, value) 表示仍可使用
+    hand = env.players_hands[env.current_player]
+    assert [tile_to_id(tile) for tile in hand] == [normalize_red_five(t) for t in env.hand_ids(env.current_player)]
+    print("整數牌表示測試通過")
+
+def rebuild_observation(env):
+    """
+    由環境狀態重新計算觀察向量，用於驗證增量更新的結果
+    """
+    player = env.current_player
+    obs = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+    hand = normalize_counts(env.hand_counts[player].astype(np.int32))[:34]
+    obs[OBSERVATION_SLICES["hand"]] = hand / 4
+    obs[OBSERVATION_SLICES["red_fives"]] = env.hand_counts[player, 34:37]
+    rivers = obs[OBSERVATION_SLICES["rivers"]].reshape(4, 34)
+    for i in range(4):
+        discards = np.array(env.discards[(player + i) % 4], dtype=np.uint8)
+        rivers[i] = normalize_counts(instances_to_counts(discards))[:34] / 4
+    dora = normalize_counts(hand_to_counts(env.dora_indicators))[:34]
+    obs[OBSERVATION_SLICES["dora_indicators"]] = dora / 4
+    obs[OBSERVATION_SLICES["round_wind"].start + env.round_wind] = 1
+    obs[OBSERVATION_SLICES["seat_wind"].start + (player - env.dealer) % 4] = 1
+    visible = hand + normalize_counts(env.get_visible_counts())[:34] + dora
+    obs[OBSERVATION_SLICES["visible"]] = visible / 4
+    obs[OBSERVATION_SLICES["wall_remaining"]] = env.wall_remaining / 136
+    return obs
+
+def test_observation_encoder():
+    print("檢查觀察向量的增量更新...")
+    env = MahjongEnv(enable_logging=False, seed=5)
+    assert env.observation_space.shape == (OBSERVATION_SIZE,)
+    for _ in range(3):
+        observation = env.reset()
+        assert np.allclose(observation, rebuild_observation(env))
+        done = False
+        while not done:
+            hand_ids = env.hand_ids(env.current_player)
+            observation, _, done, _ = env.step(hand_ids[env.rng.integers(len(hand_ids))])
+            assert observation.dtype == np.float32 and observation.max() <= 1
+            assert np.allclose(observation, rebuild_observation(env))
+    
+    # 不複製時返回重用的緩衝區
+    env = MahjongEnv(enable_logging=False, seed=5, copy_observation=False)
+    first = env.reset()
+    second = env.step(env.hand_ids(env.current_player)[0])[0]
+    assert first is second
+    print(f"觀察向量長度: {OBSERVATION_SIZE}，增量更新與重新計算一致")
+
+def test_reset_seed():
+    env_a = MahjongEnv(enable_logging=False, seed=7)
+    env_b = MahjongEnv(enable_logging=False, seed=7)
+    assert np.array_equal(env_a.wall, env_b.wall)
+    env_a.reset(seed=11)
+    env_b.reset(seed=11)
+    assert np.array_equal(env_a.hands, env_b.hands)
+    assert env_a.wall_remaining == 136 - 53
+    
+    start = time.perf_counter()
+    for _ in range(10000):
+        env_a.reset()
+    print(f"reset: {(time.perf_counter() - start) / 10000 * 1e6:.1f} 微秒/次")
+
+def test_action_mask():
+    print("檢查合法動作遮罩...")
+    env = MahjongEnv(enable_logging=False, seed=9)
+    observation, info = env.reset(return_info=True)
+    mask = info['action_mask']
+    assert mask.shape == (env.action_space.n,) and mask.dtype == bool
+    
+    for _ in range(200):
+        player = env.current_player
+        hand_ids = set(env.hand_ids(player))
+        expected = [tile_id in hand_ids or (tile_id in (4, 13, 22) and RED_FIVE_MAN + tile_id // 9 in hand_ids)
+                    for tile_id in range(37)]
+        assert list(mask[:37]) == expected and not mask[37:].any()
+        
+        # 不合法的動作不改變狀態
+        illegal = np.flatnonzero(~mask)
+        size = env.hand_sizes[player]
+        _, _, _, info = env.step(int(env.rng.choice(illegal)))
+        assert env.current_player == player and env.hand_sizes[player] == size
+        assert np.array_equal(info['action_mask'], mask)
+        
+        # 合法的動作一定會打出一張牌並輪到下一位
+        _, _, done, info = env.step(int(env.rng.choice(np.flatnonzero(mask))))
+        assert env.current_player == (player + 1) % 4
+        mask = info['action_mask']
+        if done:
+            observation, info = env.reset(return_info=True)
+            mask = info['action_mask']
+    
+    # 隨機從100個動作中選擇時大部分是無效動作
+    valid = sum(MahjongEnv(enable_logging=False, seed=i).action_mask()[env.action_space.sample()] for i in range(200))
+    print(f"不使用遮罩時有效動作比例: {valid / 200:.0%}")
+
 if __name__ == "__main__":
-    from src.utils.mahjong_utils import tile_to_id
     print("開始測試麻將環境...")
-    test_environment() 
\ No newline at end of file
+    test_environment()
+    test_compact_tiles()
+    test_observation_encoder()
+    test_reset_seed() 
+    test_action_mask()
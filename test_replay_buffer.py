@@ -0,0 +1,326 @@
+from src.models.replay_buffer import (ReplayBuffer, CompactReplayBuffer, PrioritizedReplayBuffer, SumTree,
+                                      NStepAccumulator)
+from src.environment.vec_env import MahjongVecEnv
+from src.environment.observation import OBSERVATION_SIZE
+from src.models.dqn_agent import DQNAgent
+from collections import deque
+import numpy as np
+import random
+import time
+import torch
+
+STATE_SIZE = 254
+
+def random_transitions(rng, count):
+    states = rng.random((count, STATE_SIZE), dtype=np.float32)
+    actions = rng.integers(0, 100, count)
+    rewards = rng.standard_normal(count).astype(np.float32)
+    next_states = rng.random((count, STATE_SIZE), dtype=np.float32)
+    dones = rng.random(count) < 0.1
+    return states, actions, rewards, next_states, dones
+
+def test_ring_buffer():
+    print("測試環形緩衝區的寫入與覆寫...")
+    rng = np.random.default_rng(0)
+    transitions = random_transitions(rng, 25)
+    buffer = ReplayBuffer(10, STATE_SIZE, seed=0)
+    for i in range(25):
+        buffer.add(*(array[i] for array in transitions))
+        assert len(buffer) == min(i + 1, 10)
+
+    # 寫滿後保留最近的10筆：第k筆位於 k % 10
+    for k in range(15, 25):
+        state, action, reward, next_state, done = buffer.gather(np.array([k % 10]))
+        assert np.array_equal(state[0], transitions[0][k]) and action[0] == transitions[1][k]
+        assert reward[0] == transitions[2][k] and np.array_equal(next_state[0], transitions[3][k])
+        assert done[0] == transitions[4][k]
+
+    # 批次寫入（含超過容量與跨越尾端）與依序寫入相同
+    for count in (3, 7, 10, 23):
+        sequential = ReplayBuffer(10, STATE_SIZE)
+        batched = ReplayBuffer(10, STATE_SIZE)
+        for i in range(6):
+            sequential.add(*(array[i] for array in transitions))
+        batched.add_batch(*(array[:6] for array in transitions))
+        for i in range(count):
+            sequential.add(*(array[i] for array in transitions))
+        batched.add_batch(*(array[:count] for array in transitions))
+        assert len(sequential) == len(batched) and sequential.position == batched.position
+        for name in ("states", "actions", "rewards", "next_states", "dones"):
+            assert np.array_equal(getattr(sequential, name), getattr(batched, name))
+
+    states, actions, rewards, next_states, dones = buffer.sample(64)
+    assert states.shape == (64, STATE_SIZE) and states.dtype == np.float32
+    assert actions.dtype == np.int64 and dones.dtype == np.float32
+    print("環形緩衝區測試通過")
+
+def test_sample_speed():
+    rng = np.random.default_rng(1)
+    capacity = 100000
+    transitions = random_transitions(rng, capacity)
+
+    memory = deque(maxlen=capacity)
+    for i in range(capacity):
+        memory.append((transitions[0][i], int(transitions[1][i]), float(transitions[2][i]),
+                       transitions[3][i], bool(transitions[4][i])))
+    buffer = ReplayBuffer(capacity, STATE_SIZE)
+    buffer.add_batch(*transitions)
+
+    for batch_size in (64, 256):
+        repeats = 200
+        start = time.perf_counter()
+        for _ in range(repeats):
+            minibatch = random.sample(memory, batch_size)
+            states, actions, rewards, next_states, dones = zip(*minibatch)
+            states, next_states = np.array(states), np.array(next_states)
+            actions, rewards, dones = np.array(actions), np.array(rewards), np.array(dones)
+        deque_time = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            buffer.sample(batch_size)
+        ring_time = (time.perf_counter() - start) / repeats
+        print(f"批次{batch_size}: deque {deque_time * 1e6:.0f} 微秒, 環形緩衝區 {ring_time * 1e6:.0f} 微秒 "
+              f"({deque_time / ring_time:.1f}x)")
+
+    # 大容量只配置一次連續數組，沒有每筆經驗的Python物件開銷
+    start = time.perf_counter()
+    large = ReplayBuffer(2000000, STATE_SIZE)
+    large.add_batch(*transitions)
+    print(f"建立容量2000000的緩衝區並寫入{capacity}筆: {time.perf_counter() - start:.2f} 秒")
+
+def transition_key(state, action, reward, next_state, done):
+    return (state.tobytes(), int(action), float(reward), next_state.tobytes(), float(done))
+
+def buffer_nbytes(buffer):
+    return sum(array.nbytes for array in vars(buffer).values() if isinstance(array, np.ndarray))
+
+def test_compact_buffer():
+    print("測試觀察去重的精簡經驗回放...")
+    num_envs = 4
+    vec_env = MahjongVecEnv(num_envs, seed=2)
+    states = vec_env.reset()
+    compact = CompactReplayBuffer(400, OBSERVATION_SIZE, num_envs=num_envs, seed=0)
+    recent = [[] for _ in range(num_envs)]
+    rng = np.random.default_rng(3)
+    for _ in range(500):
+        masks = vec_env.action_masks()
+        actions = (rng.random(masks.shape) * masks).argmax(axis=1)
+        next_states, rewards, dones, infos = vec_env.step(actions)
+        # 結束的局以結束時的觀察作為next_state
+        final_states = next_states.copy()
+        for i in np.flatnonzero(dones):
+            final_states[i] = infos[i]["terminal_observation"]
+        compact.add_batch(states, actions, rewards, final_states, dones)
+        for i in range(num_envs):
+            recent[i].append(transition_key(states[i], actions[i], rewards[i], final_states[i], dones[i]))
+        states = next_states
+    assert compact.size == compact.valid.sum() and len(compact) > 300
+
+    # 抽出的經驗必須與各環境最近寫入的經驗完全一致（包括局結束時的next_state）
+    kept = set()
+    for i in range(num_envs):
+        kept.update(recent[i][-compact.env_capacity // 2:])
+    everything = set(key for keys in recent for key in keys)
+    batch = compact.sample(2000)
+    assert batch[0].dtype == np.float32 and batch[3].shape == (2000, OBSERVATION_SIZE)
+    sampled = set(transition_key(*(array[j] for array in batch)) for j in range(2000))
+    assert sampled <= everything
+    assert len(kept - sampled) < len(kept) // 2
+    assert any(key[4] for key in sampled)
+
+    # 沒有done而換局（截斷）時，上一筆的next_state仍可完全還原
+    single = CompactReplayBuffer(16, OBSERVATION_SIZE)
+    first, second, third = states[0], states[1], states[2]
+    single.add(first, 1, 0.0, second, False)
+    single.add(third, 2, 1.0, first, True)
+    batch = single.sample(64)
+    keys = set(transition_key(*(array[j] for array in batch)) for j in range(64))
+    assert keys == {transition_key(first, 1, 0.0, second, 0.0), transition_key(third, 2, 1.0, first, 1.0)}
+
+    # 多環境緩衝區的單筆add只寫入第0個環境，與add_batch交錯使用時其他環境不受影響
+    multi = CompactReplayBuffer(100, OBSERVATION_SIZE, num_envs=4)
+    multi.add(first, 1, 0.0, second, False)
+    assert len(multi) == 1 and multi.valid[multi._bases[1:]].sum() == 0
+    multi.add(second, 2, 0.0, third, False)
+    multi.add_batch(np.stack([third] * 4), np.zeros(4), np.zeros(4), np.stack([first] * 4), np.zeros(4))
+    assert len(multi) == 6 and multi.size == multi.valid.sum()
+    assert multi._written.tolist() == [4, 2, 2, 2]
+    keys = set(transition_key(*(array[j] for array in multi.sample(256))) for j in range(256))
+    assert transition_key(first, 1, 0.0, second, 0.0) in keys and len(keys) == 3
+
+    # 每GB可保存的經驗數
+    capacity = 100000
+    ratio = buffer_nbytes(ReplayBuffer(capacity, OBSERVATION_SIZE)) / \
+        buffer_nbytes(CompactReplayBuffer(capacity, OBSERVATION_SIZE, num_envs=num_envs))
+    print(f"每筆經驗記憶體: ReplayBuffer / CompactReplayBuffer = {ratio:.1f}x")
+    assert ratio >= 4
+
+def test_sum_tree():
+    print("測試sum-tree...")
+    rng = np.random.default_rng(4)
+    for capacity in (1, 5, 64, 1000):
+        tree = SumTree(capacity)
+        values = np.zeros(capacity)
+        written = np.zeros(capacity, dtype=bool)
+        for _ in range(5):
+            indices = rng.integers(0, capacity, 50)
+            priorities = rng.random(50)
+            tree.update(indices, priorities)
+            # 索引重複時以最後一個為準
+            for index, priority in zip(indices, priorities):
+                values[index] = priority
+            assert np.isclose(tree.total, values.sum())
+            written[indices] = True
+            assert tree.min == values[written].min()
+            prefixes = rng.random(200) * tree.total
+            expected = np.searchsorted(np.cumsum(values), prefixes, side="right")
+            assert np.array_equal(tree.find(prefixes), expected)
+            assert np.array_equal(tree.get(indices), values[indices])
+
+def test_prioritized_buffer():
+    print("測試優先經驗回放...")
+    rng = np.random.default_rng(5)
+    buffer = PrioritizedReplayBuffer(8, STATE_SIZE, alpha=1.0, beta=0.5, beta_increment=0.1, epsilon=0, seed=0)
+    buffer.add_batch(*random_transitions(rng, 8))
+    assert np.allclose(buffer.tree.get(np.arange(8)), 1.0)
+
+    # 抽樣頻率與優先度成正比
+    priorities = np.array([1, 2, 3, 4, 0.5, 0.5, 8, 1], dtype=np.float64)
+    buffer.update_priorities(np.arange(8), priorities)
+    assert np.isclose(buffer.beta, 0.6) and buffer.max_priority == 8
+    counts = np.bincount(np.concatenate([buffer.sample_indices(64) for _ in range(2000)]), minlength=8)
+    frequencies = counts / counts.sum()
+    print(f"抽樣頻率: {np.round(frequencies, 3).tolist()}")
+    assert np.allclose(frequencies, priorities / priorities.sum(), atol=0.01)
+
+    # 重要性抽樣權重：(P(i) / P_min) ** -beta
+    weights = buffer.importance_weights(np.arange(8))
+    assert np.allclose(weights, (priorities / 0.5) ** -0.6)
+
+    # 新經驗以最大優先度存入
+    buffer.add(*(array[0] for array in random_transitions(rng, 1)))
+    assert buffer.tree.get([0])[0] == 8
+
+def test_prioritized_speed():
+    capacity = 1000000
+    rng = np.random.default_rng(6)
+    tree = SumTree(capacity)
+    tree.update(np.arange(capacity), rng.random(capacity))
+    batch_size = 256
+    repeats = 100
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        indices = tree.find(rng.random(batch_size) * tree.total)
+        tree.update(indices, rng.random(batch_size))
+    vector_time = (time.perf_counter() - start) / repeats
+
+    def find_one(value):
+        node = 1
+        while node < tree.leaf_count:
+            left = tree.sums[2 * node]
+            if value >= left:
+                value -= left
+                node = 2 * node + 1
+            else:
+                node = 2 * node
+        return node - tree.leaf_count
+
+    start = time.perf_counter()
+    for _ in range(repeats // 10):
+        [find_one(value) for value in rng.random(batch_size) * tree.total]
+    loop_time = (time.perf_counter() - start) / (repeats // 10)
+    print(f"容量{capacity}抽樣{batch_size}筆: 逐一走訪 {loop_time * 1e3:.2f} 毫秒, "
+          f"向量化抽樣+更新 {vector_time * 1e3:.2f} 毫秒")
+
+def reference_n_step(episodes, n_step, gamma):
+    """
+    逐局直接計算n步經驗：episodes為 [(states, actions, rewards, next_states, ended)] 列表
+    """
+    transitions = []
+    for states, actions, rewards, next_states, ended in episodes:
+        length = len(actions)
+        for t in range(length):
+            steps = min(n_step, length - t)
+            if steps < n_step and not ended:
+                continue  # 未結束的局最後不足n步的部分尚未輸出
+            ret = sum(gamma ** k * rewards[t + k] for k in range(steps))
+            last = t + steps - 1
+            done = float(ended and last == length - 1)
+            transitions.append((float(states[t][0]), int(actions[t]), round(ret, 6), float(next_states[last][0]), done))
+    return sorted(transitions)
+
+def test_n_step_returns():
+    print("測試n步回報...")
+    rng = np.random.default_rng(7)
+    num_envs, n_step, gamma = 3, 4, 0.9
+    buffer = ReplayBuffer(100000, 1, n_step=n_step, gamma=gamma, num_envs=num_envs)
+    episodes = [[] for _ in range(num_envs)]
+    current = [([], [], [], []) for _ in range(num_envs)]
+    step_id = 0
+    for _ in range(300):
+        # 狀態以唯一編號表示，方便比對
+        states = np.arange(step_id, step_id + num_envs, dtype=np.float32)[:, None]
+        next_states = states + 0.5
+        step_id += num_envs
+        actions = rng.integers(0, 100, num_envs)
+        rewards = rng.integers(-2, 3, num_envs).astype(np.float32)
+        dones = rng.random(num_envs) < 0.15
+        buffer.add_batch(states, actions, rewards, next_states, dones)
+        for i in range(num_envs):
+            for part, value in zip(current[i], (states[i], actions[i], rewards[i], next_states[i])):
+                part.append(value)
+            if dones[i]:
+                episodes[i].append(current[i] + (True,))
+                current[i] = ([], [], [], [])
+    for i in range(num_envs):
+        episodes[i].append(current[i] + (False,))
+
+    expected = reference_n_step([episode for env in episodes for episode in env], n_step, gamma)
+    stored = sorted((float(buffer.states[j][0]), int(buffer.actions[j]), round(float(buffer.rewards[j]), 6),
+                     float(buffer.next_states[j][0]), float(buffer.dones[j])) for j in range(len(buffer)))
+    assert len(stored) == len(expected)
+    assert stored == expected
+    print(f"n={n_step}: 存入{len(stored)}筆，與逐局計算一致")
+
+    # n_step=1 時與原本相同；單一環境的add也會累積
+    accumulator = NStepAccumulator(1, 2, 0.5, 1)
+    assert accumulator.push(np.zeros((1, 1)), [1], [1.0], np.ones((1, 1)), [False]) is None
+    states, actions, rewards, next_states, dones = accumulator.push(np.ones((1, 1)), [2], [2.0],
+                                                                    np.full((1, 1), 2), [True])
+    assert sorted(rewards.tolist()) == [2.0, 2.0] and dones.tolist() == [1, 1]
+    buffer = PrioritizedReplayBuffer(10, 1, n_step=3, gamma=0.5)
+    for t in range(5):
+        buffer.add(np.array([t]), t, 1.0, np.array([t + 1]), False)
+    assert len(buffer) == 3 and np.allclose(buffer.rewards[:3], 1.75) and buffer.next_states[0][0] == 3
+
+def test_n_step_add_multi_env():
+    print("測試多環境緩衝區的單筆add...")
+    for buffer_class in (ReplayBuffer, PrioritizedReplayBuffer):
+        # add只推進第0個環境，與add_batch交錯使用時其他環境的累積不受影響
+        buffer = buffer_class(100, 1, n_step=2, gamma=0.5, num_envs=4)
+        for t in range(5):
+            buffer.add(np.array([t]), t, 1.0, np.array([t + 1]), False)
+        assert len(buffer) == 4 and np.allclose(buffer.rewards[:4], 1.5)
+        assert buffer.states[:4, 0].tolist() == [0, 1, 2, 3] and buffer.next_states[:4, 0].tolist() == [2, 3, 4, 5]
+        buffer.add_batch(np.full((4, 1), 10.0), np.zeros(4), np.ones(4), np.full((4, 1), 11.0), np.zeros(4, bool))
+        assert len(buffer) == 5 and buffer.states[4, 0] == 4
+        buffer.add(np.array([20]), 0, 1.0, np.array([21]), True)
+        assert len(buffer) == 7 and buffer.dones[5:7].tolist() == [1, 1]
+
+    # 透過DQNAgent.remember也只推進第0個環境
+    agent = DQNAgent(3, 5, torch.device("cpu"), n_step=3, num_envs=2)
+    for t in range(6):
+        agent.remember(np.full(3, t), 0, 1.0, np.full(3, t + 1), False)
+    assert len(agent.memory) == 4
+
+if __name__ == "__main__":
+    test_ring_buffer()
+    test_sample_speed()
+    test_compact_buffer()
+    test_sum_tree()
+    test_prioritized_buffer()
+    test_prioritized_speed()
+    test_n_step_returns()
+    test_n_step_add_multi_env()
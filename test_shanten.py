@@ -0,0 +1,211 @@
+from src.utils.mahjong_utils import (calculate_shanten, calculate_standard_shanten,
+                                     calculate_chiitoitsu_shanten, calculate_kokushi_shanten,
+                                     calculate_effective_tiles, calculate_ukeire,
+                                     check_win, hand_to_counts, RED_FIVE_PIN)
+from test_win_table import random_winning_hand
+import numpy as np
+import random
+import time
+
+def is_tenpai_brute_force(counts):
+    """
+    逐一嘗試34種牌，檢查13張手牌是否聽牌
+    """
+    for tile in range(34):
+        if counts[tile] < 4:
+            counts[tile] += 1
+            win = check_win(counts)
+            counts[tile] -= 1
+            if win:
+                return True
+    return False
+
+def brute_force_shanten(counts):
+    """
+    依定義以換牌搜索計算13張手牌的向聽數
+    只精確計算到一向聽，超過則返回2
+    """
+    counts = counts.copy()
+    if is_tenpai_brute_force(counts):
+        return 0
+    for discard in np.flatnonzero(counts[:34]):
+        counts[discard] -= 1
+        for tile in range(34):
+            if tile != discard and counts[tile] < 4:
+                counts[tile] += 1
+                tenpai = is_tenpai_brute_force(counts)
+                counts[tile] -= 1
+                if tenpai:
+                    counts[discard] += 1
+                    return 1
+        counts[discard] += 1
+    return 2
+
+def random_hand(rng, size=13):
+    """
+    從完整牌山中隨機抽取手牌
+    """
+    wall = [tile for tile in range(34) for _ in range(4)]
+    return hand_to_counts(rng.sample(wall, size))
+
+def near_tenpai_hand(rng, exchanges):
+    """
+    從和牌手牌拿掉一張，再隨機交換若干張，得到接近聽牌的13張手牌
+    """
+    counts = random_winning_hand(rng)
+    counts[rng.choice(list(np.flatnonzero(counts[:34])))] -= 1
+    for _ in range(exchanges):
+        counts[rng.choice(list(np.flatnonzero(counts[:34])))] -= 1
+        while True:
+            tile = rng.randrange(34)
+            if counts[tile] < 4:
+                counts[tile] += 1
+                break
+    return counts
+
+def test_shanten_matches_brute_force():
+    print("比較向聽數與換牌搜索結果...")
+    rng = random.Random(7)
+    hands = [near_tenpai_hand(rng, exchanges) for exchanges in (0, 1, 2) for _ in range(15)]
+    # 七對子與國士無雙的聽牌形
+    hands.append(hand_to_counts([0, 0, 2, 2, 5, 5, 9, 9, 13, 13, 27, 27, 33]))
+    hands.append(hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33]))
+    hands.append(hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 33, 33]))
+
+    mismatches = 0
+    for counts in hands:
+        expected = brute_force_shanten(counts)
+        shanten = calculate_shanten(counts)
+        if min(shanten, 2) != expected:
+            mismatches += 1
+            print(f"不一致: {np.flatnonzero(counts)} 計算={shanten} 搜索={expected}")
+
+    print(f"測試手牌數: {len(hands)}, 不一致: {mismatches}")
+    assert mismatches == 0
+
+def test_shanten_consistency():
+    rng = random.Random(11)
+    for _ in range(300):
+        winning = random_winning_hand(rng)
+        assert calculate_shanten(winning) == -1
+
+        # 14張手牌的向聽數等於打出最佳一張後13張手牌的向聽數
+        counts = random_hand(rng, 14)
+        if check_win(counts):
+            assert calculate_shanten(counts) == -1
+            continue
+        best = 8
+        for discard in np.flatnonzero(counts):
+            counts[discard] -= 1
+            best = min(best, calculate_shanten(counts))
+            counts[discard] += 1
+        assert calculate_shanten(counts) == best
+
+    # 各形式的已知向聽數
+    assert calculate_chiitoitsu_shanten(hand_to_counts([0, 0, 2, 2, 5, 5, 9, 9, 13, 13, 27, 27, 33])) == 0
+    assert calculate_kokushi_shanten(hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33])) == 0
+    assert calculate_standard_shanten(hand_to_counts([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 27])) == 0
+    assert calculate_standard_shanten(hand_to_counts([0, 4, 8, 9, 13, 17, 18, 22, 26, 27, 29, 31, 33])) == 8
+    print("向聽數一致性測試通過")
+
+def test_shanten_speed():
+    rng = random.Random(3)
+    calculate_shanten(random_hand(rng))  # 建立距離表
+    hands = [random_hand(rng) for _ in range(2000)]
+
+    start = time.perf_counter()
+    for counts in hands:
+        calculate_shanten(counts)
+    table_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for counts in hands[:20]:
+        brute_force_shanten(counts)
+    brute_time = time.perf_counter() - start
+
+    print(f"查表向聽數: {table_time / len(hands) * 1e6:.1f} 微秒/手")
+    print(f"換牌搜索（至一向聽）: {brute_time / 20 * 1e6:.1f} 微秒/手")
+
+def naive_ukeire(counts, visible):
+    """
+    對每種打法逐一以calculate_shanten嘗試34種摸牌
+    """
+    results = {}
+    for discard in np.flatnonzero(counts):
+        after = counts.copy()
+        after[discard] -= 1
+        shanten = calculate_shanten(after)
+        normalized = after[:34].copy()
+        normalized[[4, 13, 22]] += after[34:37]
+        tiles = []
+        for tile in range(34):
+            if normalized[tile] < 4:
+                after[tile] += 1
+                if calculate_shanten(after) < shanten:
+                    tiles.append(tile)
+                after[tile] -= 1
+        unseen = sum(max(0, 4 - normalized[tile] - visible[tile]) for tile in tiles)
+        results[int(discard)] = (shanten, tiles, unseen)
+    return results
+
+def test_ukeire_matches_naive():
+    print("比較有效牌表與逐一計算結果...")
+    rng = random.Random(5)
+    hands = [random_hand(rng, 14) for _ in range(40)]
+    hands += [near_tenpai_hand(rng, 1) for _ in range(20)]
+    for counts in hands[40:]:
+        counts[rng.randrange(34)] += 1 if counts.max() < 4 else 0
+    hands = [counts for counts in hands if counts[:34].sum() == 14 and counts.max() <= 4]
+    hands.append(hand_to_counts([0, 0, 2, 2, 5, 5, 9, 9, 13, RED_FIVE_PIN, 27, 27, 33, 31]))
+    hands.append(hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 5, 6]))
+
+    for counts in hands:
+        visible = np.zeros(34, dtype=np.int32)
+        for tile in rng.sample(range(34), 8):
+            visible[tile] = rng.randrange(3)
+        assert calculate_ukeire(counts, visible) == naive_ukeire(counts, visible)
+
+        # 打出一張後的13張手牌
+        after = counts.copy()
+        after[np.flatnonzero(counts)[0]] -= 1
+        shanten, tiles, unseen = calculate_effective_tiles(after, visible)
+        expected = naive_ukeire(counts, visible)[int(np.flatnonzero(counts)[0])]
+        assert (shanten, tiles, unseen) == expected
+    print(f"測試手牌數: {len(hands)}, 全部一致")
+
+def best_times(functions, hands, repeat=7):
+    """
+    交替重複計時各函數，取各自最快的一次（每手平均秒數），減少其他進程造成的誤差
+    """
+    times = [[] for _ in functions]
+    for _ in range(repeat):
+        for function, results in zip(functions, times):
+            start = time.perf_counter()
+            for counts in hands:
+                function(counts)
+            results.append((time.perf_counter() - start) / len(hands))
+    return [min(results) for results in times]
+
+def test_ukeire_speed():
+    rng = random.Random(9)
+    hands = [random_hand(rng, 14) for _ in range(200)]
+    calculate_ukeire(hands[0])
+    table_time, shanten_time = best_times([calculate_ukeire, calculate_shanten], hands)
+
+    start = time.perf_counter()
+    for counts in hands[:20]:
+        naive_ukeire(counts, np.zeros(34, dtype=np.int32))
+    naive_time = (time.perf_counter() - start) / 20
+
+    ratio = table_time / shanten_time
+    print(f"有效牌表: {table_time * 1e6:.1f} 微秒/手 (約 {ratio:.1f} 次向聽數計算)")
+    print(f"逐一計算: {naive_time * 1e6:.1f} 微秒/手")
+    # 整張表（最多14種打法）實測約為8-10次向聽數計算；逐一計算需要數百次
+    assert ratio < 15, f"有效牌表過慢: 約 {ratio:.1f} 次向聽數計算"
+
+if __name__ == "__main__":
+    test_shanten_matches_brute_force()
+    test_shanten_consistency()
+    test_shanten_speed()
+    test_ukeire_matches_naive()
+    test_ukeire_speed()
@@ -0,0 +1,92 @@
+from src.models.shared_weights import SharedWeights, WeightSubscriber
+from src.models.dqn_agent import MahjongDQN
+import multiprocessing as mp
+import pickle
+import time
+import torch
+
+def perturb(model):
+    with torch.no_grad():
+        for parameter in model.parameters():
+            parameter.add_(1.0)
+
+def _subscriber_process(shared_weights, results):
+    model = MahjongDQN(254, 100)
+    subscriber = WeightSubscriber(shared_weights, model)
+    while subscriber.version < 3:
+        subscriber.sync()
+    results.put((subscriber.version, sum(float(p.detach().sum()) for p in model.parameters())))
+
+def test_publish_and_sync():
+    print("測試共享參數的發佈與同步...")
+    source, target = MahjongDQN(254, 100), MahjongDQN(254, 100)
+    weights = SharedWeights(source)
+    subscriber = WeightSubscriber(weights, target)
+    assert weights.version == 0 and not subscriber.sync()
+
+    assert weights.publish(source) == 1
+    assert subscriber.sync() and subscriber.version == 1
+    for a, b in zip(source.parameters(), target.parameters()):
+        assert torch.equal(a, b)
+
+    # 版本未變時不複製
+    assert not subscriber.sync()
+    assert subscriber.loads == 1 and subscriber.bytes_loaded == weights.nbytes
+
+    perturb(source)
+    weights.publish(source)
+    assert subscriber.sync()
+    for a, b in zip(source.parameters(), target.parameters()):
+        assert torch.equal(a, b)
+
+    # 參數仍可正常推論
+    assert torch.equal(source(torch.ones(2, 254)), target(torch.ones(2, 254)))
+    assert weights.publish_stats()["bytes_published"] == 2 * weights.nbytes
+
+def test_cross_process():
+    print("測試跨進程同步...")
+    source = MahjongDQN(254, 100)
+    weights = SharedWeights(source)
+    results = mp.Queue()
+    process = mp.Process(target=_subscriber_process, args=(weights, results))
+    process.start()
+    for _ in range(3):
+        perturb(source)
+        weights.publish(source)
+    version, checksum = results.get(timeout=30)
+    process.join()
+    assert version == 3
+    assert abs(checksum - sum(float(p.detach().sum()) for p in source.parameters())) < 1e-2
+
+def test_broadcast_speed():
+    source, target = MahjongDQN(254, 100), MahjongDQN(254, 100)
+    weights = SharedWeights(source)
+    subscriber = WeightSubscriber(weights, target)
+    repeats = 500
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        payload = pickle.dumps(source.state_dict())
+        target.load_state_dict(pickle.loads(payload))
+    pickle_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        weights.publish(source)
+        subscriber.sync()
+    shared_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        subscriber.sync()
+    unchanged_time = (time.perf_counter() - start) / repeats
+
+    stats = weights.publish_stats()
+    print(f"state_dict pickle: {pickle_time * 1e6:.1f} 微秒/次, {len(payload)} 位元組")
+    print(f"共享記憶體: {shared_time * 1e6:.1f} 微秒/次 (發佈 {stats['publish_latency'] * 1e6:.1f} 微秒), "
+          f"{weights.nbytes} 位元組; 版本未變: {unchanged_time * 1e6:.2f} 微秒/次")
+
+if __name__ == "__main__":
+    test_publish_and_sync()
+    test_cross_process()
+    test_broadcast_speed()
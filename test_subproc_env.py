@@ -0,0 +1,90 @@
+from src.environment.mahjong_env import MahjongEnv
+from src.environment.subproc_env import SubprocVecEnv
+from src.environment.observation import OBSERVATION_SIZE
+import numpy as np
+import time
+
+def reference_envs(seed, num_workers, envs_per_worker):
+    """
+    以與SubprocVecEnv相同的種子派生方式建立逐一執行的環境
+    """
+    envs = []
+    for worker_sequence in np.random.SeedSequence(seed).spawn(num_workers):
+        for env_sequence in worker_sequence.spawn(envs_per_worker):
+            envs.append(MahjongEnv(enable_logging=False, seed=env_sequence))
+    return envs
+
+def test_subproc_matches_single():
+    print("比較 SubprocVecEnv 與逐一執行的 MahjongEnv...")
+    num_workers, envs_per_worker = 2, 3
+    vec_env = SubprocVecEnv(num_workers, envs_per_worker, seed=5)
+    envs = reference_envs(5, num_workers, envs_per_worker)
+    try:
+        observations = vec_env.reset()
+        assert observations.shape == (6, OBSERVATION_SIZE)
+        for i, env in enumerate(envs):
+            assert np.array_equal(env.reset(), observations[i])
+
+        rng = np.random.default_rng(0)
+        finished = 0
+        for _ in range(300):
+            actions = rng.integers(0, 37, vec_env.num_envs)
+            observations, rewards, dones, infos = vec_env.step(actions)
+            for i, env in enumerate(envs):
+                observation, reward, done, info = env.step(int(actions[i]))
+                assert done == dones[i] and reward == rewards[i]
+                if done:
+                    assert np.array_equal(observation, infos[i]["terminal_observation"])
+                    observation, info = env.reset(return_info=True)
+                    finished += 1
+                assert np.array_equal(observation, observations[i])
+                assert np.array_equal(info["action_mask"], infos[i]["action_mask"])
+        print(f"完成局數: {finished}, 全部一致")
+        assert vec_env.restarts.sum() == 0
+    finally:
+        vec_env.close()
+
+def test_worker_restart():
+    print("測試工作進程異常結束後的自動重啟...")
+    vec_env = SubprocVecEnv(2, 2, seed=1)
+    try:
+        vec_env.reset()
+        vec_env._processes[1].terminate()
+        vec_env._processes[1].join()
+
+        observations, rewards, dones, infos = vec_env.step(np.zeros(4, dtype=np.int64))
+        assert list(vec_env.restarts) == [0, 1]
+        assert dones[2] and dones[3]
+        assert infos[2]["worker_restarted"] and infos[3]["worker_restarted"]
+        assert "worker_restarted" not in infos[0]
+        assert observations[2:].any()
+
+        # 重啟後可繼續正常執行
+        for _ in range(10):
+            observations, rewards, dones, infos = vec_env.step(np.zeros(4, dtype=np.int64))
+        assert list(vec_env.restarts) == [0, 1]
+        print(f"重啟次數: {vec_env.restarts.tolist()}")
+    finally:
+        vec_env.close()
+
+def test_subproc_speed():
+    rng = np.random.default_rng(2)
+    steps = 200
+    for num_workers, envs_per_worker in ((1, 16), (2, 8)):
+        vec_env = SubprocVecEnv(num_workers, envs_per_worker, seed=0, copy_observation=False)
+        try:
+            vec_env.reset()
+            start = time.perf_counter()
+            for _ in range(steps):
+                vec_env.step(rng.integers(0, 37, vec_env.num_envs))
+            total_rate = steps * vec_env.num_envs / (time.perf_counter() - start)
+            worker_rates = ", ".join(f"{rate:.0f}" for rate in vec_env.worker_steps_per_second())
+            print(f"{num_workers}個工作進程 x {envs_per_worker}個環境: 總計 {total_rate:.0f} 步/秒, "
+                  f"各工作進程 [{worker_rates}] 步/秒")
+        finally:
+            vec_env.close()
+
+if __name__ == "__main__":
+    test_subproc_matches_single()
+    test_worker_restart()
+    test_subproc_speed()
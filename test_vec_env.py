@@ -0,0 +1,88 @@
+from src.environment.mahjong_env import MahjongEnv
+from src.environment.vec_env import MahjongVecEnv
+from src.environment.observation import OBSERVATION_SIZE
+import numpy as np
+import time
+
+class FixedWallEnv(MahjongEnv):
+    """
+    使用指定牌山的單局環境，用於與向量化環境逐步比對
+    """
+
+    def __init__(self, wall):
+        self.next_wall = wall
+        super().__init__(enable_logging=False)
+
+    def _init_tiles(self):
+        self.wall[:] = self.next_wall
+        self.wall_position = 0
+
+def random_actions(rng, hand_counts):
+    """
+    從手牌中隨機選擇要打出的牌ID，偶爾選擇無效動作
+    """
+    actions = (rng.random(hand_counts.shape) * (hand_counts > 0)).argmax(axis=-1)
+    invalid = rng.random(len(actions)) < 0.05
+    actions[invalid] = rng.integers(0, 100, invalid.sum())
+    return actions
+
+def test_vec_env_matches_single():
+    print("比較 MahjongVecEnv 與逐局的 MahjongEnv...")
+    num_envs = 16
+    vec_env = MahjongVecEnv(num_envs, seed=3)
+    observations = vec_env.reset()
+    assert observations.shape == (num_envs, OBSERVATION_SIZE) and observations.dtype == np.float32
+    envs = [FixedWallEnv(vec_env.walls[i]) for i in range(num_envs)]
+    for i, env in enumerate(envs):
+        assert np.array_equal(env._get_observation(), observations[i])
+
+    rng = np.random.default_rng(0)
+    finished = 0
+    for _ in range(600):
+        hand_counts = vec_env.hand_counts[np.arange(num_envs), vec_env.current_player]
+        actions = random_actions(rng, hand_counts)
+        observations, rewards, dones, infos = vec_env.step(actions)
+        assert len(infos) == num_envs and rewards.shape == (num_envs,)
+        for i, env in enumerate(envs):
+            observation, _, done, info = env.step(int(actions[i]))
+            assert done == dones[i]
+            if done:
+                assert np.array_equal(observation, infos[i]["terminal_observation"])
+                env.next_wall = vec_env.walls[i]
+                observation, info = env.reset(return_info=True)
+                finished += 1
+            assert np.array_equal(observation, observations[i])
+            assert np.array_equal(info["action_mask"], infos[i]["action_mask"])
+            assert np.array_equal(env.hand_counts, vec_env.hand_counts[i])
+    print(f"完成局數: {finished}, 全部一致")
+    assert finished > 0
+
+def test_vec_env_speed():
+    rng = np.random.default_rng(1)
+    steps = 200
+
+    envs = [MahjongEnv(enable_logging=False, seed=i, copy_observation=False) for i in range(16)]
+    start = time.perf_counter()
+    for _ in range(steps):
+        for env in envs:
+            action = random_actions(rng, env.hand_counts[env.current_player][None])[0]
+            _, _, done, _ = env.step(int(action))
+            if done:
+                env.reset()
+    single_time = (time.perf_counter() - start) / (steps * len(envs))
+    print(f"MahjongEnv: {single_time * 1e6:.1f} 微秒/步")
+
+    for num_envs in (64, 256, 1024):
+        vec_env = MahjongVecEnv(num_envs, seed=0, copy_observation=False)
+        vec_env.reset()
+        rows = np.arange(num_envs)
+        vec_env.step(random_actions(rng, vec_env.hand_counts[rows, vec_env.current_player]))  # 預熱查表
+        start = time.perf_counter()
+        for _ in range(steps):
+            vec_env.step(random_actions(rng, vec_env.hand_counts[rows, vec_env.current_player]))
+        vec_time = (time.perf_counter() - start) / (steps * num_envs)
+        print(f"MahjongVecEnv N={num_envs}: {vec_time * 1e6:.2f} 微秒/步 ({single_time / vec_time:.1f}x)")
+
+if __name__ == "__main__":
+    test_vec_env_matches_single()
+    test_vec_env_speed()
@@ -0,0 +1,203 @@
+from src.utils.mahjong_utils import (check_win, check_win_recursive, check_win_batch, hand_to_counts,
+                                     find_waits, is_furiten, BlockType,
+                                     RED_FIVE_MAN, RED_FIVE_PIN, RED_FIVE_SOU)
+import numpy as np
+import random
+import time
+
+def random_winning_hand(rng):
+    """
+    隨機組合4組面子和1組雀頭，產生一副和牌手牌（每種牌不超過4張）
+    """
+    while True:
+        counts = np.zeros(37, dtype=np.int32)
+        for _ in range(4):
+            if rng.random() < 0.6:
+                suit = rng.randrange(3)
+                start = suit * 9 + rng.randrange(7)
+                counts[start:start + 3] += 1
+            else:
+                counts[rng.randrange(34)] += 3
+        counts[rng.randrange(34)] += 2
+        if counts.max() <= 4:
+            return counts
+
+def perturb(counts, rng):
+    """
+    將手牌中的一張牌換成另一張，大多數情況下會破壞和牌形
+    """
+    counts = counts.copy()
+    tiles = np.flatnonzero(counts[:34])
+    counts[rng.choice(list(tiles))] -= 1
+    while True:
+        new_tile = rng.randrange(34)
+        if counts[new_tile] < 4:
+            counts[new_tile] += 1
+            return counts
+
+def with_red_fives(counts, rng):
+    """
+    隨機將部分五萬、五筒、五索替換為赤寶牌
+    """
+    counts = counts.copy()
+    for normal, red in ((4, RED_FIVE_MAN), (13, RED_FIVE_PIN), (22, RED_FIVE_SOU)):
+        if counts[normal] > 0 and rng.random() < 0.5:
+            counts[normal] -= 1
+            counts[red] += 1
+    return counts
+
+def test_check_win_matches_recursive():
+    print("比較查表版與遞迴版 check_win...")
+    rng = random.Random(42)
+    hands = []
+    for _ in range(2000):
+        winning = random_winning_hand(rng)
+        hands.append(winning)
+        hands.append(perturb(winning, rng))
+        hands.append(with_red_fives(winning, rng))
+
+    # 七對子、國士無雙與非14張的情況
+    hands.append(hand_to_counts([0, 0, 2, 2, 5, 5, 9, 9, 13, RED_FIVE_PIN, 27, 27, 33, 33]))
+    hands.append(hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33, 33]))
+    hands.append(hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33]))
+    hands.append(hand_to_counts([0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3]))
+
+    mismatches = 0
+    win_count = 0
+    for counts in hands:
+        expected = check_win_recursive(counts)
+        if check_win(counts) != expected:
+            mismatches += 1
+        win_count += expected
+
+    print(f"測試手牌數: {len(hands)}, 和牌數: {win_count}, 不一致: {mismatches}")
+    assert mismatches == 0
+
+def test_check_win_speed():
+    rng = random.Random(0)
+    hands = [random_winning_hand(rng) for _ in range(500)]
+
+    start = time.perf_counter()
+    for counts in hands:
+        check_win_recursive(counts)
+    recursive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for counts in hands:
+        check_win(counts)
+    table_time = time.perf_counter() - start
+
+    print(f"遞迴版: {recursive_time / len(hands) * 1e6:.1f} 微秒/手")
+    print(f"查表版: {table_time / len(hands) * 1e6:.1f} 微秒/手")
+
+def sample_hands(rng, count):
+    """
+    產生和牌、換一張牌及含赤寶牌的手牌各約三分之一
+    """
+    hands = []
+    while len(hands) < count:
+        winning = random_winning_hand(rng)
+        hands += [winning, perturb(winning, rng), with_red_fives(winning, rng)]
+    return np.array(hands[:count])
+
+def test_check_win_batch_matches_check_win():
+    print("比較 check_win_batch 與 check_win...")
+    rng = random.Random(21)
+    hands = sample_hands(rng, 3000)
+    special = [
+        hand_to_counts([0, 0, 2, 2, 5, 5, 9, 9, 13, RED_FIVE_PIN, 27, 27, 33, 33]),
+        hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33, 33]),
+        hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33]),
+        hand_to_counts([0, 0, 0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3]),
+    ]
+    hands = np.vstack([hands, special])
+
+    expected = np.array([check_win(counts) for counts in hands])
+    result = check_win_batch(hands)
+    print(f"測試手牌數: {len(hands)}, 和牌數: {expected.sum()}, 不一致: {(result != expected).sum()}")
+    assert result.dtype == bool and result.shape == (len(hands),)
+    assert np.array_equal(result, expected)
+
+def test_check_win_batch_speed():
+    rng = random.Random(1)
+    base = sample_hands(rng, 3000)
+    scalar_hands = base[:1000]
+
+    start = time.perf_counter()
+    for counts in scalar_hands:
+        check_win(counts)
+    scalar_time = (time.perf_counter() - start) / len(scalar_hands)
+    print(f"check_win 逐手: {scalar_time * 1e6:.2f} 微秒/手")
+
+    for n in (1, 1000, 100000):
+        hands = np.resize(base, (n, 37))
+        repeats = max(1, 10000 // n)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            check_win_batch(hands)
+        batch_time = (time.perf_counter() - start) / repeats / n
+        print(f"check_win_batch N={n}: {batch_time * 1e6:.3f} 微秒/手")
+
+def decomposition_counts(decomposition):
+    """
+    將拆解方式還原為34種牌的計數
+    """
+    counts = np.zeros(34, dtype=np.int32)
+    for kind, tile in decomposition:
+        if kind == BlockType.SHUNTSU:
+            counts[tile:tile + 3] += 1
+        elif kind == BlockType.KOUTSU:
+            counts[tile] += 3
+        elif kind == BlockType.TOITSU:
+            counts[tile] += 2
+        else:
+            counts[[0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33]] += 1
+            counts[tile] += 1
+    return counts
+
+def test_find_waits():
+    print("比較 find_waits 與逐一嘗試 check_win...")
+    rng = random.Random(17)
+    hands = []
+    for _ in range(300):
+        counts = random_winning_hand(rng)
+        counts[rng.choice(list(np.flatnonzero(counts)))] -= 1
+        hands.append(counts)
+        hands.append(perturb(counts, rng))
+    hands.append(hand_to_counts([0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 8, 8]))  # 九蓮寶燈
+    hands.append(hand_to_counts([0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33]))  # 國士十三面
+    hands.append(hand_to_counts([0, 0, 2, 2, 5, 5, 9, 9, 13, RED_FIVE_PIN, 27, 27, 33]))  # 七對子
+
+    for counts in hands:
+        waits = find_waits(counts)
+        expected = []
+        for tile in range(34):
+            test_counts = counts.copy()
+            test_counts[tile] += 1
+            if test_counts[tile] + (test_counts[34 + tile // 9] if tile in (4, 13, 22) else 0) <= 4 \
+                    and check_win(test_counts):
+                expected.append(tile)
+        assert list(waits) == expected
+
+        normalized = counts[:34].copy()
+        normalized[[4, 13, 22]] += counts[34:37]
+        for tile, decompositions in waits.items():
+            assert decompositions
+            for decomposition in decompositions:
+                target = normalized.copy()
+                target[tile] += 1
+                assert np.array_equal(decomposition_counts(decomposition), target)
+
+    assert list(find_waits(hands[-3])) == list(range(9))
+    assert len(find_waits(hands[-2])) == 13
+    assert list(find_waits(hands[-1])) == [33]
+    assert is_furiten(find_waits(hands[-1]), [5, 33])
+    assert not is_furiten(find_waits(hands[-1]), [5, 32])
+    print(f"測試手牌數: {len(hands)}, 全部一致")
+
+if __name__ == "__main__":
+    test_check_win_matches_recursive()
+    test_check_win_speed()
+    test_check_win_batch_matches_check_win()
+    test_check_win_batch_speed()
+    test_find_waits()
@@ -0,0 +1,202 @@
+from src.utils.mahjong_utils import (evaluate_yaku, calculate_score, find_decompositions, check_win,
+                                     lookup_score, configure_score_cache, score_cache_info, hand_to_counts, YakuType, RED_FIVE_MAN, RED_FIVE_PIN, RED_FIVE_SOU)
+from test_win_table import random_winning_hand, decomposition_counts
+import numpy as np
+import random
+import time
+
+def parse_hand(text):
+    """
+    將 "123m456p11z" 格式的字串轉換為牌ID列表（0表示赤五，字牌1-7為東南西北白發中）
+    """
+    ids = []
+    digits = []
+    for char in text:
+        if char.isdigit():
+            digits.append(int(char))
+            continue
+        offset = {'m': 0, 'p': 9, 's': 18, 'z': 27}[char]
+        for digit in digits:
+            if digit == 0:
+                ids.append({'m': RED_FIVE_MAN, 'p': RED_FIVE_PIN, 's': RED_FIVE_SOU}[char])
+            else:
+                ids.append(offset + digit - 1)
+        digits = []
+    return ids
+
+# (手牌, 和了牌, 狀況參數, 預期番數, 預期符數, 預期役)
+YAKU_CASES = [
+    ("234567m234p678s99p", "4m", {}, 1, 30, [YakuType.PINFU]),
+    ("234567m234p678s99p", "4m", {'is_self_draw': True}, 2, 20, [YakuType.TSUMO, YakuType.PINFU]),
+    ("234567m234p678s55p", "5p", {'is_open': True}, 1, 30, [YakuType.TANYAO]),
+    ("112233m456p789s99s", "4p", {}, 2, 30, [YakuType.IIPEIKOU, YakuType.PINFU]),
+    ("123m123p123456s99m", "6s", {}, 3, 30, [YakuType.SANSHOKU_DOUJUN, YakuType.PINFU]),
+    ("123456789p234s11z", "1z", {'is_riichi': True, 'player_wind': 1}, 3, 40, [YakuType.RIICHI, YakuType.ITTSU]),
+    ("111m999p555s222z33s", "5s", {'player_wind': 1}, 5, 60,
+     [YakuType.SOUTH, YakuType.TOITOI, YakuType.SANANKOU]),
+    ("111m999p555s222z33s", "5s", {'player_wind': 1, 'is_self_draw': True}, 13, 50, [YakuType.SUUANKOU]),
+    ("1122m5577p99s1166z", "6z", {'is_riichi': True}, 3, 25, [YakuType.RIICHI, YakuType.CHIITOITSU]),
+    ("11123456789m555z", "9m", {'is_open': True}, 4, 30, [YakuType.HONITSU, YakuType.HAKU, YakuType.ITTSU]),
+    ("11123455678999m", "5m", {}, 13, 50, [YakuType.CHUUREN_POUTOU]),
+    ("22334455667788p", "8p", {}, 11, 30,
+     [YakuType.TANYAO, YakuType.CHINITSU, YakuType.RYANPEIKOU, YakuType.PINFU]),
+    ("19m19p19s12345677z", "1z", {}, 13, 30, [YakuType.KOKUSHI_MUSOU]),
+    ("119m19p19s1234567z", "1m", {}, 26, 30, [YakuType.KOKUSHI_MUSOU_13]),
+    ("123m99p555666777z", "3m", {}, 13, 60, [YakuType.DAISANGEN]),
+    ("11223344556677z", "7z", {}, 13, 25, [YakuType.TSUUIISOU]),
+    ("123789m123p999s11p", "1p", {}, 3, 40, [YakuType.JUNCHAN]),
+    ("123m789p999s99m111z", "7p", {}, 4, 50, [YakuType.DOUBLE_WIND, YakuType.CHANTAIYAO]),
+    ("234567m234p678s99p", "4m", {'is_self_draw': True, 'is_first_turn': True, 'is_dealer': True}, 26, 20,
+     [YakuType.TENHOU]),
+    ("123m456p555666z77z", "4p", {}, 4, 50, [YakuType.HAKU, YakuType.HATSU, YakuType.SHOUSANGEN]),
+    ("22334455667788s", "8s", {}, 26, 40, [YakuType.DAISUURIN]),
+    ("234567m406p678s22s", "6p", {'is_riichi': True, 'is_ippatsu': True}, 4, 30,
+     [YakuType.RIICHI, YakuType.IPPATSU, YakuType.TANYAO, YakuType.PINFU]),
+]
+
+def test_yaku_cases():
+    print("檢查已知手牌的役與符數...")
+    for hand, win, situation, han, fu, yaku in YAKU_CASES:
+        hand_ids = parse_hand(hand)
+        assert len(hand_ids) == 14, hand
+        result = evaluate_yaku(hand_to_counts(hand_ids), parse_hand(win)[0], **situation)
+        assert result[0] == han and result[1] == fu and sorted(result[2]) == sorted(yaku), (hand, result)
+    print(f"測試手牌數: {len(YAKU_CASES)}, 全部正確")
+
+def test_no_yaku():
+    counts = hand_to_counts(parse_hand("123m456p789s234m99p"))
+    assert evaluate_yaku(counts, 3, is_open=True) == (0, 0, [])
+    assert calculate_score(counts, 3, is_open=True, dora_count=2) == (0, [])
+    # 非和牌形
+    assert evaluate_yaku(hand_to_counts(parse_hand("123m456p789s234m19p")), 3) == (0, 0, [])
+
+def test_calculate_score():
+    # 立直平和斷么九、赤寶牌1，子家榮和：4番30符
+    counts = hand_to_counts(parse_hand("234567m406p678s22s"))
+    score, yaku_list = calculate_score(counts, 14, is_riichi=True)
+    assert score == 30 * 2 ** 6 and f"{YakuType.AKADORA} 1" in yaku_list
+    # 加上寶牌1為滿貫
+    score, yaku_list = calculate_score(counts, 14, is_riichi=True, dora_count=1)
+    assert score == 2000 and "寶牌 1" in yaku_list
+    # 役滿不計寶牌，莊家自摸
+    counts = hand_to_counts(parse_hand("11223344556677z"))
+    score, yaku_list = calculate_score(counts, 33, is_self_draw=True, is_dealer=True, dora_count=3)
+    assert score == 8000 * 6 and yaku_list == [YakuType.TSUUIISOU]
+
+def test_random_hands():
+    print("檢查隨機和牌手牌的拆解與得分...")
+    rng = random.Random(23)
+    for _ in range(1000):
+        counts = random_winning_hand(rng)
+        decompositions = find_decompositions(counts)
+        assert decompositions and check_win(counts)
+        for decomposition in decompositions:
+            assert np.array_equal(decomposition_counts(decomposition), counts[:34])
+        win = rng.choice(list(np.flatnonzero(counts)))
+        han, fu, yaku_list = evaluate_yaku(counts, win, is_riichi=True, is_self_draw=rng.random() < 0.5)
+        assert han >= 1 and fu in (20, 25) + tuple(range(30, 150, 10))
+    print("隨機手牌測試通過")
+
+def test_yaku_speed():
+    rng = random.Random(31)
+    hands = [random_winning_hand(rng) for _ in range(2000)]
+    wins = [rng.choice(list(np.flatnonzero(counts))) for counts in hands]
+    start = time.perf_counter()
+    for counts, win in zip(hands, wins):
+        evaluate_yaku(counts, win, is_riichi=True)
+    elapsed = (time.perf_counter() - start) / len(hands)
+    print(f"役判斷: {elapsed * 1e6:.1f} 微秒/手")
+
+def formula_score(han, fu, is_dealer, is_self_draw):
+    """
+    以公式逐步計算得分，用於驗證點數表
+    """
+    if han >= 13:
+        base_points = 8000
+    elif han >= 11:
+        base_points = 6000
+    elif han >= 8:
+        base_points = 4000
+    elif han >= 6:
+        base_points = 3000
+    elif han >= 5:
+        base_points = 2000
+    else:
+        base_points = min(fu * 2 ** (han + 2), 2000)
+    if is_self_draw:
+        return base_points * (6 if is_dealer else 4)
+    return base_points * (2 if is_dealer else 1)
+
+def test_score_table():
+    for han in range(1, 20):
+        for fu in (20, 25, 30, 40, 50, 60, 70, 80, 90, 100, 110):
+            for is_dealer in (False, True):
+                for is_self_draw in (False, True):
+                    assert lookup_score(han, fu, is_dealer, is_self_draw) == \
+                        formula_score(han, fu, is_dealer, is_self_draw)
+    # 役滿按倍數計算
+    assert lookup_score(26, 30, False, False, yakuman=True) == 16000
+    assert lookup_score(13, 30, True, True, yakuman=True) == 48000
+
+def test_score_cache():
+    print("檢查得分快取...")
+    rng = random.Random(41)
+    hands = [random_winning_hand(rng) for _ in range(200)]
+    wins = [rng.choice(list(np.flatnonzero(counts))) for counts in hands]
+    configure_score_cache(0)
+    expected = [calculate_score(counts, win, is_riichi=True, dora_count=1) for counts, win in zip(hands, wins)]
+    assert score_cache_info() is None
+    
+    cache = configure_score_cache(maxsize=100)
+    try:
+        for _ in range(2):
+            results = [calculate_score(counts, win, is_riichi=True, dora_count=1) for counts, win in zip(hands, wins)]
+            assert results == expected
+        info = score_cache_info()
+        assert info['hits'] + info['misses'] == 400 and info['size'] <= 100
+        
+        # 重複出現的手牌應命中快取
+        cache.clear()
+        for _ in range(5):
+            for counts, win in zip(hands[:50], wins[:50]):
+                calculate_score(counts, win, is_riichi=True)
+        info = score_cache_info()
+        assert info['misses'] == 50 and info['hits'] == 200
+        # 不同場況參數不共用快取項目
+        calculate_score(hands[0], wins[0], is_riichi=False)
+        assert score_cache_info()['misses'] == 51
+        print(f"快取統計: {score_cache_info()}")
+    finally:
+        configure_score_cache(0)
+
+def test_score_cache_speed():
+    rng = random.Random(43)
+    hands = [random_winning_hand(rng) for _ in range(500)]
+    wins = [rng.choice(list(np.flatnonzero(counts))) for counts in hands]
+    
+    start = time.perf_counter()
+    for counts, win in zip(hands, wins):
+        calculate_score(counts, win, is_riichi=True)
+    uncached_time = (time.perf_counter() - start) / len(hands)
+    
+    configure_score_cache()
+    try:
+        for counts, win in zip(hands, wins):
+            calculate_score(counts, win, is_riichi=True)
+        start = time.perf_counter()
+        for counts, win in zip(hands, wins):
+            calculate_score(counts, win, is_riichi=True)
+        cached_time = (time.perf_counter() - start) / len(hands)
+    finally:
+        configure_score_cache(0)
+    print(f"calculate_score 無快取: {uncached_time * 1e6:.1f} 微秒/手, 快取命中: {cached_time * 1e6:.1f} 微秒/手")
+
+if __name__ == "__main__":
+    test_yaku_cases()
+    test_no_yaku()
+    test_calculate_score()
+    test_random_hands()
+    test_yaku_speed()
+    test_score_table()
+    test_score_cache()
+    test_score_cache_speed()